@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+🎓 Student Attendance System - Headless Mode
+Chạy điểm danh tự động trên máy không có màn hình (không cần Tkinter)
+
+Examples:
+    python attendance_daemon.py --class CNTT01
+    python attendance_daemon.py --session 12 --camera rtsp://10.0.0.5/stream --profile low
+    python attendance_daemon.py --class CNTT01 --camera /dev/video2 --stats-interval 30
+    python attendance_daemon.py --class CNTT01 --camera 0 --camera 1 --camera rtsp://10.0.0.7/live
+    python attendance_daemon.py --class CNTT01 --video lecture.mp4 --recorded-at "2024-03-04 07:30"
+
+Stop with Ctrl+C or SIGTERM; the current frame finishes, the camera is
+released and a session created by the daemon is closed.
+
+With --video the recording is processed offline by a pool of worker
+processes (faster than real time) and the attendance is written at once.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import sys
+from datetime import datetime, timedelta
+
+# Add src directory to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(current_dir, 'src')
+sys.path.insert(0, src_dir)
+
+from utils.config import (CAMERA_ID, CONFIDENCE_THRESHOLD, RECOGNITION_COOLDOWN, FACE_DETECTOR,
+                          RECOGNITION_ENGINE, PERFORMANCE_PROFILES, DEFAULT_PERFORMANCE_PROFILE, STATS_LOG_INTERVAL)
+from core.detectors import DETECTOR_BACKENDS
+from core.matchers import RECOGNITION_ENGINES
+from core.video_batch import DEFAULT_STRIDE, DEFAULT_MAX_WIDTH
+
+
+def setup_logging(level):
+    """Setup logging configuration (same log file as the GUI)"""
+    log_directory = os.path.join(src_dir, 'logs')
+    os.makedirs(log_directory, exist_ok=True)
+
+    logging.basicConfig(
+        level=getattr(logging, level),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(os.path.join(log_directory, 'attendance_system.log')),
+            logging.StreamHandler()
+        ]
+    )
+
+
+def camera_source(value):
+    """Camera index ('0') or device path / file / stream URL"""
+    return int(value) if value.isdigit() else value
+
+
+def recording_time(value):
+    """Parse 'YYYY-MM-DD HH:MM[:SS]'"""
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M'):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"invalid time '{value}', expected 'YYYY-MM-DD HH:MM[:SS]'")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run face recognition attendance without a GUI")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--session', type=int, help="Existing attendance session ID")
+    target.add_argument('--class', dest='class_code', help="Class code; a new session is created for it")
+    parser.add_argument('--session-name', help="Name of the created session (with --class)")
+    parser.add_argument('--camera', type=camera_source, action='append',
+                        help="Camera index, device path or stream URL; repeat for several cameras "
+                             f"feeding the same session (default: {CAMERA_ID})")
+    parser.add_argument('--profile', choices=sorted(PERFORMANCE_PROFILES), default=DEFAULT_PERFORMANCE_PROFILE)
+    parser.add_argument('--detector', choices=DETECTOR_BACKENDS, default=FACE_DETECTOR,
+                        help="Face detector backend (model files are configured in utils/config.py)")
+    parser.add_argument('--engine', choices=RECOGNITION_ENGINES, default=RECOGNITION_ENGINE,
+                        help="Face matching engine (fitted models are cached in data/trainer/)")
+    parser.add_argument('--confidence', type=float, default=CONFIDENCE_THRESHOLD,
+                        help="Minimum confidence (%%) to record attendance")
+    parser.add_argument('--cooldown', type=float, default=RECOGNITION_COOLDOWN,
+                        help="Seconds between recordings of the same student")
+    parser.add_argument('--video', help="Process a recorded video file offline instead of a live camera")
+    parser.add_argument('--stride', type=int, default=DEFAULT_STRIDE,
+                        help="With --video: process every N-th frame")
+    parser.add_argument('--workers', type=int, help="With --video: worker processes (default: CPU count)")
+    parser.add_argument('--max-width', type=int, default=DEFAULT_MAX_WIDTH,
+                        help="With --video: downscale wider frames before detection (0 = keep size)")
+    parser.add_argument('--recorded-at', type=recording_time,
+                        help="With --video: start time of the recording, 'YYYY-MM-DD HH:MM[:SS]' "
+                             "(default: file modification time minus duration)")
+    parser.add_argument('--stats-interval', type=float, default=STATS_LOG_INTERVAL,
+                        help="Seconds between stats log lines")
+    parser.add_argument('--db', help="Database path (default: data/attendance.db)")
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+    return parser.parse_args(argv)
+
+
+def run_video(args, recognizer, db, session_id, created_session):
+    """Offline attendance from a recorded video"""
+    from core.video_batch import VideoBatchProcessor
+
+    logger = logging.getLogger(__name__)
+    processor = VideoBatchProcessor(recognizer, stride=args.stride, workers=args.workers,
+                                    max_width=args.max_width or None)
+    try:
+        processor.process(args.video, session_id, recorded_at=args.recorded_at,
+                          progress_callback=lambda percent, message: logger.info(f"{percent}% - {message}"))
+    except KeyboardInterrupt:
+        logger.info("Interrupted, nothing was recorded")
+        return 1
+    finally:
+        if created_session:
+            db.end_attendance_session(session_id, end_time=args.ended_at)
+    return 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup_logging(args.log_level)
+    logger = logging.getLogger(__name__)
+    logger.info("Starting Student Attendance System (headless)")
+
+    from database.models import DatabaseManager
+    from core.face_recognizer import AttendanceFaceRecognizer
+    from core.headless_runner import HeadlessAttendanceRunner
+
+    db = DatabaseManager(args.db)
+
+    try:
+        recognizer = AttendanceFaceRecognizer(db, confidence_threshold=args.confidence,
+                                              detector_backend=args.detector, engine=args.engine)
+    except FileNotFoundError as e:
+        logger.error(str(e))
+        return 1
+    recognizer.recognition_cooldown = args.cooldown
+    if recognizer.face_cascade.empty():
+        logger.error(f"Cannot load face detector: {recognizer.face_cascade.describe()}")
+        return 1
+    logger.info(f"Face detector: {recognizer.face_cascade.describe()}")
+    if len(recognizer.faces_data) == 0:
+        logger.error("No training data found - train the model from the GUI first")
+        return 1
+    logger.info(f"Recognition engine: {recognizer.engine}")
+
+    started_at = datetime.now()
+    if args.video:
+        from core.video_batch import probe_video
+        try:
+            duration = probe_video(args.video)['duration']
+        except IOError as e:
+            logger.error(str(e))
+            return 1
+        if args.recorded_at is None:
+            args.recorded_at = (datetime.fromtimestamp(os.path.getmtime(args.video))
+                                - timedelta(seconds=duration))
+        started_at = args.recorded_at
+        args.ended_at = started_at + timedelta(seconds=duration)
+
+    created_session = False
+    if args.class_code:
+        classes = {row[2]: row for row in db.get_all_classes()}  # class_code -> row
+        if args.class_code not in classes:
+            logger.error(f"Unknown class code '{args.class_code}'. Available: {', '.join(sorted(classes))}")
+            return 1
+        class_row = classes[args.class_code]
+        session_name = args.session_name or f"{class_row[1]} - {started_at.strftime('%d/%m/%Y %H:%M')}"
+        description = f"Video: {os.path.basename(args.video)}" if args.video else "Headless attendance"
+        session_id = db.create_attendance_session(session_name, class_row[0], started_at.strftime('%Y-%m-%d'),
+                                                  started_at.strftime('%H:%M:%S'), description)
+        created_session = True
+        logger.info(f"Created session {session_id}: {session_name}")
+    else:
+        session_id = args.session
+
+    if args.video:
+        return run_video(args, recognizer, db, session_id, created_session)
+
+    runner = HeadlessAttendanceRunner(recognizer, session_id, camera_source=args.camera or [CAMERA_ID],
+                                      profile=args.profile, stats_interval=args.stats_interval)
+
+    def handle_signal(signum, frame):
+        logger.info(f"Received signal {signum}, stopping...")
+        runner.stop()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    try:
+        ok = runner.run()
+    finally:
+        if created_session:
+            db.end_attendance_session(session_id)
+            logger.info(f"Ended session {session_id}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
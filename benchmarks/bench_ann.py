@@ -0,0 +1,80 @@
+"""
+Approximate nearest-neighbour (IVF) search vs. exact search: recall and latency
+Tìm kiếm gần đúng (IVF) so với tìm kiếm đầy đủ: độ chính xác và độ trễ
+
+Also covers the built-in MAD engine's prefilter (dHash pruning before the
+thumbnail comparison) on the same gallery.
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+from common import metric, load_dataset_faces, build_synthetic_gallery, augment_face
+from core.matchers import MADKernel, ThumbnailPrefilter, create_matcher, dhash, hamming_distances
+
+GALLERY_SIZE = 50000
+QUICK_GALLERY_SIZE = 10000
+PROBE_COUNTS = [1, 2, 4, 8, 16, 32]
+N_QUERIES = 50
+ENGINES = ('pca', 'lbp')
+
+
+def _ms_per_face(func, probes):
+    start = time.perf_counter()
+    answers = [func(probe) for probe in probes]
+    return (time.perf_counter() - start) * 1000 / len(probes), answers
+
+
+def run(quick=False):
+    results = {}
+    faces, _ = load_dataset_faces()
+    # Enrollment-sized crops keep a large synthetic gallery in memory
+    faces = [cv2.resize(face, (64, 64), interpolation=cv2.INTER_AREA) for face in faces]
+    size = QUICK_GALLERY_SIZE if quick else GALLERY_SIZE
+    gallery, ids = build_synthetic_gallery(faces, size, samples_per_identity=20)
+
+    rng = np.random.default_rng(3)
+    probes = [augment_face(gallery[i], rng) for i in rng.choice(size, N_QUERIES, replace=False)]
+
+    for engine in ENGINES:
+        matcher = create_matcher(engine).fit(gallery, ids)
+        key = f'{engine}.gallery_{size}'
+
+        exact_ms, exact = _ms_per_face(matcher.match, probes)
+        results[f'{key}.exact.ms_per_face'] = metric(exact_ms, 'ms', higher_is_better=False)
+
+        start = time.perf_counter()
+        index = matcher.build_index()
+        results[f'{key}.ivf.build_seconds'] = metric(time.perf_counter() - start, 's', higher_is_better=False)
+        results[f'{key}.ivf.lists'] = metric(len(index.centroids), 'lists')
+
+        for n_probe in (PROBE_COUNTS[:4] if quick else PROBE_COUNTS):
+            index.n_probe = n_probe
+            ms, answers = _ms_per_face(matcher.match, probes)
+            # Recall@1: the approximate search returns the exact search's identity
+            recall = np.mean([a[0] == e[0] for a, e in zip(answers, exact)])
+            results[f'{key}.ivf_probe_{n_probe}.ms_per_face'] = metric(ms, 'ms', higher_is_better=False)
+            results[f'{key}.ivf_probe_{n_probe}.recall'] = metric(recall, 'ratio')
+        matcher.index = None
+
+    # Built-in MAD prefilter: thumbnails of the whole gallery vs. dHash pruning first
+    thumbnails = ThumbnailPrefilter(gallery, hash_top_k=0)
+    hashed = ThumbnailPrefilter(gallery)
+    key = f'mad.gallery_{size}'
+    probe_hash = dhash([probes[0]])[0]
+    scan_ms, _ = _ms_per_face(lambda _: hamming_distances(hashed.hashes, probe_hash), probes)
+    results[f'{key}.dhash.scan_ms'] = metric(scan_ms, 'ms', higher_is_better=False)
+    results[f'{key}.dhash.bytes'] = metric(hashed.hashes.nbytes, 'bytes', higher_is_better=False)
+    # Scratch buffers are reused across queries, as in the recognizer's per-thread kernel
+    kernel = MADKernel()
+    thumbnail_ms, exact = _ms_per_face(lambda face: thumbnails.candidates(face, kernel), probes)
+    hashed_ms, answers = _ms_per_face(lambda face: hashed.candidates(face, kernel), probes)
+    results[f'{key}.thumbnail_prefilter.ms_per_face'] = metric(thumbnail_ms, 'ms', higher_is_better=False)
+    results[f'{key}.dhash_prefilter.ms_per_face'] = metric(hashed_ms, 'ms', higher_is_better=False)
+    # Share of the thumbnail stage's candidates that survive the dHash pruning
+    recall = np.mean([len(np.intersect1d(a, e)) / len(e) for a, e in zip(answers, exact)])
+    results[f'{key}.dhash_prefilter.recall'] = metric(recall, 'ratio')
+
+    return results
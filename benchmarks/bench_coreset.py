@@ -0,0 +1,34 @@
+"""
+Gallery coreset selection: held-out accuracy vs. samples kept per student
+Chọn ảnh đại diện: độ chính xác trên ảnh giữ lại theo số ảnh mỗi học sinh
+"""
+
+import time
+
+from common import metric, load_dataset_faces, build_synthetic_gallery
+from core.coreset import evaluate_selection
+
+SAMPLES_PER_IDENTITY = 200  # scripts/01_face_dataset.py enrollment size
+IDENTITIES = 50
+QUICK_IDENTITIES = 20
+KEEP_COUNTS = [10, 20, 50]
+
+
+def run(quick=False):
+    results = {}
+    faces, _ = load_dataset_faces()
+    n_identities = QUICK_IDENTITIES if quick else IDENTITIES
+    gallery, ids = build_synthetic_gallery(faces, n_identities * SAMPLES_PER_IDENTITY,
+                                           samples_per_identity=SAMPLES_PER_IDENTITY)
+
+    for keep in KEEP_COUNTS:
+        start = time.perf_counter()
+        report = evaluate_selection(gallery, ids, per_identity=keep)
+        key = f'coreset.keep_{keep}'
+        results[f'{key}.seconds'] = metric(time.perf_counter() - start, 's', higher_is_better=False)
+        results[f'{key}.full_accuracy'] = metric(report['full_accuracy'], 'ratio')
+        results[f'{key}.accuracy'] = metric(report['coreset_accuracy'], 'ratio')
+        results[f'{key}.gallery_fraction'] = metric(report['coreset_size'] / report['full_size'], 'ratio',
+                                                    higher_is_better=False)
+
+    return results
@@ -0,0 +1,36 @@
+"""
+record_attendance throughput
+Tốc độ ghi điểm danh vào database
+"""
+
+import os
+import random
+import tempfile
+import time
+
+from common import metric, create_benchmark_database
+
+
+def run(quick=False):
+    results = {}
+    n_events = 200 if quick else 1000
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db, student_ids, session_ids = create_benchmark_database(
+            os.path.join(tmp_dir, 'record.db'), n_students=500, n_records=0 if quick else 20000
+        )
+        rng = random.Random(0)
+        session_id = session_ids[0]
+
+        # Mix of first check-ins (INSERT) and repeat sightings (UPDATE), as in a live session
+        events = [rng.choice(student_ids[:100]) for _ in range(n_events)]
+
+        start = time.perf_counter()
+        for student_id in events:
+            db.record_attendance(session_id, student_id, 80.0, 'present')
+        seconds = time.perf_counter() - start
+
+        results['record_attendance.events_per_sec'] = metric(n_events / seconds, 'events/s')
+        results['record_attendance.latency_ms'] = metric(seconds / n_events * 1000, 'ms', higher_is_better=False)
+
+    return results
@@ -0,0 +1,131 @@
+"""
+Haar detection FPS vs. frame resolution
+Tốc độ phát hiện khuôn mặt theo độ phân giải
+
+The full vs. downscaled scan comparison runs on recorded frames when a
+frame set is given (run_benchmarks.py --frames DIR: images plus
+annotations.json, as for tune_detection.py), on synthetic frames otherwise.
+"""
+
+import os
+
+import cv2
+
+from common import (metric, time_call, load_dataset_faces, load_recorded_frames, synthesize_frames,
+                    synthesize_sequence, detection_recall, CASCADE_PATH)
+from core.detection import DetectionScheduler, MotionGate
+from core.detectors import DETECTOR_BACKENDS, TiledDetector, create_face_detector
+
+RESOLUTIONS = [(320, 240), (640, 480), (1280, 720), (1920, 1080)]
+QUICK_RESOLUTIONS = [(320, 240), (640, 480)]
+TILED_RESOLUTIONS = [(1920, 1080), (3840, 2160)]
+QUICK_TILED_RESOLUTIONS = [(1920, 1080)]
+
+
+def _frame_sets(faces, quick, frames_dir):
+    """(key, frames) pairs for the full vs. downscaled comparison"""
+    if frames_dir:
+        frames = load_recorded_frames(frames_dir)
+        height, width = frames[0][0].shape[:2]
+        return [(f'haar.recorded.{width}x{height}', frames)]
+    return [(f'haar.{width}x{height}', synthesize_frames(faces, width, height, n_frames=5 if quick else 10))
+            for width, height in (QUICK_RESOLUTIONS if quick else RESOLUTIONS)]
+
+
+def run(quick=False, frames_dir=None):
+    results = {}
+    faces, _ = load_dataset_faces()
+    cascade = cv2.CascadeClassifier(CASCADE_PATH)
+
+    for key, frames in _frame_sets(faces, quick, frames_dir):
+        def detect_all():
+            return [cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5, minSize=(50, 50))
+                    for gray, _ in frames]
+
+        seconds = time_call(detect_all, repeat=3)
+        detections = detect_all()
+        recall = sum(detection_recall(d, boxes) for d, (_, boxes) in zip(detections, frames)) / len(frames)
+
+        results[f'{key}.fps'] = metric(len(frames) / seconds, 'frames/s')
+        results[f'{key}.recall'] = metric(recall, 'ratio')
+
+        # Same frames, full scan on a copy shrunk according to minSize
+        scheduler = DetectionScheduler(cascade, scale_factor=1.2, min_neighbors=5, min_size=(50, 50),
+                                       full_scan_interval=1, downscale=True)
+
+        def detect_downscaled():
+            return [scheduler.detect(gray) for gray, _ in frames]
+
+        seconds = time_call(detect_downscaled, repeat=3)
+        detections = detect_downscaled()
+        recall = sum(detection_recall(d, boxes) for d, (_, boxes) in zip(detections, frames)) / len(frames)
+        results[f'{key}.downscaled.fps'] = metric(len(frames) / seconds, 'frames/s')
+        results[f'{key}.downscaled.recall'] = metric(recall, 'ratio')
+
+    # Full scan on every frame vs. DetectionScheduler on a clip where faces barely move
+    clip = synthesize_sequence(faces, 640, 480, n_frames=20 if quick else 60)
+    for label, interval in (('full', 1), ('scheduled', 10)):
+        def detect_clip():
+            scheduler = DetectionScheduler(cascade, scale_factor=1.2, min_neighbors=5, min_size=(50, 50),
+                                           full_scan_interval=interval)
+            return [scheduler.detect(gray) for gray, _ in clip]
+
+        seconds = time_call(detect_clip, repeat=3)
+        detections = detect_clip()
+        recall = sum(detection_recall(d, boxes) for d, (_, boxes) in zip(detections, clip)) / len(clip)
+        results[f'clip.640x480.{label}.fps'] = metric(len(clip) / seconds, 'frames/s')
+        results[f'clip.640x480.{label}.recall'] = metric(recall, 'ratio')
+
+    # Seated class: nothing moves, MotionGate skips detection between forced checks
+    static_clip = synthesize_sequence(faces, 640, 480, n_frames=60 if quick else 180, max_shift=0)
+    scheduler = DetectionScheduler(cascade, scale_factor=1.2, min_neighbors=5, min_size=(50, 50))
+    gate = MotionGate()
+
+    def detect_static():
+        return [scheduler.detect(gray) for gray, _ in static_clip if gate.should_process(gray)]
+
+    seconds = time_call(detect_static, repeat=3)
+    results['static.640x480.gated.fps'] = metric(len(static_clip) / seconds, 'frames/s')
+    results['static.640x480.gated.skip_rate'] = metric(gate.skip_rate, 'ratio')
+
+    # Every detector backend whose model file is available, same 640x480 frames
+    frames = synthesize_frames(faces, 640, 480, n_frames=5 if quick else 10)
+    for backend in DETECTOR_BACKENDS:
+        try:
+            detector = create_face_detector(backend, tiled=False)
+        except FileNotFoundError as e:
+            print(f"  [skip] backend {backend}: {e}")
+            continue
+
+        def detect_backend():
+            return [detector.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5, minSize=(50, 50))
+                    for gray, _ in frames]
+
+        seconds = time_call(detect_backend, repeat=3)
+        detections = detect_backend()
+        recall = sum(detection_recall(d, boxes) for d, (_, boxes) in zip(detections, frames)) / len(frames)
+        results[f'backend.{backend}.640x480.fps'] = metric(len(frames) / seconds, 'frames/s')
+        results[f'backend.{backend}.640x480.recall'] = metric(recall, 'ratio')
+
+    # High-resolution classroom: many small faces, whole frame vs. tiles on a thread pool
+    # (at least two threads so tiling is exercised even on a single-core machine)
+    workers = max(2, os.cpu_count() or 1)
+    for width, height in (QUICK_TILED_RESOLUTIONS if quick else TILED_RESOLUTIONS):
+        frames = synthesize_frames(faces, width, height, n_frames=2 if quick else 3,
+                                   faces_per_frame=6, size_range=(0.03, 0.15))
+        tiled = TiledDetector(workers=workers)
+        for label, detector in (('whole', cascade), ('tiled', tiled)):
+            scheduler = DetectionScheduler(detector, scale_factor=1.2, min_neighbors=5, min_size=(50, 50),
+                                           full_scan_interval=1, downscale=False)
+
+            def detect_large():
+                return [scheduler.detect(gray) for gray, _ in frames]
+
+            seconds = time_call(detect_large, repeat=1 if quick else 2)
+            detections = detect_large()
+            recall = sum(detection_recall(d, boxes) for d, (_, boxes) in zip(detections, frames)) / len(frames)
+            results[f'{label}.{width}x{height}.fps'] = metric(len(frames) / seconds, 'frames/s')
+            results[f'{label}.{width}x{height}.recall'] = metric(recall, 'ratio')
+        tiled.close()
+
+    return results
@@ -0,0 +1,157 @@
+"""
+Gallery matching throughput vs. gallery size
+Tốc độ so khớp khuôn mặt theo kích thước gallery
+"""
+
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+from common import (metric, time_call, load_dataset_faces, build_synthetic_gallery,
+                    augment_face, create_benchmark_database)
+from utils.config import CONFIDENCE_THRESHOLD
+from core.matchers import MATCHERS, CompactGallery, ThumbnailPrefilter, create_matcher, normalize_face
+
+GALLERY_SIZES = [30, 100, 300, 1000]
+PROTOTYPE_TOP_STUDENTS = 10  # Students compared exactly in the prototype runs (off in the default config)
+QUICK_GALLERY_SIZES = [30, 100]
+
+
+def make_recognizer(tmp_dir):
+    """AttendanceFaceRecognizer backed by a throwaway database"""
+    from core.face_recognizer import AttendanceFaceRecognizer
+
+    db, _, _ = create_benchmark_database(os.path.join(tmp_dir, 'matching.db'), n_students=0)
+    return AttendanceFaceRecognizer(db)
+
+
+def run(quick=False):
+    results = {}
+    faces, _ = load_dataset_faces()
+    rng = np.random.default_rng(1)
+    probes = [augment_face(faces[i % len(faces)], rng) for i in range(5)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        recognizer = make_recognizer(tmp_dir)
+
+        for size in (QUICK_GALLERY_SIZES if quick else GALLERY_SIZES):
+            gallery, ids = build_synthetic_gallery(faces, size)
+            recognizer.faces_data = gallery
+            recognizer.ids_data = ids
+            recognizer.student_names = {int(i): f"ID {i}" for i in np.unique(ids)}
+            # Accuracy probes: fresh augmentations of known gallery samples
+            picks = rng.choice(size, min(size, 20), replace=False)
+            labelled = [(augment_face(gallery[i], rng), ids[i]) for i in picks]
+
+            # Core recognizer (multi-scale MAD), thumbnail prefilter vs. every gallery face
+            recognizer.mad_prefilter = ThumbnailPrefilter(gallery, top_k=0)
+            seconds = time_call(lambda: [recognizer.enhanced_face_recognition(p) for p in probes],
+                                repeat=3 if quick else 5)
+            results[f'core_mad_exhaustive.gallery_{size}.faces_per_sec'] = metric(len(probes) / seconds, 'faces/s')
+            exhaustive = [recognizer.enhanced_face_recognition(p) for p, _ in labelled]
+
+            recognizer.mad_prefilter = None
+            seconds = time_call(lambda: [recognizer.enhanced_face_recognition(p) for p in probes],
+                                repeat=3 if quick else 5)
+            results[f'core_mad.gallery_{size}.faces_per_sec'] = metric(len(probes) / seconds, 'faces/s')
+            # Share of faces where the prefilter keeps the exhaustive best match
+            agreement = np.mean([recognizer.enhanced_face_recognition(p)[0] == e[0]
+                                 for (p, _), e in zip(labelled, exhaustive)])
+            results[f'core_mad.gallery_{size}.prefilter_agreement'] = metric(agreement, 'ratio')
+            # Per-face latency spread (allocation churn shows up as jitter in the tail)
+            latencies = []
+            for probe in probes * 4:
+                start = time.perf_counter()
+                recognizer.enhanced_face_recognition(probe)
+                latencies.append((time.perf_counter() - start) * 1000)
+            results[f'core_mad.gallery_{size}.p95_ms'] = metric(float(np.percentile(latencies, 95)), 'ms',
+                                                                higher_is_better=False)
+
+            # Same recognizer on compact galleries (64x64 uint8 / 4-bit faces instead of the crops)
+            for bits in (8, 4):
+                compact = CompactGallery.from_faces(gallery, bits=bits)
+                recognizer.faces_data = compact
+                recognizer.mad_prefilter = None
+                seconds = time_call(lambda: [recognizer.enhanced_face_recognition(p) for p in probes],
+                                    repeat=3 if quick else 5)
+                agreement = np.mean([recognizer.enhanced_face_recognition(p)[0] == e[0]
+                                     for (p, _), e in zip(labelled, exhaustive)])
+                results[f'compact_{bits}bit.gallery_{size}.faces_per_sec'] = metric(len(probes) / seconds, 'faces/s')
+                results[f'compact_{bits}bit.gallery_{size}.agreement'] = metric(agreement, 'ratio')
+                results[f'compact_{bits}bit.gallery_{size}.bytes'] = metric(compact.nbytes, 'bytes',
+                                                                            higher_is_better=False)
+            recognizer.faces_data = gallery
+
+            # GUI recognizer (single-scale MAD), called without building the Tk window
+            from gui.main_app import AttendanceSystemGUI
+            gui_state = SimpleNamespace(trained_faces=gallery, trained_ids=ids,
+                                        face_names=recognizer.student_names)
+            seconds = time_call(lambda: [AttendanceSystemGUI.recognize_face(gui_state, p) for p in probes],
+                                repeat=3 if quick else 5)
+            results[f'gui_mad.gallery_{size}.faces_per_sec'] = metric(len(probes) / seconds, 'faces/s')
+
+            # Matching engines from core/matchers.py, fitted on the same gallery
+            # Same probes in a bright room: higher gain and offset, clipped highlights
+            bright = [(cv2.convertScaleAbs(face, alpha=1.3, beta=60), label) for face, label in labelled]
+            results[f'raw.gallery_{size}.bytes'] = metric(sum(face.nbytes for face in gallery), 'bytes',
+                                                          higher_is_better=False)
+            for engine in MATCHERS:
+                matcher = create_matcher(engine).fit(gallery, ids)
+                seconds = time_call(lambda: [matcher.match(p) for p in probes], repeat=3 if quick else 5)
+                matches = [matcher.match(face) for face, _ in labelled]
+                accuracy = np.mean([m[0] == label for m, (_, label) in zip(matches, labelled)])
+                # Held-out genuine faces that are also confident enough to be recorded
+                accepted = np.mean([m[0] == label and m[1] >= CONFIDENCE_THRESHOLD
+                                    for m, (_, label) in zip(matches, labelled)])
+                bright_accuracy = np.mean([matcher.match(face)[0] == label for face, label in bright])
+                results[f'{engine}.gallery_{size}.faces_per_sec'] = metric(len(probes) / seconds, 'faces/s')
+                results[f'{engine}.gallery_{size}.accuracy'] = metric(accuracy, 'ratio')
+                results[f'{engine}.gallery_{size}.accepted'] = metric(accepted, 'ratio')
+                results[f'{engine}.gallery_{size}.bright_accuracy'] = metric(bright_accuracy, 'ratio')
+                results[f'{engine}.gallery_{size}.bytes'] = metric(matcher.nbytes, 'bytes', higher_is_better=False)
+
+                # First pass over per-student prototypes, exact distances for the closest students only
+                matcher.build_prototypes(top_students=PROTOTYPE_TOP_STUDENTS)
+                seconds = time_call(lambda: [matcher.match(p) for p in probes], repeat=3 if quick else 5)
+                accuracy = np.mean([matcher.match(face)[0] == label for face, label in labelled])
+                results[f'{engine}.gallery_{size}.prototype.faces_per_sec'] = metric(len(probes) / seconds, 'faces/s')
+                results[f'{engine}.gallery_{size}.prototype.accuracy'] = metric(accuracy, 'ratio')
+
+            # Mosaic engine with the brightness-invariant correlation instead of TM_SQDIFF
+            matcher = create_matcher('mosaic', method='ccoeff_normed').fit(gallery, ids)
+            seconds = time_call(lambda: [matcher.match(p) for p in probes], repeat=3 if quick else 5)
+            accuracy = np.mean([matcher.match(face)[0] == label for face, label in bright])
+            # The calibrated correlation scale against CONFIDENCE_THRESHOLD, as for the engines above
+            accepted = np.mean([m[0] == label and m[1] >= CONFIDENCE_THRESHOLD
+                                for m, label in ((matcher.match(face), label) for face, label in labelled)])
+            results[f'mosaic_ccoeff.gallery_{size}.faces_per_sec'] = metric(len(probes) / seconds, 'faces/s')
+            results[f'mosaic_ccoeff.gallery_{size}.bright_accuracy'] = metric(accuracy, 'ratio')
+            results[f'mosaic_ccoeff.gallery_{size}.accepted'] = metric(accepted, 'ratio')
+
+            # The mosaic engine's TM_SQDIFF as one NumPy matrix product over the same tiles
+            matcher = create_matcher('mosaic').fit(gallery, ids)
+            tiles = matcher.features(slice(None))
+            tile_norms = np.einsum('ij,ij->i', tiles, tiles)
+
+            def numpy_sqdiff(face):
+                probe = normalize_face(face, matcher.face_size)
+                return ids[int(np.argmin(tile_norms - 2.0 * (tiles @ probe)))]
+
+            seconds = time_call(lambda: [numpy_sqdiff(p) for p in probes], repeat=3 if quick else 5)
+            accuracy = np.mean([numpy_sqdiff(face) == label for face, label in labelled])
+            agreement = np.mean([numpy_sqdiff(face) == matcher.match(face)[0] for face, _ in labelled])
+            results[f'numpy_sqdiff.gallery_{size}.faces_per_sec'] = metric(len(probes) / seconds, 'faces/s')
+            results[f'numpy_sqdiff.gallery_{size}.accuracy'] = metric(accuracy, 'ratio')
+            results[f'numpy_sqdiff.gallery_{size}.agreement'] = metric(agreement, 'ratio')
+
+            # PCA coefficients stored as float16
+            matcher = create_matcher('pca', storage_dtype='float16').fit(gallery, ids)
+            accuracy = np.mean([matcher.match(face)[0] == label for face, label in labelled])
+            results[f'pca_float16.gallery_{size}.accuracy'] = metric(accuracy, 'ratio')
+            results[f'pca_float16.gallery_{size}.bytes'] = metric(matcher.nbytes, 'bytes', higher_is_better=False)
+
+    return results
@@ -0,0 +1,39 @@
+"""
+Report query time vs. attendance table size
+Thời gian truy vấn báo cáo theo số bản ghi điểm danh
+"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from common import metric, time_call, create_benchmark_database
+
+TABLE_SIZES = [1000, 10000, 100000]
+QUICK_TABLE_SIZES = [1000, 10000]
+
+
+def run(quick=False):
+    from reports.report_generator import AttendanceReportGenerator
+
+    results = {}
+    end_date = datetime.now().strftime('%Y-%m-%d')
+    start_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in (QUICK_TABLE_SIZES if quick else TABLE_SIZES):
+            db_path = os.path.join(tmp_dir, f'reports_{size}.db')
+            create_benchmark_database(db_path, n_students=500, n_records=size, n_sessions=200)
+            generator = AttendanceReportGenerator(db_path)
+
+            queries = {
+                'attendance_by_date_range': lambda: generator.get_attendance_by_date_range(start_date, end_date),
+                'daily_summary': lambda: generator.get_daily_attendance_summary(start_date, end_date),
+                'student_summary': lambda: generator.get_student_attendance_summary(start_date, end_date),
+                'report_summary': lambda: generator.get_report_summary(start_date, end_date),
+            }
+            for name, query in queries.items():
+                seconds = time_call(query, repeat=3)
+                results[f'{name}.records_{size}.ms'] = metric(seconds * 1000, 'ms', higher_is_better=False)
+
+    return results
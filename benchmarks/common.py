@@ -0,0 +1,278 @@
+"""
+Shared helpers for the headless benchmark suite
+Các hàm dùng chung cho bộ benchmark (không cần camera, không cần GUI)
+"""
+
+import json
+import os
+import sys
+import time
+import random
+import statistics
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+
+# Make src/ importable the same way main.py does
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(PROJECT_ROOT, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+DATASET_DIR = os.path.join(PROJECT_ROOT, 'data', 'dataset')
+CASCADE_PATH = os.path.join(PROJECT_ROOT, 'assets', 'haarcascade_frontalface_default.xml')
+
+
+# =============================================================================
+# RESULT HELPERS
+# =============================================================================
+
+def metric(value, unit, higher_is_better=True):
+    """Build one machine-readable benchmark result"""
+    return {'value': float(value), 'unit': unit, 'higher_is_better': higher_is_better}
+
+
+def time_call(func, repeat=5, warmup=1):
+    """Run func repeatedly and return the median wall time in seconds"""
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+# =============================================================================
+# FACE DATA
+# =============================================================================
+
+def load_dataset_faces(dataset_dir=DATASET_DIR):
+    """Load grayscale face crops and IDs from data/dataset (User.ID.count.jpg)"""
+    faces, ids = [], []
+    for filename in sorted(os.listdir(dataset_dir)):
+        if not filename.endswith('.jpg'):
+            continue
+        try:
+            face_id = int(filename.split('.')[1])
+        except (IndexError, ValueError):
+            continue
+        img = cv2.imread(os.path.join(dataset_dir, filename), cv2.IMREAD_GRAYSCALE)
+        if img is not None:
+            faces.append(img)
+            ids.append(face_id)
+    if not faces:
+        raise RuntimeError(f"No face crops found in {dataset_dir}")
+    return faces, np.array(ids)
+
+
+def augment_face(face, rng):
+    """Cheap photometric/geometric jitter so synthetic identities are not pixel-identical"""
+    h, w = face.shape
+    angle = rng.uniform(-8, 8)
+    scale = rng.uniform(0.92, 1.08)
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, scale)
+    matrix[:, 2] += rng.uniform(-0.04, 0.04, size=2) * (w, h)
+    out = cv2.warpAffine(face, matrix, (w, h), borderMode=cv2.BORDER_REFLECT)
+    if rng.random() < 0.5:
+        out = cv2.flip(out, 1)
+    gain = rng.uniform(0.75, 1.25)
+    bias = rng.uniform(-20, 20)
+    out = np.clip(out.astype(np.float32) * gain + bias, 0, 255).astype(np.uint8)
+    return out
+
+
+def build_synthetic_gallery(faces, n_samples, samples_per_identity=30, seed=0):
+    """
+    Build a gallery of n_samples crops spread over synthetic identities
+
+    Each synthetic identity is an augmented copy of one source crop, so the
+    gallery has the same size distribution as real enrollments.
+    """
+    rng = np.random.default_rng(seed)
+    gallery, ids = [], []
+    identity = 0
+    while len(gallery) < n_samples:
+        identity += 1
+        base = augment_face(faces[rng.integers(len(faces))], rng)
+        for _ in range(min(samples_per_identity, n_samples - len(gallery))):
+            gallery.append(augment_face(base, rng))
+            ids.append(identity)
+    gallery_array = np.empty(len(gallery), dtype=object)
+    gallery_array[:] = gallery
+    return gallery_array, np.array(ids)
+
+
+# =============================================================================
+# FRAMES
+# =============================================================================
+
+def synthesize_frames(faces, width, height, n_frames=10, faces_per_frame=3, seed=0, size_range=(0.12, 0.3)):
+    """
+    Compose grayscale frames with face crops pasted at known positions
+
+    Face sides are drawn from `size_range` times the shorter frame side
+    (small values mimic students at the back of a large room).
+
+    Returns:
+        List of (gray_frame, ground_truth_boxes) with boxes as (x, y, w, h)
+    """
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(n_frames):
+        # Smooth textured background (classroom-like clutter, not flat colour)
+        noise = rng.integers(0, 255, size=(max(1, height // 16), max(1, width // 16)), dtype=np.uint8)
+        frame = cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC)
+        frame = cv2.GaussianBlur(frame, (0, 0), 3)
+
+        boxes = []
+        for _ in range(faces_per_frame * 4):
+            if len(boxes) == faces_per_frame:
+                break
+            size = int(rng.uniform(*size_range) * min(width, height))
+            if size < 40:
+                size = 40
+            x = int(rng.integers(0, max(1, width - size)))
+            y = int(rng.integers(0, max(1, height - size)))
+            if any(_overlap((x, y, size, size), b) > 0 for b in boxes):
+                continue
+            face = cv2.resize(faces[rng.integers(len(faces))], (size, size))
+            frame[y:y + size, x:x + size] = face
+            boxes.append((x, y, size, size))
+        frames.append((frame, boxes))
+    return frames
+
+
+def load_recorded_frames(frames_dir):
+    """
+    Load grayscale frames and ground-truth boxes listed in <frames_dir>/annotations.json
+
+    annotations.json maps each image file name to its face boxes:
+        {"frame_0001.jpg": [[x, y, w, h], ...], ...}
+
+    Returns:
+        List of (gray_frame, ground_truth_boxes) like synthesize_frames
+    """
+    annotations_path = os.path.join(frames_dir, 'annotations.json')
+    if not os.path.exists(annotations_path):
+        raise FileNotFoundError(f"Ground truth not found: {annotations_path}")
+    with open(annotations_path, encoding='utf-8') as f:
+        annotations = json.load(f)
+
+    frames = []
+    for filename, boxes in sorted(annotations.items()):
+        gray = cv2.imread(os.path.join(frames_dir, filename), cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            print(f"[WARNING] Cannot read {filename}, skipped")
+            continue
+        frames.append((gray, [tuple(int(v) for v in box) for box in boxes]))
+    if not frames:
+        raise RuntimeError(f"No readable frames in {frames_dir}")
+    return frames
+
+
+def synthesize_sequence(faces, width, height, n_frames=30, faces_per_frame=3, max_shift=2, seed=0):
+    """
+    Compose a temporally coherent clip: the same faces drift a few pixels per frame
+
+    Returns:
+        List of (gray_frame, ground_truth_boxes) like synthesize_frames
+    """
+    rng = np.random.default_rng(seed)
+    background, boxes = synthesize_frames(faces, width, height, n_frames=1,
+                                          faces_per_frame=faces_per_frame, seed=seed)[0]
+    crops = [background[y:y + h, x:x + w].copy() for x, y, w, h in boxes]
+    # Background without faces: blur the pasted regions away
+    base = cv2.GaussianBlur(background, (0, 0), 15)
+
+    positions = [[x, y] for x, y, _, _ in boxes]
+    frames = []
+    for _ in range(n_frames):
+        frame = base.copy()
+        current = []
+        for crop, pos in zip(crops, positions):
+            size = crop.shape[0]
+            pos[0] = int(np.clip(pos[0] + rng.integers(-max_shift, max_shift + 1), 0, width - size))
+            pos[1] = int(np.clip(pos[1] + rng.integers(-max_shift, max_shift + 1), 0, height - size))
+            frame[pos[1]:pos[1] + size, pos[0]:pos[0] + size] = crop
+            current.append((pos[0], pos[1], size, size))
+        noise = rng.normal(0, 2, size=frame.shape)
+        frames.append((np.clip(frame + noise, 0, 255).astype(np.uint8), current))
+    return frames
+
+
+def _overlap(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    return ix * iy
+
+
+def iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes"""
+    inter = _overlap(a, b)
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def detection_recall(detections, ground_truth, threshold=0.3):
+    """Fraction of ground-truth boxes matched by a detection with IoU >= threshold"""
+    if not ground_truth:
+        return 1.0
+    hits = sum(1 for gt in ground_truth if any(iou(gt, tuple(d)) >= threshold for d in detections))
+    return hits / len(ground_truth)
+
+
+# =============================================================================
+# DATABASE
+# =============================================================================
+
+def create_benchmark_database(db_path, n_students=200, n_records=0, n_sessions=20, seed=0):
+    """
+    Create a schema-complete database with synthetic students and attendance
+
+    Returns:
+        (DatabaseManager, list of student DB IDs, list of session IDs)
+    """
+    from database.models import DatabaseManager
+
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    db = DatabaseManager(db_path)
+
+    rng = random.Random(seed)
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    class_ids = [row[0] for row in cursor.execute("SELECT id FROM classes")]
+
+    cursor.executemany(
+        "INSERT INTO students (student_id, full_name, class_id) VALUES (?, ?, ?)",
+        [(f"BM{i:06d}", f"Benchmark Student {i}", rng.choice(class_ids)) for i in range(n_students)]
+    )
+    student_ids = [row[0] for row in cursor.execute("SELECT id FROM students")]
+
+    today = datetime.now()
+    cursor.executemany(
+        "INSERT INTO attendance_sessions (session_name, class_id, session_date, start_time) VALUES (?, ?, ?, ?)",
+        [(f"Benchmark {i}", rng.choice(class_ids), (today - timedelta(days=i % 90)).date().isoformat(), "08:00:00")
+         for i in range(n_sessions)]
+    )
+    session_ids = [row[0] for row in cursor.execute("SELECT id FROM attendance_sessions")]
+
+    def records():
+        for _ in range(n_records):
+            check_in = today - timedelta(days=rng.randint(0, 89), minutes=rng.randint(0, 600))
+            yield (rng.choice(session_ids), rng.choice(student_ids), check_in,
+                   'present', round(rng.uniform(55.0, 95.0), 1))
+
+    cursor.executemany(
+        "INSERT INTO attendance_records (session_id, student_id, check_in_time, status, confidence_score) "
+        "VALUES (?, ?, ?, ?, ?)",
+        records()
+    )
+    conn.commit()
+    conn.close()
+    return db, student_ids, session_ids
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Headless benchmark suite for the recognition, detection, database and report hot paths
+Bộ benchmark không cần camera/GUI cho các đoạn code quan trọng
+
+Usage:
+    python benchmarks/run_benchmarks.py                     # run everything
+    python benchmarks/run_benchmarks.py --quick             # smaller sizes
+    python benchmarks/run_benchmarks.py --only matching,db  # subset
+    python benchmarks/run_benchmarks.py --save-baseline     # store results as the new baseline
+    python benchmarks/run_benchmarks.py --only detection --frames recordings/room1  # recorded frames
+
+Results are written as JSON and compared against benchmarks/baseline.json
+(if present). The exit code is 1 when a metric regresses by more than
+--tolerance, so the script can gate CI.
+"""
+
+import argparse
+import importlib
+import inspect
+import json
+import os
+import platform
+import sys
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+import common  # noqa: E402
+
+# Importing common puts src/ on sys.path for the benchmark modules
+assert common.SRC_DIR in sys.path
+
+# name -> module exposing run(quick=False) -> {metric_name: metric(...)}
+BENCHMARKS = {
+    'matching': 'bench_matching',
+    'ann': 'bench_ann',
+    'coreset': 'bench_coreset',
+    'detection': 'bench_detection',
+    'db': 'bench_database',
+    'reports': 'bench_reports',
+}
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, 'results', 'latest.json')
+
+
+def collect_environment():
+    import cv2
+    import numpy as np
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+    }
+
+
+def run_benchmarks(names, quick=False, **options):
+    """Run benchmark modules; options (e.g. frames_dir) go to those whose run() accepts them"""
+    results = {}
+    for name in names:
+        print(f"▶️  Running {name} benchmarks...")
+        module = importlib.import_module(BENCHMARKS[name])
+        parameters = inspect.signature(module.run).parameters
+        kwargs = {key: value for key, value in options.items() if key in parameters}
+        for metric_name, value in module.run(quick=quick, **kwargs).items():
+            results[f'{name}.{metric_name}'] = value
+            print(f"   {metric_name:<55} {value['value']:>12.3f} {value['unit']}")
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    Compare results with a stored baseline
+
+    Returns:
+        List of (metric_name, baseline_value, current_value, relative_change) regressions
+    """
+    regressions = []
+    print("\n=== COMPARISON WITH BASELINE ===")
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None or previous['value'] == 0:
+            continue
+        change = (current['value'] - previous['value']) / abs(previous['value'])
+        worse = -change if current['higher_is_better'] else change
+        marker = "❌" if worse > tolerance else ("✅" if worse < -tolerance else "  ")
+        print(f"{marker} {name:<60} {previous['value']:>12.3f} -> {current['value']:>12.3f} ({change:+.1%})")
+        if worse > tolerance:
+            regressions.append((name, previous['value'], current['value'], change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run headless performance benchmarks")
+    parser.add_argument('--only', help=f"Comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--quick', action='store_true', help="Use smaller problem sizes")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Where to write the JSON results")
+    parser.add_argument('--frames', help="Recorded frames + annotations.json for the detection benchmark "
+                                         "(default: synthetic frames)")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="Allowed relative slowdown before a metric counts as a regression")
+    args = parser.parse_args(argv)
+
+    names = list(BENCHMARKS) if not args.only else [n.strip() for n in args.only.split(',') if n.strip()]
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown benchmark(s): {', '.join(unknown)}")
+
+    report = {
+        'environment': collect_environment(),
+        'quick': args.quick,
+        'frames': args.frames,
+        'results': run_benchmarks(names, quick=args.quick, frames_dir=args.frames),
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n📁 Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"📌 Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("ℹ️  No baseline found; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('quick') != args.quick:
+        print("⚠️  Baseline was recorded with a different --quick setting; sizes may not match")
+
+    regressions = compare_with_baseline(report['results'], baseline.get('results', {}), args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+        return 1
+    print("\n✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
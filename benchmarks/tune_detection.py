@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Detection parameter tuner: sweep scaleFactor / minNeighbors / minSize
+Dò tham số phát hiện khuôn mặt: tìm cấu hình nhanh nhất mà vẫn đạt recall mục tiêu
+
+Usage:
+    python benchmarks/tune_detection.py                           # synthetic frames from data/dataset
+    python benchmarks/tune_detection.py --frames recordings/room1 # recorded frames + annotations.json
+    python benchmarks/tune_detection.py --recall-target 0.98 --dry-run
+
+A recorded frame set is a directory of images plus annotations.json mapping
+each file name to its ground-truth face boxes:
+    {"frame_0001.jpg": [[x, y, w, h], ...], ...}
+
+Every combination is run through DetectionScheduler full scans (the same
+code path as the application, including downscaling). The recall /
+throughput Pareto front is printed, and the fastest setting whose recall
+reaches --recall-target is written to config/detection_params.json, which
+utils/config.py loads for every call site.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import (time_call, load_dataset_faces, load_recorded_frames, synthesize_frames,  # noqa: E402
+                    detection_recall, iou)
+from core.detection import DetectionScheduler  # noqa: E402
+from core.detectors import DETECTOR_BACKENDS, create_face_detector  # noqa: E402
+from utils.config import (DETECTION_PARAMS_PATH, DETECTION_SCALE_FACTOR, DETECTION_MIN_NEIGHBORS,  # noqa: E402
+                          DETECTION_MIN_SIZE)
+
+DEFAULT_SCALE_FACTORS = [1.05, 1.1, 1.2, 1.3, 1.4]
+DEFAULT_MIN_NEIGHBORS = [3, 4, 5, 6]
+DEFAULT_MIN_SIZES = [30, 40, 50, 60, 80]
+DEFAULT_RECALL_TARGET = 0.95
+
+
+def parse_list(text, cast):
+    return [cast(value) for value in text.split(',') if value.strip()]
+
+
+def evaluate(detector, frames, scale_factor, min_neighbors, min_size, repeat):
+    """Throughput, recall and precision of one parameter combination"""
+    scheduler = DetectionScheduler(detector, scale_factor=scale_factor, min_neighbors=min_neighbors,
+                                   min_size=(min_size, min_size), full_scan_interval=1)
+
+    def detect_all():
+        return [scheduler.detect(gray) for gray, _ in frames]
+
+    seconds = time_call(detect_all, repeat=repeat, warmup=0)
+    detections = detect_all()
+
+    recall = sum(detection_recall(d, boxes) for d, (_, boxes) in zip(detections, frames)) / len(frames)
+    n_detections = sum(len(d) for d in detections)
+    true_positives = sum(1 for d, (_, boxes) in zip(detections, frames)
+                         for box in d if any(iou(tuple(box), gt) >= 0.3 for gt in boxes))
+    return {
+        'scale_factor': scale_factor,
+        'min_neighbors': min_neighbors,
+        'min_size': [min_size, min_size],
+        'fps': len(frames) / seconds,
+        'recall': recall,
+        'precision': true_positives / n_detections if n_detections else 1.0,
+    }
+
+
+def _score(result):
+    # fps is rounded so timing noise does not decide between equivalent settings
+    return result['recall'], round(result['fps'], 1), result['precision']
+
+
+def pareto_front(results):
+    """
+    Results no other result beats on recall and fps, fastest first
+    (precision only separates settings that are equal on both)
+    """
+    def dominates(a, b):
+        return all(x >= y for x, y in zip(a, b)) and a != b
+
+    scores = [_score(r) for r in results]
+    front = [r for r, score in zip(results, scores) if not any(dominates(other, score) for other in scores)]
+    return sorted(front, key=lambda r: r['fps'], reverse=True)
+
+
+def choose(results, recall_target):
+    """Fastest setting reaching the recall target (ties: higher precision)"""
+    eligible = [r for r in results if r['recall'] >= recall_target]
+    if not eligible:
+        return None
+    return max(eligible, key=lambda r: _score(r)[1:])
+
+
+def format_row(result):
+    return (f"   scale {result['scale_factor']:<5} neighbors {result['min_neighbors']:<2} "
+            f"min {result['min_size'][0]:>3}px  {result['fps']:7.1f} fps  "
+            f"recall {result['recall']:.3f}  precision {result['precision']:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune face detection parameters against ground truth")
+    parser.add_argument('--frames', help="Directory with recorded frames and annotations.json "
+                                         "(default: synthetic frames from data/dataset)")
+    parser.add_argument('--resolution', default='640x480', help="Synthetic frame size (default: 640x480)")
+    parser.add_argument('--n-frames', type=int, default=12, help="Synthetic frames (default: 12)")
+    parser.add_argument('--scale-factors', type=lambda t: parse_list(t, float), default=DEFAULT_SCALE_FACTORS)
+    parser.add_argument('--min-neighbors', type=lambda t: parse_list(t, int), default=DEFAULT_MIN_NEIGHBORS)
+    parser.add_argument('--min-sizes', type=lambda t: parse_list(t, int), default=DEFAULT_MIN_SIZES,
+                        help="Smallest face sides to try, pixels")
+    parser.add_argument('--recall-target', type=float, default=DEFAULT_RECALL_TARGET)
+    parser.add_argument('--detector', choices=sorted(DETECTOR_BACKENDS),
+                        help="Detector backend (default: FACE_DETECTOR from config)")
+    parser.add_argument('--repeat', type=int, default=2, help="Timed runs per combination (median)")
+    parser.add_argument('--output', default=DETECTION_PARAMS_PATH)
+    parser.add_argument('--dry-run', action='store_true', help="Print the choice without writing it")
+    args = parser.parse_args()
+
+    if args.frames:
+        frames = load_recorded_frames(args.frames)
+        source = args.frames
+    else:
+        width, height = (int(v) for v in args.resolution.lower().split('x'))
+        faces, _ = load_dataset_faces()
+        frames = synthesize_frames(faces, width, height, n_frames=args.n_frames)
+        source = f"synthetic {width}x{height}"
+    detector = create_face_detector(args.detector)
+
+    combinations = list(itertools.product(args.scale_factors, args.min_neighbors, args.min_sizes))
+    print(f"🔍 {detector.describe()} on {len(frames)} frames ({source}), {len(combinations)} combinations")
+
+    current = evaluate(detector, frames, DETECTION_SCALE_FACTOR, DETECTION_MIN_NEIGHBORS,
+                       DETECTION_MIN_SIZE[0], args.repeat)
+    print(f"📌 Current setting:\n{format_row(current)}")
+
+    results = []
+    for done, (scale_factor, min_neighbors, min_size) in enumerate(combinations, 1):
+        results.append(evaluate(detector, frames, scale_factor, min_neighbors, min_size, args.repeat))
+        print(f"   [{done}/{len(combinations)}]{format_row(results[-1])[2:]}")
+
+    print("\n📈 Pareto front (recall vs. fps):")
+    for result in pareto_front(results):
+        print(format_row(result))
+
+    best = choose(results, args.recall_target)
+    if best is None:
+        print(f"\n❌ No setting reaches recall {args.recall_target:.2f}; nothing written")
+        return 1
+    print(f"\n✅ Fastest setting with recall >= {args.recall_target:.2f} "
+          f"({best['fps'] / current['fps']:.2f}x current speed):\n{format_row(best)}")
+
+    if args.dry_run:
+        return 0
+    tuned = {
+        'scale_factor': best['scale_factor'],
+        'min_neighbors': best['min_neighbors'],
+        'min_size': best['min_size'],
+        'recall': round(best['recall'], 4),
+        'precision': round(best['precision'], 4),
+        'fps': round(best['fps'], 2),
+        'recall_target': args.recall_target,
+        'detector': detector.name,
+        'frames': source,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(tuned, f, indent=2)
+    print(f"📁 Written to {args.output} (used by the recognizer, GUI, face collection and scripts/)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
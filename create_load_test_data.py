@@ -0,0 +1,100 @@
+"""
+Load-Test Data Generator
+Tạo database và gallery khuôn mặt cỡ lớn để kiểm thử hiệu năng
+
+Examples:
+    python create_load_test_data.py --preset small
+    python create_load_test_data.py --preset district --output data/load_test
+    python create_load_test_data.py --classes 50 --students-per-class 35 --sessions-per-day 6
+"""
+
+import argparse
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(current_dir, 'src'))
+
+from utils.load_test_data import (PRESETS, estimate_records, generate_attendance_database,
+                                  generate_face_gallery)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic attendance database and face gallery")
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='small')
+    parser.add_argument('--output', default=os.path.join('data', 'load_test'),
+                        help="Output directory (attendance.db + trainer/ gallery)")
+    parser.add_argument('--classes', type=int)
+    parser.add_argument('--students-per-class', type=int)
+    parser.add_argument('--terms', type=int)
+    parser.add_argument('--weeks-per-term', type=int)
+    parser.add_argument('--days-per-week', type=int, default=5)
+    parser.add_argument('--sessions-per-day', type=int)
+    parser.add_argument('--attendance-rate', type=float, default=0.93)
+    parser.add_argument('--late-rate', type=float, default=0.08)
+    parser.add_argument('--arrival-mean-min', type=float, default=-3.0,
+                        help="Mean check-in offset from lesson start for punctual students (minutes)")
+    parser.add_argument('--arrival-std-min', type=float, default=4.0)
+    parser.add_argument('--identities', type=int, help="Students that get a synthetic face gallery")
+    parser.add_argument('--samples-per-identity', type=int)
+    parser.add_argument('--face-size', type=int, default=64)
+    parser.add_argument('--no-gallery', action='store_true', help="Only generate the database")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--overwrite', action='store_true')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    config = dict(PRESETS[args.preset])
+    for key in ('classes', 'students_per_class', 'terms', 'weeks_per_term', 'sessions_per_day',
+                'identities', 'samples_per_identity'):
+        value = getattr(args, key)
+        if value is not None:
+            config[key] = value
+    config.update(days_per_week=args.days_per_week, attendance_rate=args.attendance_rate,
+                  late_rate=args.late_rate, arrival_mean_min=args.arrival_mean_min,
+                  arrival_std_min=args.arrival_std_min)
+
+    n_students = config['classes'] * config['students_per_class']
+    config['identities'] = min(config['identities'], n_students)
+
+    print("🎯 Load-Test Data Generator")
+    print("=" * 50)
+    print(f"📚 Classes: {config['classes']} × {config['students_per_class']} students = {n_students}")
+    print(f"⏰ {config['terms']} term(s) × {config['weeks_per_term']} weeks × "
+          f"{config['days_per_week']} days × {config['sessions_per_day']} sessions/day")
+    print(f"📝 Expected records: ~{estimate_records(**config):,}")
+    if not args.no_gallery:
+        print(f"🧑 Gallery: {config['identities']} identities × {config['samples_per_identity']} samples "
+              f"({args.face_size}px)")
+
+    os.makedirs(args.output, exist_ok=True)
+    db_path = os.path.join(args.output, 'attendance.db')
+
+    started = time.perf_counter()
+    try:
+        stats = generate_attendance_database(db_path, seed=args.seed, overwrite=args.overwrite, **config)
+    except FileExistsError as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"✅ Database: {stats['records']:,} records in {stats['seconds']:.1f}s -> {db_path}")
+
+    if not args.no_gallery:
+        gallery_start = time.perf_counter()
+        # Students are numbered 1..N in a fresh database
+        student_ids = list(range(1, config['identities'] + 1))
+        faces_path, ids_path = generate_face_gallery(
+            os.path.join(args.output, 'trainer'), student_ids,
+            samples_per_identity=config['samples_per_identity'], face_size=args.face_size, seed=args.seed
+        )
+        print(f"✅ Gallery in {time.perf_counter() - gallery_start:.1f}s -> {faces_path}, {ids_path}")
+
+    print(f"🎉 Done in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
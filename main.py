@@ -7,6 +7,9 @@ Run this file to start the attendance system:
     python main.py
 """
 
+import time
+_startup_start = time.perf_counter()  # Measure cold start, including module imports
+
 import sys
 import os
 import tkinter as tk
@@ -76,16 +79,35 @@ def main():
         logger.info("Database initialized successfully. Found {} classes.".format(len(db.get_all_classes())))
         print("✅ System initialized successfully!")
         
+        startup_timings = {'database': time.perf_counter() - _startup_start}
+        
         # Start GUI application
         print("🚀 Starting GUI application...")
+        stage_start = time.perf_counter()
         from gui.main_app import AttendanceSystemGUI
+        startup_timings['gui_import'] = time.perf_counter() - stage_start
         
+        stage_start = time.perf_counter()
         root = tk.Tk()
         app = AttendanceSystemGUI(root)
+        startup_timings['gui_build'] = time.perf_counter() - stage_start
+        
+        def report_startup_time():
+            total = time.perf_counter() - _startup_start
+            details = ", ".join(f"{name}: {seconds:.2f}s" for name, seconds in startup_timings.items())
+            print(f"⏱️ Startup completed in {total:.2f}s ({details})")
+            logger.info(f"Startup completed in {total:.2f}s ({details})")
+        
+        # Runs once the window has been drawn and the event loop is idle
+        root.after_idle(report_startup_time)
         
         # Graceful shutdown handling
         def on_closing():
             logger.info("Application closing gracefully")
+            if hasattr(app, 'report_executor'):
+                app.report_executor.shutdown()
+            if getattr(app, 'report_generator', None) is not None:
+                app.report_generator.close()
             if hasattr(app, 'camera') and app.camera is not None:
                 app.camera.release()
             root.quit()
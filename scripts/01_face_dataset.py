@@ -11,6 +11,13 @@ Developed by Marcelo Rovai - MJRoBot.org @ 21Feb18
 
 import cv2
 import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
+from core.detectors import create_face_detector  # noqa: E402
+# Detection parameters shared with the application (tuned values from config/detection_params.json)
+from utils.config import DETECTION_SCALE_FACTOR, DETECTION_MIN_NEIGHBORS, DETECTION_MIN_SIZE  # noqa: E402
 
 cam = cv2.VideoCapture(0)
 cam.set(3, 640) # set video width
@@ -25,7 +32,13 @@ if not cam.isOpened():
     print("3. Camera permissions are granted")
     exit()
 
-face_detector = cv2.CascadeClassifier('haarcascade_frontalface_default.xml')
+# Same detector backend as the application (FACE_DETECTOR in src/utils/config.py)
+try:
+    face_detector = create_face_detector()
+except (ValueError, FileNotFoundError) as e:
+    print(f"Error: Could not load face detector: {e}")
+    cam.release()
+    exit()
 
 # For each person, enter one numeric face id
 face_id = input('\n enter user id end press <return> ==>  ')
@@ -45,7 +58,9 @@ while(True):
         
     img = cv2.flip(img, 1) # flip video image vertically
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    faces = face_detector.detectMultiScale(gray, 1.3, 5)
+    faces = face_detector.detectMultiScale(gray, scaleFactor=DETECTION_SCALE_FACTOR,
+                                           minNeighbors=DETECTION_MIN_NEIGHBORS,
+                                           minSize=DETECTION_MIN_SIZE)
 
     for (x,y,w,h) in faces:
 
@@ -11,11 +11,19 @@ import cv2
 import numpy as np
 from PIL import Image
 import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
+from core.coreset import evaluate_selection, format_report, select_gallery  # noqa: E402
+from utils.config import GALLERY_SAMPLES_PER_STUDENT  # noqa: E402
 
 # Path for face image database
 path = 'dataset'
 
-detector = cv2.CascadeClassifier("haarcascade_frontalface_default.xml")
+# Same cascade file as the application (assets/ next to scripts/)
+CASCADE_PATH = os.path.join(PROJECT_ROOT, 'assets', 'haarcascade_frontalface_default.xml')
+detector = cv2.CascadeClassifier(CASCADE_PATH)
 
 def getImagesAndLabels(path):
     imagePaths = [os.path.join(path,f) for f in os.listdir(path) if f.endswith('.jpg')]     
@@ -64,6 +72,12 @@ if len(faces) > 0:
     faces_array = np.array(faces, dtype=object)  # Use object dtype for variable-sized arrays
     ids_array = np.array(ids)
     
+    # Up to 200 near-duplicate crops per student: keep GALLERY_SAMPLES_PER_STUDENT representatives
+    if GALLERY_SAMPLES_PER_STUDENT:
+        print(f"[INFO] {format_report(evaluate_selection(faces_array, ids_array))}")
+        keep = select_gallery(faces_array, ids_array)
+        faces_array, ids_array = faces_array[keep], ids_array[keep]
+    
     # Save the training data as numpy files
     np.save('data/trainer/faces_data.npy', faces_array)
     np.save('data/trainer/ids_data.npy', ids_array)
@@ -71,7 +85,7 @@ if len(faces) > 0:
     # Create a simple mapping file
     unique_ids = np.unique(ids_array)
     print(f"\n [INFO] {len(unique_ids)} unique faces trained: {unique_ids}")
-    print(f"[INFO] Total samples: {len(faces)}")
+    print(f"[INFO] Total samples: {len(faces_array)} (of {len(faces)} crops)")
     print(f"[INFO] Training data saved to data/trainer/ folder")
     print("[INFO] Files created:")
     print("  - data/trainer/faces_data.npy")
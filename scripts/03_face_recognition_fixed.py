@@ -10,6 +10,14 @@ Modified to work without opencv-contrib
 import cv2
 import numpy as np
 import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
+from core.detectors import create_face_detector  # noqa: E402
+from core.matchers import MADKernel  # noqa: E402
+# Detection parameters shared with the application (tuned values from config/detection_params.json)
+from utils.config import DETECTION_SCALE_FACTOR, DETECTION_MIN_NEIGHBORS, DETECTION_MIN_SIZE  # noqa: E402
 
 # Load training data
 try:
@@ -22,8 +30,12 @@ except:
     print("Make sure you have run 02_face_training_fixed.py first")
     exit()
 
-cascadePath = "haarcascade_frontalface_default.xml"
-faceCascade = cv2.CascadeClassifier(cascadePath)
+# Same detector backend as the application (FACE_DETECTOR in src/utils/config.py)
+try:
+    faceCascade = create_face_detector()
+except (ValueError, FileNotFoundError) as e:
+    print(f"[ERROR] Could not load face detector: {e}")
+    exit()
 
 font = cv2.FONT_HERSHEY_SIMPLEX
 
@@ -44,35 +56,17 @@ if not cam.isOpened():
     print("3. Camera permissions are granted")
     exit()
 
-# Define min window size to be recognized as a face
-minW = 0.1*cam.get(3)
-minH = 0.1*cam.get(4)
-
 print("[INFO] Camera ready. Press ESC to exit...")
 
+# Comparison buffers reused for every face (no per-comparison allocations)
+kernel = MADKernel(scales=(1.0,))
+
 def simple_face_recognition(face_img):
     """Simple face recognition using template matching"""
-    best_match_id = 0
-    best_confidence = float('inf')
-    
-    # Resize input face to match training data size (if needed)
-    for i, stored_face in enumerate(faces_data):
-        try:
-            # Resize both images to same size for comparison
-            target_size = min(face_img.shape[0], face_img.shape[1], stored_face.shape[0], stored_face.shape[1])
-            
-            if target_size > 20:  # Minimum size check
-                face_resized = cv2.resize(face_img, (target_size, target_size))
-                stored_resized = cv2.resize(stored_face, (target_size, target_size))
-                
-                # Calculate similarity (lower is better)
-                diff = np.mean(np.abs(face_resized.astype(float) - stored_resized.astype(float)))
-                
-                if diff < best_confidence:
-                    best_confidence = diff
-                    best_match_id = ids_data[i]
-        except:
-            continue
+    # Resize both images to the smaller size and compare pixel by pixel (lower is better)
+    kernel.set_probe(face_img)
+    best_row, best_confidence = kernel.best(faces_data, range(len(faces_data)))
+    best_match_id = ids_data[best_row] if best_confidence != float('inf') else 0
     
     # Convert to percentage confidence (higher is better)
     confidence = max(0, 100 - (best_confidence / 255 * 100))
@@ -91,9 +85,9 @@ while True:
     
     faces = faceCascade.detectMultiScale( 
         gray,
-        scaleFactor = 1.2,
-        minNeighbors = 5,
-        minSize = (int(minW), int(minH)),
+        scaleFactor = DETECTION_SCALE_FACTOR,
+        minNeighbors = DETECTION_MIN_NEIGHBORS,
+        minSize = DETECTION_MIN_SIZE,
     )
 
     for(x, y, w, h) in faces:
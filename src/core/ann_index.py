@@ -0,0 +1,211 @@
+"""
+Approximate Nearest-Neighbour Indexes (IVF, per-student prototypes)
+Chỉ mục tìm kiếm gần đúng cho gallery lớn: chỉ so khớp với các cụm gần nhất
+
+IVFIndex: the gallery's feature vectors are clustered with k-means (the
+coarse quantizer). Each gallery sample is stored in the inverted list of its
+nearest centroid; a query is compared with the centroids and only the
+samples of the `n_probe` closest lists are handed to the matcher's exact
+distance. More probes trade speed for recall.
+
+PrototypeIndex: every student is summarized by the mean and a few k-means
+centres of their own feature vectors. A query ranks students by their
+closest prototype (O(students)) and only the samples of the top few
+students are compared exactly.
+"""
+
+import math
+
+import numpy as np
+
+from utils.config import (IVF_LISTS, IVF_PROBES, IVF_TRAIN_SAMPLES, IVF_KMEANS_ITERATIONS, PROTOTYPE_CENTRES,
+                          PROTOTYPE_TOP_STUDENTS)
+
+ASSIGN_BATCH = 8192  # Vectors assigned to centroids per matrix product
+
+
+def _nearest_centroids(vectors, centroids, centroid_norms):
+    """Index of the nearest centroid of every vector (squared L2)"""
+    # |v - c|^2 = |v|^2 - 2 v.c + |c|^2; |v|^2 does not change the ranking
+    return np.argmin(centroid_norms - 2.0 * (vectors @ centroids.T), axis=1)
+
+
+def kmeans(vectors, n_clusters, iterations=IVF_KMEANS_ITERATIONS, seed=0):
+    """
+    Lloyd's k-means in NumPy
+
+    Returns:
+        (n_clusters, D) float32 centroids
+    """
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        norms = np.einsum('ij,ij->i', centroids, centroids)
+        labels = np.concatenate([_nearest_centroids(vectors[start:start + ASSIGN_BATCH], centroids, norms)
+                                 for start in range(0, len(vectors), ASSIGN_BATCH)])
+        counts = np.bincount(labels, minlength=n_clusters)
+        filled = counts > 0
+        # Sum the members of each cluster as contiguous runs of the label-sorted vectors
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        sums = np.add.reduceat(vectors[np.argsort(labels, kind='stable')], starts[filled], axis=0)
+        centroids[filled] = sums / counts[filled, None].astype(np.float32)
+        # Empty clusters restart on random vectors instead of staying dead
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+    return centroids
+
+
+class IVFIndex:
+    def __init__(self, n_lists=IVF_LISTS, n_probe=IVF_PROBES, train_samples=IVF_TRAIN_SAMPLES):
+        """
+        Inverted-file index over feature vectors
+
+        Args:
+            n_lists: Number of k-means clusters (0 = about 4 * sqrt(N))
+            n_probe: Lists searched per query (tunable after building)
+            train_samples: Vectors used to train k-means (all are assigned)
+        """
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.train_samples = train_samples
+        self.centroids = None
+        self.order = None    # Gallery row indices grouped by list
+        self.offsets = None  # List l holds order[offsets[l]:offsets[l + 1]]
+        self._centroid_norms = None
+
+    def __len__(self):
+        return 0 if self.order is None else len(self.order)
+
+    def build(self, feature_blocks, n_samples, seed=0):
+        """
+        Cluster the gallery and fill the inverted lists
+
+        Args:
+            feature_blocks: callable(start, stop) -> float32 feature vectors of gallery rows
+            n_samples: Gallery size
+        """
+        n_lists = self.n_lists or int(4 * math.sqrt(n_samples))
+        n_lists = max(1, min(n_lists, n_samples))
+        rng = np.random.default_rng(seed)
+
+        if n_samples > self.train_samples:
+            sample_rows = np.sort(rng.choice(n_samples, self.train_samples, replace=False))
+            training = np.concatenate([
+                feature_blocks(start, min(start + ASSIGN_BATCH, n_samples))[
+                    sample_rows[(sample_rows >= start) & (sample_rows < start + ASSIGN_BATCH)] - start]
+                for start in range(0, n_samples, ASSIGN_BATCH)])
+        else:
+            training = feature_blocks(0, n_samples)
+        self.centroids = kmeans(training, n_lists, seed=seed)
+        self._centroid_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+
+        labels = np.concatenate([_nearest_centroids(feature_blocks(start, min(start + ASSIGN_BATCH, n_samples)),
+                                                    self.centroids, self._centroid_norms)
+                                 for start in range(0, n_samples, ASSIGN_BATCH)])
+        self.order = np.argsort(labels, kind='stable').astype(np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=n_lists))]).astype(np.int64)
+        return self
+
+    def candidates(self, query, n_probe=None):
+        """Gallery rows in the n_probe lists closest to a query feature vector"""
+        n_probe = n_probe or self.n_probe
+        scores = self._centroid_norms - 2.0 * (self.centroids @ query)
+        if n_probe < len(scores):
+            lists = np.argpartition(scores, n_probe - 1)[:n_probe]
+        else:
+            lists = np.arange(len(scores))
+        return np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in lists])
+
+    def save(self, path):
+        np.savez(path, centroids=self.centroids, order=self.order, offsets=self.offsets,
+                 n_probe=np.array(self.n_probe))
+
+    @classmethod
+    def load(cls, path, n_probe=None):
+        with np.load(path, allow_pickle=False) as data:
+            index = cls(n_lists=len(data['centroids']), n_probe=n_probe or int(data['n_probe']))
+            index.centroids = data['centroids']
+            index.order = data['order']
+            index.offsets = data['offsets']
+        index._centroid_norms = np.einsum('ij,ij->i', index.centroids, index.centroids)
+        return index
+
+
+class PrototypeIndex:
+    def __init__(self, n_centres=PROTOTYPE_CENTRES, top_students=PROTOTYPE_TOP_STUDENTS):
+        """
+        Per-student prototype index
+
+        Args:
+            n_centres: k-means centres per student besides the mean (0 = mean only)
+            top_students: Students whose samples are compared exactly (tunable after building)
+        """
+        self.n_centres = n_centres
+        self.top_students = top_students
+        self.vectors = None  # Prototypes grouped by student
+        self.vector_offsets = None  # Student s owns vectors[vector_offsets[s]:vector_offsets[s + 1]]
+        self.order = None    # Gallery row indices grouped by student
+        self.offsets = None  # Student s owns order[offsets[s]:offsets[s + 1]]
+        self._vector_norms = None
+
+    def __len__(self):
+        return 0 if self.order is None else len(self.order)
+
+    @property
+    def n_students(self):
+        return 0 if self.offsets is None else len(self.offsets) - 1
+
+    def _group(self, ids):
+        """Group gallery rows by student (students in ascending ID order)"""
+        _, inverse = np.unique(np.asarray(ids), return_inverse=True)
+        self.order = np.argsort(inverse, kind='stable').astype(np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(inverse))]).astype(np.int64)
+
+    def build(self, feature_rows, ids, seed=0):
+        """
+        Compute the prototypes of every student
+
+        Args:
+            feature_rows: callable(rows) -> float32 feature vectors of those gallery rows
+            ids: Student ID of every gallery row
+        """
+        self._group(ids)
+        vectors, counts = [], []
+        for student in range(self.n_students):
+            features = np.asarray(feature_rows(self.order[self.offsets[student]:self.offsets[student + 1]]),
+                                  dtype=np.float32)
+            prototypes = [features.mean(axis=0, keepdims=True)]
+            if self.n_centres and len(features) > self.n_centres:
+                prototypes.append(kmeans(features, self.n_centres, iterations=5, seed=seed))
+            vectors.extend(prototypes)
+            counts.append(sum(len(p) for p in prototypes))
+        self.vectors = np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+        self.vector_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self._vector_norms = np.einsum('ij,ij->i', self.vectors, self.vectors)
+        return self
+
+    def candidates(self, query, top_students=None):
+        """Gallery rows of the students with the closest prototypes (None = all students qualify)"""
+        top_students = top_students or self.top_students
+        if not top_students or top_students >= self.n_students:
+            return None
+        scores = self._vector_norms - 2.0 * (self.vectors @ query)
+        # A student's score is their closest prototype
+        student_scores = np.minimum.reduceat(scores, self.vector_offsets[:-1])
+        students = np.argpartition(student_scores, top_students - 1)[:top_students]
+        return np.concatenate([self.order[self.offsets[s]:self.offsets[s + 1]] for s in students])
+
+    def arrays(self):
+        """Arrays stored in the matcher's model file (rows are regrouped from its ids on load)"""
+        return {'prototype_vectors': self.vectors, 'prototype_offsets': self.vector_offsets}
+
+    @classmethod
+    def from_arrays(cls, arrays, ids, top_students=None):
+        index = cls(top_students=top_students or PROTOTYPE_TOP_STUDENTS)
+        index._group(ids)
+        index.vectors = arrays['prototype_vectors']
+        index.vector_offsets = arrays['prototype_offsets']
+        index._vector_norms = np.einsum('ij,ij->i', index.vectors, index.vectors)
+        return index
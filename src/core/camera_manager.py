@@ -0,0 +1,230 @@
+"""
+Multi-Camera Manager
+Nhiều camera cùng phục vụ một phiên điểm danh, dùng chung một pool nhận diện
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from core.detection import MotionGate
+from utils.perf_stats import LatencyStats
+
+MAX_READ_FAILURES = 50  # Consecutive failed reads before a camera is given up
+
+
+class CameraStream:
+    def __init__(self, camera_id, source, width=640, height=480, fps=30):
+        """
+        One camera source with its own capture thread and statistics
+
+        Args:
+            camera_id: Short label used in logs and stats
+            source: Camera index, device path, video file or stream URL
+        """
+        self.camera_id = camera_id
+        self.source = source
+        self.width = width
+        self.height = height
+        self.fps = fps
+
+        self.capture = None
+        self.thread = None
+        self.failed = False
+        self.busy = False  # A frame from this camera is in the recognition pool
+        self.detector = None  # DetectionScheduler, set by CameraManager
+        self.motion_gate = None  # MotionGate, set by CameraManager
+
+        self.perf_stats = LatencyStats(name=f"camera {camera_id}", log_interval=0)
+        self.frames_captured = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.faces_recognized = 0
+        self.attendance_recorded = 0
+        self.started_at = None
+
+    def open(self):
+        self.capture = cv2.VideoCapture(self.source)
+        if not self.capture.isOpened():
+            self.capture = None
+            return False
+        self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        self.capture.set(cv2.CAP_PROP_FPS, self.fps)
+        self.started_at = time.time()
+        return True
+
+    def close(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+    def stats(self):
+        """Counters, frame rates and latency percentiles for this camera"""
+        elapsed = max(time.time() - self.started_at, 1e-6) if self.started_at else 0
+        latency = self.perf_stats.summary()
+        return {
+            'source': self.source,
+            'failed': self.failed,
+            'frames_captured': self.frames_captured,
+            'frames_processed': self.frames_processed,
+            'frames_dropped': self.frames_dropped,
+            'faces_recognized': self.faces_recognized,
+            'attendance_recorded': self.attendance_recorded,
+            'capture_fps': self.frames_captured / elapsed if elapsed else 0.0,
+            'processed_fps': self.frames_processed / elapsed if elapsed else 0.0,
+            'motion_skip_rate': self.motion_gate.skip_rate if self.motion_gate is not None else 0.0,
+            'latency': latency,
+        }
+
+
+class CameraManager:
+    def __init__(self, recognizer, sources, workers=None, width=640, height=480,
+                 max_fps=10, process_every_n_frames=1, on_recognition=None):
+        """
+        Feed N camera sources into one shared recognition pool
+
+        Each camera has a capture thread that always reads the newest frame;
+        a frame is handed to the pool only when that camera has no frame in
+        flight, so a slow pool drops frames instead of building a backlog.
+        All cameras share the recognizer's gallery and its attendance cooldown,
+        which deduplicates a student seen by several cameras.
+
+        Args:
+            recognizer: AttendanceFaceRecognizer with training data loaded and a session set
+            sources: List of camera indexes / paths / URLs
+            workers: Recognition threads (default: one per camera, at most CPU count)
+            max_fps: Per-camera cap on frames sent to recognition
+            process_every_n_frames: Only every n-th captured frame is considered
+            on_recognition: Optional callable(camera_id, student) for recorded attendance
+        """
+        self.recognizer = recognizer
+        self.streams = [CameraStream(f"cam{i}", source, width, height) for i, source in enumerate(sources)]
+        self.workers = workers or max(1, min(len(self.streams), os.cpu_count() or 1))
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.process_every_n_frames = max(1, process_every_n_frames)
+        self.on_recognition = on_recognition
+        self.logger = logging.getLogger(__name__)
+
+        # Each camera tracks its own faces and motion; a camera never has two frames
+        # in the pool at once, so its detector (and cascade) is never used concurrently
+        for stream in self.streams:
+            stream.detector = recognizer.create_detector()
+            stream.motion_gate = MotionGate() if recognizer.motion_gate is not None else None
+
+        self.pool = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """Open all cameras and start capturing; returns the number of cameras opened"""
+        self._stop_event.clear()
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+
+        opened = 0
+        for stream in self.streams:
+            if not stream.open():
+                stream.failed = True
+                self.logger.error(f"[{stream.camera_id}] Cannot open camera source {stream.source!r}")
+                continue
+            stream.thread = threading.Thread(target=self._capture_loop, args=(stream,),
+                                             name=f"capture-{stream.camera_id}", daemon=True)
+            stream.thread.start()
+            opened += 1
+            self.logger.info(f"[{stream.camera_id}] Capturing from {stream.source!r}")
+        return opened
+
+    def stop(self):
+        """Stop capture threads, wait for in-flight recognitions and release cameras"""
+        self._stop_event.set()
+        for stream in self.streams:
+            if stream.thread is not None:
+                stream.thread.join(timeout=5)
+                stream.thread = None
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+        for stream in self.streams:
+            stream.close()
+
+    @property
+    def active(self):
+        """True while at least one camera is still capturing"""
+        return any(stream.thread is not None and stream.thread.is_alive() for stream in self.streams)
+
+    def _capture_loop(self, stream):
+        failures = 0
+        last_submit = 0.0
+        while not self._stop_event.is_set():
+            with stream.perf_stats.measure('capture'):
+                ret, frame = stream.capture.read()
+            if not ret:
+                failures += 1
+                if failures >= MAX_READ_FAILURES:
+                    stream.failed = True
+                    self.logger.error(f"[{stream.camera_id}] Camera stopped delivering frames")
+                    break
+                self._stop_event.wait(0.1)
+                continue
+            failures = 0
+            stream.frames_captured += 1
+
+            if stream.frames_captured % self.process_every_n_frames:
+                continue
+            now = time.perf_counter()
+            if now - last_submit < self.min_interval:
+                continue
+            if stream.busy:
+                stream.frames_dropped += 1
+                continue
+
+            stream.busy = True
+            last_submit = now
+            try:
+                self.pool.submit(self._process_frame, stream, frame, now)
+            except RuntimeError:
+                # Pool already shut down
+                stream.busy = False
+                break
+
+    def _process_frame(self, stream, frame, captured_at):
+        started = time.perf_counter()
+        try:
+            _, recognized = self.recognizer.recognize_faces_in_frame(
+                frame, annotate=False, detector=stream.detector, motion_gate=stream.motion_gate)
+            stream.frames_processed += 1
+            stream.faces_recognized += len(recognized)
+
+            for student in recognized:
+                if self.recognizer.record_attendance_for_student(student['student_id'], student['confidence']):
+                    stream.attendance_recorded += 1
+                    if self.on_recognition:
+                        self.on_recognition(stream.camera_id, student)
+        except Exception as e:
+            self.logger.exception(f"[{stream.camera_id}] Recognition error: {e}")
+        finally:
+            finished = time.perf_counter()
+            stream.perf_stats.record('frame', finished - started)
+            stream.perf_stats.record('end_to_end', finished - captured_at)
+            stream.busy = False
+
+    def get_stats(self):
+        """Per-camera statistics keyed by camera id"""
+        return {stream.camera_id: stream.stats() for stream in self.streams}
+
+    def log_stats(self):
+        """Log one line per camera: frame rates, drops, recognitions and latency"""
+        for camera_id, stats in self.get_stats().items():
+            latency = stats['latency'].get('end_to_end')
+            latency_text = (f"latency p50 {latency['p50']:.0f} / p95 {latency['p95']:.0f} ms"
+                            if latency else "latency n/a")
+            self.logger.info(
+                f"[{camera_id}] capture {stats['capture_fps']:.1f} fps | processed {stats['processed_fps']:.1f} fps "
+                f"| dropped {stats['frames_dropped']} | motion skip {stats['motion_skip_rate']:.0%} "
+                f"| recognized {stats['faces_recognized']} "
+                f"| recorded {stats['attendance_recorded']} | {latency_text}"
+                + (" | FAILED" if stats['failed'] else "")
+            )
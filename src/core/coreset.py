@@ -0,0 +1,159 @@
+"""
+Gallery Coreset Selection
+Chọn tập ảnh đại diện cho mỗi học sinh để thu nhỏ gallery khi huấn luyện
+
+Face collection saves many near-duplicate crops per student (30 in the GUI,
+200 in scripts/01_face_dataset.py) and every one of them is matched on every
+query. At training time each student's crops are reduced to
+GALLERY_SAMPLES_PER_STUDENT representatives with k-medoids: farthest-point
+sampling seeds medoids that span the poses and lighting of the enrollment,
+then each medoid moves to the crop that best represents its cluster, so
+outliers (blur, half-detected faces) do not take a slot of their own.
+"""
+
+import numpy as np
+
+from core.matchers import create_matcher, normalize_faces
+from utils.config import GALLERY_SAMPLES_PER_STUDENT
+
+FEATURE_SIZE = (32, 32)  # Thumbnails compared by selection and by the MAD accuracy check
+
+
+def _l1_distances(features, vector):
+    """Sum of absolute differences between every row of features and one vector"""
+    return np.abs(features - vector).sum(axis=1)
+
+
+def farthest_point_sampling(features, k):
+    """
+    Indices of k representative rows of a feature matrix (L1 distance)
+
+    Returns:
+        Sorted row indices (all rows when k >= len(features))
+    """
+    n = len(features)
+    if k <= 0 or k >= n:
+        return np.arange(n)
+    first = int(np.argmin(_l1_distances(features, features.mean(axis=0))))
+    chosen = [first]
+    nearest = _l1_distances(features, features[first])
+    for _ in range(k - 1):
+        farthest = int(np.argmax(nearest))
+        chosen.append(farthest)
+        nearest = np.minimum(nearest, _l1_distances(features, features[farthest]))
+    return np.sort(chosen)
+
+
+def k_medoids(features, k, iterations=10):
+    """
+    Indices of k medoids of a feature matrix (L1 distance, alternating updates)
+
+    Returns:
+        Sorted row indices (all rows when k >= len(features))
+    """
+    n = len(features)
+    if k <= 0 or k >= n:
+        return np.arange(n)
+    distances = np.stack([_l1_distances(features, row) for row in features])
+    medoids = farthest_point_sampling(features, k)
+    for _ in range(iterations):
+        labels = np.argmin(distances[:, medoids], axis=1)
+        updated = medoids.copy()
+        for cluster in range(k):
+            members = np.flatnonzero(labels == cluster)
+            if not len(members):  # Duplicate crops: an identical medoid took every member
+                continue
+            # The member with the smallest total distance to the rest of its cluster
+            updated[cluster] = members[np.argmin(distances[np.ix_(members, members)].sum(axis=1))]
+        updated.sort()
+        if np.array_equal(updated, medoids):
+            break
+        medoids = updated
+    return medoids
+
+
+def select_gallery(faces, ids, per_identity=GALLERY_SAMPLES_PER_STUDENT, features=None):
+    """
+    Keep up to per_identity representative crops of every student
+
+    Args:
+        faces: Gallery crops (variable sizes allowed)
+        ids: Student ID of each crop
+        per_identity: Crops kept per student (0 = keep all)
+        features: Precomputed FEATURE_SIZE thumbnails of faces (optional)
+
+    Returns:
+        Row indices of the kept crops, in gallery order
+    """
+    ids = np.asarray(ids)
+    if not per_identity:
+        return np.arange(len(ids))
+    if features is None:
+        features = normalize_faces(faces, FEATURE_SIZE)
+    keep = []
+    for student_id in np.unique(ids):
+        rows = np.flatnonzero(ids == student_id)
+        keep.append(rows[k_medoids(features[rows], per_identity)])
+    return np.sort(np.concatenate(keep)) if keep else np.arange(0)
+
+
+def _accuracy(gallery_rows, probe_rows, faces, ids, features, engine):
+    """Share of probe crops whose best gallery match has the right student ID"""
+    if engine in (None, 'mad'):
+        # Vectorized pixel MAD on thumbnails: a proxy for the built-in engine's full-resolution comparison
+        gallery = features[gallery_rows]
+        predicted = np.array([ids[gallery_rows][np.argmin(_l1_distances(gallery, features[row]))]
+                              for row in probe_rows])
+    else:
+        matcher = create_matcher(engine).fit(faces[gallery_rows], ids[gallery_rows])
+        predicted = np.array([matcher.match(faces[row])[0] for row in probe_rows])
+    return float(np.mean(predicted == ids[probe_rows]))
+
+
+def evaluate_selection(faces, ids, per_identity=GALLERY_SAMPLES_PER_STUDENT, engine='mad',
+                       holdout_every=5, max_probes=500, seed=0):
+    """
+    Held-out accuracy of the full gallery vs. its coreset
+
+    Every holdout_every-th crop of each student is held out (up to max_probes
+    in total); the rest is the training gallery, matched in full and after
+    selection.
+
+    Args:
+        faces: Gallery crops as a NumPy (object) array, e.g. faces_data.npy
+        engine: Matcher used for the check ("mad" = pixel MAD on thumbnails)
+
+    Returns:
+        dict with full/coreset accuracy and gallery sizes
+    """
+    ids = np.asarray(ids)
+    features = normalize_faces(faces, FEATURE_SIZE)
+    position = np.zeros(len(ids), dtype=np.int64)
+    for student_id in np.unique(ids):
+        rows = np.flatnonzero(ids == student_id)
+        position[rows] = np.arange(len(rows))
+    held_out = position % holdout_every == holdout_every - 1
+    probe_rows = np.flatnonzero(held_out)
+    if len(probe_rows) > max_probes:
+        probe_rows = np.sort(np.random.default_rng(seed).choice(probe_rows, max_probes, replace=False))
+    train_rows = np.flatnonzero(~held_out)
+    coreset_rows = train_rows[select_gallery(faces[train_rows], ids[train_rows], per_identity,
+                                             features=features[train_rows])]
+
+    full_accuracy = _accuracy(train_rows, probe_rows, faces, ids, features, engine)
+    coreset_accuracy = _accuracy(coreset_rows, probe_rows, faces, ids, features, engine)
+    return {
+        'full_size': len(train_rows),
+        'coreset_size': len(coreset_rows),
+        'probes': len(probe_rows),
+        'full_accuracy': full_accuracy,
+        'coreset_accuracy': coreset_accuracy,
+        'accuracy_delta': coreset_accuracy - full_accuracy,
+    }
+
+
+def format_report(report):
+    """One-line summary of evaluate_selection()"""
+    return (f"coreset {report['coreset_size']}/{report['full_size']} samples, held-out accuracy "
+            f"{report['full_accuracy']:.1%} -> {report['coreset_accuracy']:.1%} "
+            f"({report['accuracy_delta'] * 100:+.1f} pts, {report['probes']} crops)")
@@ -0,0 +1,262 @@
+"""
+Face Detection Scheduling
+Chỉ quét toàn khung hình định kỳ; giữa các lần quét chỉ tìm quanh vị trí khuôn mặt trước đó
+"""
+
+import cv2
+import numpy as np
+
+from utils.config import (DETECTION_SCALE_FACTOR, DETECTION_MIN_NEIGHBORS, DETECTION_MIN_SIZE,
+                          DETECTION_FULL_SCAN_INTERVAL, DETECTION_ROI_MARGIN,
+                          DETECTION_SCENE_CHANGE_THRESHOLD, DETECTION_DOWNSCALE,
+                          DETECTION_MIN_FACE_PIXELS, DETECTION_MIN_SCAN_HEIGHT, MOTION_PIXEL_THRESHOLD,
+                          MOTION_START_RATIO, MOTION_STOP_RATIO, MOTION_HOLD_FRAMES,
+                          MOTION_MAX_SKIP_FRAMES)
+
+SCENE_THUMBNAIL_SIZE = (32, 24)  # Tiny thumbnail compared for scene changes
+ROI_FACE_SIZE = 48  # Search windows are resized so the tracked face is about this big
+MOTION_FRAME_SIZE = (80, 60)  # Frames are compared at this size by MotionGate
+
+
+def detection_scale(min_size, min_face_pixels=DETECTION_MIN_FACE_PIXELS):
+    """
+    Downscale factor for a full scan: faces smaller than min_size are not
+    wanted, so the frame can shrink until min_size becomes min_face_pixels
+    """
+    smallest = min(min_size) if min_size else 0
+    if smallest <= min_face_pixels:
+        return 1.0
+    return min_face_pixels / float(smallest)
+
+
+def _merge_boxes(boxes, iou_threshold=0.5):
+    """Drop boxes that overlap an earlier box (expanded ROIs can find the same face twice)"""
+    kept = []
+    for box in boxes:
+        x, y, w, h = box
+        duplicate = False
+        for kx, ky, kw, kh in kept:
+            ix = max(0, min(x + w, kx + kw) - max(x, kx))
+            iy = max(0, min(y + h, ky + kh) - max(y, ky))
+            inter = ix * iy
+            if inter and inter / float(w * h + kw * kh - inter) >= iou_threshold:
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append(box)
+    return kept
+
+
+class DetectionScheduler:
+    def __init__(self, cascade, scale_factor=DETECTION_SCALE_FACTOR, min_neighbors=DETECTION_MIN_NEIGHBORS,
+                 min_size=DETECTION_MIN_SIZE,
+                 full_scan_interval=DETECTION_FULL_SCAN_INTERVAL, roi_margin=DETECTION_ROI_MARGIN,
+                 scene_change_threshold=DETECTION_SCENE_CHANGE_THRESHOLD,
+                 roi_scale_factor=1.08, roi_min_neighbors=3, downscale=DETECTION_DOWNSCALE):
+        """
+        Haar detection that reuses the previous face boxes
+
+        A full-frame scan runs every `full_scan_interval` frames, when the
+        scene changes, or when no face is being tracked. In between, only
+        windows around the last boxes (expanded by `roi_margin` of the box
+        size on every side) are searched. Each window is resized so the face
+        is about ROI_FACE_SIZE pixels and only sizes close to the tracked face
+        are tried; a finer scale step and fewer neighbours keep those small
+        searches reliable.
+
+        With `downscale`, full scans run on a copy of the frame shrunk by
+        detection_scale(min_size), but never below DETECTION_MIN_SCAN_HEIGHT
+        rows; boxes are mapped back to full resolution,
+        so recognition still crops faces from the original frame.
+
+        Args:
+            cascade: cv2.CascadeClassifier or core.detectors.FaceDetector
+                     (not shared with other threads)
+            scale_factor, min_neighbors, min_size: Parameters of the full scan
+                (default: the tuned values from utils/config.py)
+            full_scan_interval: Frames between forced full scans (1 = always full)
+            roi_margin: Expansion of a tracked box, as a fraction of its size
+            scene_change_threshold: Mean absolute difference (0-255) of a tiny
+                thumbnail versus the last full scan that forces a full scan
+            downscale: Run full scans at the reduced resolution
+        """
+        self.cascade = cascade
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = tuple(min_size)
+        self.full_scan_interval = max(1, int(full_scan_interval))
+        self.roi_margin = roi_margin
+        self.scene_change_threshold = scene_change_threshold
+        self.roi_scale_factor = roi_scale_factor
+        self.roi_min_neighbors = roi_min_neighbors
+        self.scan_scale = detection_scale(self.min_size) if downscale else 1.0
+
+        self.stats = {'frames': 0, 'full_scans': 0, 'roi_scans': 0}
+        self.reset()
+
+    def reset(self):
+        """Forget tracked faces; the next frame gets a full scan"""
+        self._boxes = []
+        self._frames_since_full = 0
+        self._reference_thumbnail = None
+        self._frame_shape = None
+
+    @property
+    def full_scan_ratio(self):
+        return self.stats['full_scans'] / self.stats['frames'] if self.stats['frames'] else 0.0
+
+    def _thumbnail(self, gray):
+        return cv2.resize(gray, SCENE_THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+
+    def _needs_full_scan(self, gray):
+        if not self._boxes or gray.shape != self._frame_shape:
+            return True
+        if self._frames_since_full >= self.full_scan_interval:
+            return True
+        if self.scene_change_threshold and self._reference_thumbnail is not None:
+            diff = cv2.absdiff(self._thumbnail(gray), self._reference_thumbnail)
+            if float(np.mean(diff)) > self.scene_change_threshold:
+                return True
+        return False
+
+    def _full_scan(self, gray):
+        scale = max(self.scan_scale, min(1.0, DETECTION_MIN_SCAN_HEIGHT / float(gray.shape[0])))
+        if scale < 1.0:
+            small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            min_size = (int(self.min_size[0] * scale), int(self.min_size[1] * scale))
+            faces = self.cascade.detectMultiScale(small, scaleFactor=self.scale_factor,
+                                                  minNeighbors=self.min_neighbors, minSize=min_size)
+            faces = [(fx / scale, fy / scale, fw / scale, fh / scale) for fx, fy, fw, fh in faces]
+        else:
+            faces = self.cascade.detectMultiScale(gray, scaleFactor=self.scale_factor,
+                                                  minNeighbors=self.min_neighbors, minSize=self.min_size)
+        self._frames_since_full = 1
+        self._frame_shape = gray.shape
+        if self.scene_change_threshold:
+            self._reference_thumbnail = self._thumbnail(gray)
+        self.stats['full_scans'] += 1
+        return [tuple(int(v) for v in face) for face in faces]
+
+    def _roi_scan(self, gray):
+        frame_h, frame_w = gray.shape[:2]
+        found = []
+        for x, y, w, h in self._boxes:
+            mx, my = int(w * self.roi_margin), int(h * self.roi_margin)
+            x0, y0 = max(0, x - mx), max(0, y - my)
+            x1, y1 = min(frame_w, x + w + mx), min(frame_h, y + h + my)
+
+            roi = gray[y0:y1, x0:x1]
+            size = min(w, h)
+            scale = min(1.0, ROI_FACE_SIZE / float(size))
+            if scale < 1.0:
+                roi = cv2.resize(roi, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+            min_side = max(int(size * 0.7), self.min_size[0], self.min_size[1])
+            max_side = min(int(max(w, h) * 1.5), x1 - x0, y1 - y0)
+            if max_side < min_side:
+                continue
+            min_side = max(1, int(min_side * scale))
+            max_side = min(int(max_side * scale), roi.shape[0], roi.shape[1])
+            faces = self.cascade.detectMultiScale(
+                roi, scaleFactor=self.roi_scale_factor, minNeighbors=self.roi_min_neighbors,
+                minSize=(min_side, min_side), maxSize=(max_side, max_side))
+            found.extend((int(fx / scale) + x0, int(fy / scale) + y0, int(fw / scale), int(fh / scale))
+                         for fx, fy, fw, fh in faces)
+        self._frames_since_full += 1
+        self.stats['roi_scans'] += 1
+        return _merge_boxes(found)
+
+    def detect(self, gray):
+        """
+        Detect faces in a grayscale frame
+
+        Returns:
+            List of (x, y, w, h) boxes
+        """
+        self.stats['frames'] += 1
+        if self._needs_full_scan(gray):
+            boxes = self._full_scan(gray)
+        else:
+            boxes = self._roi_scan(gray)
+            if not boxes:
+                # Every tracked face was lost: look at the whole frame right away
+                boxes = self._full_scan(gray)
+        self._boxes = boxes
+        return boxes
+
+
+class MotionGate:
+    def __init__(self, pixel_threshold=MOTION_PIXEL_THRESHOLD, start_ratio=MOTION_START_RATIO,
+                 stop_ratio=MOTION_STOP_RATIO, hold_frames=MOTION_HOLD_FRAMES,
+                 max_skip_frames=MOTION_MAX_SKIP_FRAMES):
+        """
+        Decide whether a frame is worth detecting faces in
+
+        Consecutive frames are compared at MOTION_FRAME_SIZE. The gate opens
+        when more than `start_ratio` of the pixels changed by more than
+        `pixel_threshold`, and closes only after `hold_frames` frames below
+        `stop_ratio`, so small flickers neither wake it up nor shut it off
+        mid-movement. A static scene is still processed every
+        `max_skip_frames` frames (lighting drift, someone sitting very still).
+
+        Args:
+            pixel_threshold: Gray-level difference that counts as change
+            start_ratio: Changed-pixel fraction that opens the gate
+            stop_ratio: Changed-pixel fraction below which the gate may close
+            hold_frames: Quiet frames before closing
+            max_skip_frames: Longest run of skipped frames (0 = no limit)
+        """
+        self.pixel_threshold = pixel_threshold
+        self.start_ratio = start_ratio
+        self.stop_ratio = stop_ratio
+        self.hold_frames = hold_frames
+        self.max_skip_frames = max_skip_frames
+
+        self.stats = {'frames': 0, 'skipped': 0}
+        self.reset()
+
+    def reset(self):
+        """Forget the previous frame; the next frame is processed"""
+        self._previous = None
+        self._active = True
+        self._quiet_frames = 0
+        self._skipped_in_row = 0
+        self.last_motion = 0.0
+
+    @property
+    def skip_rate(self):
+        return self.stats['skipped'] / self.stats['frames'] if self.stats['frames'] else 0.0
+
+    def should_process(self, gray):
+        """Update the gate with a grayscale frame; False means nothing changed"""
+        small = cv2.resize(gray, MOTION_FRAME_SIZE, interpolation=cv2.INTER_AREA)
+        small = cv2.GaussianBlur(small, (3, 3), 0)
+        self.stats['frames'] += 1
+
+        if self._previous is None:
+            self._previous = small
+            return True
+
+        diff = cv2.absdiff(small, self._previous)
+        self._previous = small
+        self.last_motion = cv2.countNonZero(
+            cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)[1]) / float(diff.size)
+
+        if self._active:
+            if self.last_motion < self.stop_ratio:
+                self._quiet_frames += 1
+                if self._quiet_frames >= self.hold_frames:
+                    self._active = False
+            else:
+                self._quiet_frames = 0
+        elif self.last_motion > self.start_ratio:
+            self._active = True
+            self._quiet_frames = 0
+
+        if self._active or (self.max_skip_frames and self._skipped_in_row >= self.max_skip_frames):
+            self._skipped_in_row = 0
+            return True
+
+        self._skipped_in_row += 1
+        self.stats['skipped'] += 1
+        return False
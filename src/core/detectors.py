@@ -0,0 +1,309 @@
+"""
+Face Detector Backends
+Các bộ phát hiện khuôn mặt có thể thay thế: Haar, LBP cascade, OpenCV DNN
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from utils.config import (FACE_DETECTOR, CASCADE_PATH, LBP_CASCADE_PATH, DNN_MODEL_PATH,
+                          DNN_CONFIG_PATH, DNN_CONFIDENCE, DNN_INPUT_SIZE, DETECTION_MIN_FACE_PIXELS,
+                          DETECTION_TILING, DETECTION_TILE_MIN_WIDTH, DETECTION_TILE_SIZE,
+                          DETECTION_TILE_OVERLAP, DETECTION_TILE_WORKERS)
+
+
+class FaceDetector:
+    """
+    Common interface of all detector backends
+
+    detectMultiScale() mirrors cv2.CascadeClassifier, so a backend can be used
+    anywhere a cascade was used (DetectionScheduler, benchmarks). Instances
+    are not thread-safe; create one per thread or stream.
+    """
+
+    name = "base"
+
+    def detectMultiScale(self, image, scaleFactor=1.1, minNeighbors=3, minSize=(0, 0), maxSize=(0, 0)):
+        """Return an (N, 4) array of (x, y, w, h) face boxes in a grayscale image"""
+        raise NotImplementedError
+
+    def empty(self):
+        """True when the model could not be loaded"""
+        return False
+
+    def describe(self):
+        return self.name
+
+
+class CascadeDetector(FaceDetector):
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Cascade file not found: {path}")
+        self.path = path
+        self.cascade = cv2.CascadeClassifier(path)
+
+    def detectMultiScale(self, image, scaleFactor=1.1, minNeighbors=3, minSize=(0, 0), maxSize=(0, 0)):
+        return self.cascade.detectMultiScale(image, scaleFactor=scaleFactor, minNeighbors=minNeighbors,
+                                             minSize=tuple(minSize), maxSize=tuple(maxSize))
+
+    def empty(self):
+        return self.cascade.empty()
+
+    def describe(self):
+        return f"{self.name} ({os.path.basename(self.path)})"
+
+
+class HaarDetector(CascadeDetector):
+    """Viola-Jones Haar cascade (the original detector)"""
+
+    name = "haar"
+
+    def __init__(self, path=CASCADE_PATH):
+        super().__init__(path)
+
+
+class LBPDetector(CascadeDetector):
+    """LBP cascade: integer features, several times faster than Haar on small CPUs"""
+
+    name = "lbp"
+
+    def __init__(self, path=LBP_CASCADE_PATH):
+        super().__init__(path)
+
+
+class DNNDetector(FaceDetector):
+    """
+    OpenCV DNN SSD face detector on the CPU
+
+    Accepts the Caffe ResNet-10 SSD (deploy.prototxt + .caffemodel) or an
+    ONNX export with the same [1, 1, N, 7] detection output. scaleFactor and
+    minNeighbors do not apply; minSize/maxSize filter the boxes.
+    """
+
+    name = "dnn"
+
+    def __init__(self, model_path=DNN_MODEL_PATH, config_path=DNN_CONFIG_PATH,
+                 confidence=DNN_CONFIDENCE, input_size=DNN_INPUT_SIZE):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"DNN model file not found: {model_path}")
+        self.model_path = model_path
+        if model_path.endswith('.onnx'):
+            self.net = cv2.dnn.readNet(model_path)
+        else:
+            if not config_path or not os.path.exists(config_path):
+                raise FileNotFoundError(f"DNN config file not found: {config_path}")
+            self.net = cv2.dnn.readNet(model_path, config_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.confidence = confidence
+        self.input_size = (input_size, input_size)
+
+    def detectMultiScale(self, image, scaleFactor=1.1, minNeighbors=3, minSize=(0, 0), maxSize=(0, 0)):
+        h, w = image.shape[:2]
+        bgr = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR) if image.ndim == 2 else image
+        blob = cv2.dnn.blobFromImage(bgr, 1.0, self.input_size, (104.0, 177.0, 123.0))
+        self.net.setInput(blob)
+        detections = self.net.forward().reshape(-1, 7)
+
+        detections = detections[detections[:, 2] >= self.confidence]
+        boxes = []
+        for _, _, _, x0, y0, x1, y1 in detections:
+            x0, y0 = max(0, int(x0 * w)), max(0, int(y0 * h))
+            x1, y1 = min(w, int(x1 * w)), min(h, int(y1 * h))
+            bw, bh = x1 - x0, y1 - y0
+            if bw <= 0 or bh <= 0 or bw < minSize[0] or bh < minSize[1]:
+                continue
+            if maxSize[0] and (bw > maxSize[0] or bh > maxSize[1]):
+                continue
+            boxes.append((x0, y0, bw, bh))
+        return np.array(boxes, dtype=np.int32).reshape(-1, 4)
+
+    def empty(self):
+        return self.net.empty()
+
+    def describe(self):
+        return f"{self.name} ({os.path.basename(self.model_path)})"
+
+
+def non_max_suppression(boxes, overlap_threshold=0.5):
+    """
+    Merge duplicate boxes of the same face (e.g. found in two overlapping tiles)
+
+    Cascades give no scores, so larger boxes win. A box is dropped when its
+    intersection with a kept box covers `overlap_threshold` of the smaller of
+    the two, which also removes partial faces cut by a tile border.
+    """
+    kept = []
+    for x, y, w, h in sorted(boxes, key=lambda b: b[2] * b[3], reverse=True):
+        for kx, ky, kw, kh in kept:
+            ix = max(0, min(x + w, kx + kw) - max(x, kx))
+            iy = max(0, min(y + h, ky + kh) - max(y, ky))
+            if ix * iy >= overlap_threshold * min(w * h, kw * kh):
+                break
+        else:
+            kept.append((x, y, w, h))
+    return kept
+
+
+def tile_grid(width, height, tile_size, overlap):
+    """
+    Overlapping (x0, y0, x1, y1) tiles covering a width x height image
+
+    Neighbouring tiles share `overlap` pixels, so every face up to that size
+    lies entirely inside at least one tile.
+    """
+    step = max(1, tile_size - overlap)
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, step))
+        positions.append(length - tile_size)  # Last tile flush with the border
+        return positions
+
+    return [(x, y, min(width, x + tile_size), min(height, y + tile_size))
+            for y in starts(height) for x in starts(width)]
+
+
+_tile_pools = {}  # Worker count -> ThreadPoolExecutor shared by every TiledDetector
+_tile_pools_lock = threading.Lock()
+
+
+def _shared_tile_pool(workers):
+    """
+    Tile thread pool shared by all TiledDetectors with the same worker count
+
+    Detectors are created per camera stream, enrollment and batch worker and
+    nothing owns their lifetime, so they borrow process-wide pools instead
+    of each keeping a pool of CPU-count threads alive.
+    """
+    with _tile_pools_lock:
+        pool = _tile_pools.get(workers)
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tile-detect")
+            _tile_pools[workers] = pool
+        return pool
+
+
+class TiledDetector(FaceDetector):
+    """
+    Detect faces in large frames tile by tile on a shared thread pool
+
+    Images wider than `min_width` are split into overlapping tiles; each tile
+    is searched for faces up to `overlap` pixels by a backend instance owned
+    by the worker thread (OpenCV releases the GIL during detection). Larger
+    faces (from half the overlap up, so no size falls between the two) are
+    found by one extra pass over a copy of the whole image shrunk so that
+    half the overlap becomes DETECTION_MIN_FACE_PIXELS. Boxes are merged
+    with non_max_suppression(). Smaller images, and every image when only
+    one worker thread is configured (tiles overlap, so tiling costs about
+    1.7x the pixels and only pays off in parallel), go straight to the backend.
+    """
+
+    def __init__(self, backend=None, tile_size=DETECTION_TILE_SIZE, overlap=DETECTION_TILE_OVERLAP,
+                 min_width=DETECTION_TILE_MIN_WIDTH, workers=DETECTION_TILE_WORKERS, **kwargs):
+        if overlap >= tile_size:
+            raise ValueError("Tile overlap must be smaller than the tile size")
+        self._backend = backend
+        self._backend_kwargs = kwargs
+        self.detector = create_face_detector(backend, tiled=False, **kwargs)
+        self.name = self.detector.name
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.min_width = min_width
+        self.workers = workers or os.cpu_count() or 1
+        self.large_face = overlap // 2  # Smallest face searched by the whole-image pass
+        self.large_scale = min(1.0, DETECTION_MIN_FACE_PIXELS / float(self.large_face))
+        self.pool = None
+        self._local = threading.local()
+
+    def _thread_detector(self):
+        # Backends are not thread-safe: one instance per pool thread, kept for the thread's life
+        detector = getattr(self._local, 'detector', None)
+        if detector is None:
+            detector = create_face_detector(self._backend, tiled=False, **self._backend_kwargs)
+            self._local.detector = detector
+        return detector
+
+    def _detect_tile(self, image, tile, params):
+        x0, y0, x1, y1 = tile
+        faces = self._thread_detector().detectMultiScale(image[y0:y1, x0:x1], **params)
+        return [(int(fx) + x0, int(fy) + y0, int(fw), int(fh)) for fx, fy, fw, fh in faces]
+
+    def _detect_large(self, image, params):
+        scale = self.large_scale
+        small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        faces = self._thread_detector().detectMultiScale(small, **params)
+        return [(int(fx / scale), int(fy / scale), int(fw / scale), int(fh / scale))
+                for fx, fy, fw, fh in faces]
+
+    def detectMultiScale(self, image, scaleFactor=1.1, minNeighbors=3, minSize=(0, 0), maxSize=(0, 0)):
+        h, w = image.shape[:2]
+        if w <= self.min_width or self.workers < 2:
+            return self.detector.detectMultiScale(image, scaleFactor=scaleFactor, minNeighbors=minNeighbors,
+                                                  minSize=minSize, maxSize=maxSize)
+        if self.pool is None:
+            self.pool = _shared_tile_pool(self.workers)
+
+        min_side = max(minSize[0], minSize[1]) if minSize else 0
+        max_side = min(maxSize[0], maxSize[1]) if maxSize and maxSize[0] else 0
+        futures = []
+        if min_side <= self.overlap:
+            tile_max = min(max_side, self.overlap) if max_side else self.overlap
+            params = dict(scaleFactor=scaleFactor, minNeighbors=minNeighbors,
+                          minSize=tuple(minSize), maxSize=(tile_max, tile_max))
+            futures.extend(self.pool.submit(self._detect_tile, image, tile, params)
+                           for tile in tile_grid(w, h, self.tile_size, self.overlap))
+        if not max_side or max_side > self.overlap:
+            large_min = int(max(min_side, self.large_face) * self.large_scale)
+            large_max = int(max_side * self.large_scale) if max_side else 0
+            params = dict(scaleFactor=scaleFactor, minNeighbors=minNeighbors,
+                          minSize=(large_min, large_min), maxSize=(large_max, large_max))
+            futures.append(self.pool.submit(self._detect_large, image, params))
+
+        boxes = [box for future in futures for box in future.result()]
+        return np.array(non_max_suppression(boxes), dtype=np.int32).reshape(-1, 4)
+
+    def empty(self):
+        return self.detector.empty()
+
+    def describe(self):
+        return (f"{self.detector.describe()}, tiled {self.tile_size}px/{self.overlap}px overlap "
+                f"above {self.min_width}px wide, {self.workers} threads")
+
+    def close(self):
+        """Release the tile thread pool (shared pools stay alive for other detectors)"""
+        self.pool = None
+
+
+# name -> backend class; select with FACE_DETECTOR in utils/config.py
+DETECTOR_BACKENDS = {
+    'haar': HaarDetector,
+    'lbp': LBPDetector,
+    'dnn': DNNDetector,
+}
+
+
+def create_face_detector(backend=None, tiled=None, **kwargs):
+    """
+    Create a detector backend by name (default: FACE_DETECTOR from config)
+
+    With `tiled` (default: DETECTION_TILING) the backend is wrapped in a
+    TiledDetector, which only changes behaviour for large frames.
+
+    Raises:
+        ValueError: unknown backend name
+        FileNotFoundError: the backend's model file is missing
+    """
+    backend = backend or FACE_DETECTOR
+    if backend not in DETECTOR_BACKENDS:
+        raise ValueError(f"Unknown face detector '{backend}'. Choose from: {', '.join(DETECTOR_BACKENDS)}")
+    if tiled is None:
+        tiled = DETECTION_TILING
+    if tiled:
+        return TiledDetector(backend, **kwargs)
+    return DETECTOR_BACKENDS[backend](**kwargs)
@@ -11,19 +11,34 @@ from datetime import datetime
 import threading
 import time
 
+from core.detection import DetectionScheduler, MotionGate
+from core.detectors import create_face_detector
+from core.matchers import MADKernel, ThumbnailPrefilter, load_compact_gallery, load_matcher
+from utils.config import FACE_DETECTOR, RECOGNITION_ENGINE, PROJECT_ROOT, COMPACT_GALLERY
+from utils.perf_stats import LatencyStats
+
 class AttendanceFaceRecognizer:
-    def __init__(self, database_manager, confidence_threshold=60):
+    def __init__(self, database_manager, confidence_threshold=60, trainer_dir=None, detector_backend=None,
+                 engine=None):
         self.db = database_manager
         self.confidence_threshold = confidence_threshold
+        self.trainer_dir = trainer_dir or os.path.join(PROJECT_ROOT, 'data', 'trainer')
         
-        # Face detection
-        self.cascade_path = "haarcascade_frontalface_default.xml"
-        self.face_cascade = cv2.CascadeClassifier(self.cascade_path)
+        # Face detection (backend selected by FACE_DETECTOR in utils/config.py)
+        self.detector_backend = detector_backend or FACE_DETECTOR
+        self.face_cascade = create_face_detector(self.detector_backend)
+        self.detector = self.create_detector(self.face_cascade)
+        self.motion_gate = MotionGate()  # None processes every frame
+        self._last_annotations = []  # Redrawn on frames skipped by the motion gate
         
         # Recognition data
         self.faces_data = None
         self.ids_data = None
         self.student_names = {}
+        self.engine = engine or RECOGNITION_ENGINE
+        self.matcher = None  # Fitted engine from core/matchers.py (None = built-in pixel MAD)
+        self.mad_prefilter = None  # Thumbnails of faces_data for the MAD engine, built on first use
+        self._mad_kernels = threading.local()  # MADKernel scratch buffers per recognition thread
         
         # Camera
         self.camera = None
@@ -33,6 +48,11 @@ class AttendanceFaceRecognizer:
         self.current_session_id = None
         self.last_recognition_time = {}
         self.recognition_cooldown = 30  # seconds
+        self._attendance_lock = threading.Lock()  # Cooldown is shared by all camera threads
+        
+        # Per-stage latency instrumentation
+        self.perf_stats = LatencyStats(name="recognizer")
+        self.show_perf_overlay = False
         
         # Load training data
         self.load_training_data()
@@ -50,15 +70,24 @@ class AttendanceFaceRecognizer:
                 print(f"[INFO] Loaded enhanced model with {len(self.faces_data)} samples")
             else:
                 # Fall back to original format - use correct data/trainer/ path
-                self.faces_data = np.load('data/trainer/faces_data.npy', allow_pickle=True)
-                self.ids_data = np.load('data/trainer/ids_data.npy')
+                self.ids_data = np.load(os.path.join(self.trainer_dir, 'ids_data.npy'))
+                if self.engine == 'mad' and COMPACT_GALLERY:
+                    # Small uint8 faces instead of the full-resolution crops
+                    self.faces_data = load_compact_gallery(self.trainer_dir, self.ids_data)
+                else:
+                    self.faces_data = np.load(os.path.join(self.trainer_dir, 'faces_data.npy'), allow_pickle=True)
                 
-                # Build name mapping from database
-                students = self.db.get_all_students()
-                self.student_names = {student[0]: student[2] for student in students}  # id: name
+                # Build name mapping from database (worker processes get it passed in instead)
+                if self.db is not None:
+                    students = self.db.get_all_students()
+                    self.student_names = {student[0]: student[2] for student in students}  # id: name
                 
                 print(f"[INFO] Loaded original model with {len(self.faces_data)} samples")
                 print(f"[INFO] Available student IDs: {np.unique(self.ids_data)}")
+            
+            self.matcher = load_matcher(self.engine, self.trainer_dir, self.faces_data, self.ids_data)
+            if self.matcher is not None:
+                print(f"[INFO] Recognition engine: {self.engine} ({self.matcher.nbytes / 1024:.0f} KB gallery)")
                 
         except Exception as e:
             print(f"[ERROR] Could not load training data: {e}")
@@ -66,54 +95,35 @@ class AttendanceFaceRecognizer:
             self.faces_data = np.array([])
             self.ids_data = np.array([])
             self.student_names = {}
+            self.matcher = None
+    
+    def _mad_kernel(self):
+        """Scratch buffers of the MAD loop, one kernel per recognition thread"""
+        kernel = getattr(self._mad_kernels, 'kernel', None)
+        if kernel is None:
+            kernel = self._mad_kernels.kernel = MADKernel()
+        return kernel
+    
+    def _mad_candidates(self, face_img, kernel):
+        """Gallery rows that get the full multi-scale comparison (thumbnail prefilter's top-K)"""
+        if self.mad_prefilter is None or self.mad_prefilter.faces is not self.faces_data:
+            self.mad_prefilter = ThumbnailPrefilter(self.faces_data)
+        return self.mad_prefilter.candidates(face_img, kernel)
     
     def enhanced_face_recognition(self, face_img):
         """Enhanced face recognition with better accuracy"""
         if len(self.faces_data) == 0:
             return 0, 0.0
+        if self.matcher is not None:
+            return self.matcher.match(face_img)
             
-        best_match_id = 0
-        best_confidence = float('inf')
-        
-        # Multiple recognition methods for better accuracy
-        confidences = []
-        
         try:
-            # Method 1: Template matching with different sizes
-            for i, stored_face in enumerate(self.faces_data):
-                try:
-                    # Resize to multiple scales for better matching
-                    scales = [0.8, 1.0, 1.2]
-                    scale_scores = []
-                    
-                    for scale in scales:
-                        # Resize face image
-                        h, w = face_img.shape
-                        new_h, new_w = int(h * scale), int(w * scale)
-                        if new_h > 20 and new_w > 20:
-                            scaled_face = cv2.resize(face_img, (new_w, new_h))
-                            
-                            # Match with stored face
-                            target_size = min(scaled_face.shape[0], scaled_face.shape[1], 
-                                            stored_face.shape[0], stored_face.shape[1])
-                            
-                            if target_size > 20:
-                                face_resized = cv2.resize(scaled_face, (target_size, target_size))
-                                stored_resized = cv2.resize(stored_face, (target_size, target_size))
-                                
-                                # Calculate similarity
-                                diff = np.mean(np.abs(face_resized.astype(float) - stored_resized.astype(float)))
-                                scale_scores.append(diff)
-                    
-                    # Use best scale score
-                    if scale_scores:
-                        avg_diff = np.mean(scale_scores)
-                        if avg_diff < best_confidence:
-                            best_confidence = avg_diff
-                            best_match_id = self.ids_data[i]
-                            
-                except Exception:
-                    continue
+            # Multi-scale template matching (0.8x, 1.0x, 1.2x) on the prefilter's candidates;
+            # the kernel reuses its buffers, so the loop over gallery faces allocates nothing
+            kernel = self._mad_kernel()
+            kernel.set_probe(face_img)
+            best_row, best_confidence = kernel.best(self.faces_data, self._mad_candidates(face_img, kernel))
+            best_match_id = self.ids_data[best_row] if best_confidence != float('inf') else 0
             
             # Convert to percentage confidence (higher is better)
             confidence = max(0, 100 - (best_confidence / 255 * 100)) if best_confidence != float('inf') else 0
@@ -124,17 +134,17 @@ class AttendanceFaceRecognizer:
             print(f"[ERROR] Recognition failed: {e}")
             return 0, 0.0
     
-    def start_camera(self, camera_id=0):
-        """Start camera for face recognition"""
+    def start_camera(self, camera_id=0, width=640, height=480, fps=30):
+        """Start camera for face recognition (camera_id may be an index, device path or stream URL)"""
         try:
             self.camera = cv2.VideoCapture(camera_id)
             if not self.camera.isOpened():
                 raise Exception("Cannot open camera")
                 
             # Set camera properties
-            self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            self.camera.set(cv2.CAP_PROP_FPS, 30)
+            self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            self.camera.set(cv2.CAP_PROP_FPS, fps)
             
             print("[INFO] Camera started successfully")
             return True
@@ -151,32 +161,54 @@ class AttendanceFaceRecognizer:
             self.camera = None
         print("[INFO] Camera stopped")
     
-    def recognize_faces_in_frame(self, frame):
-        """Recognize faces in a single frame"""
-        if self.camera is None or len(self.faces_data) == 0:
+    def create_detector(self, cascade=None):
+        """Detection scheduler with this recognizer's detector backend and the configured parameters (one per video stream)"""
+        if cascade is None:
+            cascade = create_face_detector(self.detector_backend)
+        return DetectionScheduler(cascade)
+    
+    def recognize_faces_in_frame(self, frame, annotate=True, detector=None, motion_gate=None):
+        """
+        Recognize faces in a single frame
+        
+        Args:
+            frame: BGR or grayscale frame (from any source: camera, video file, stream)
+            annotate: Draw boxes and labels onto the frame (not needed headless)
+            detector: DetectionScheduler to use instead of self.detector; it tracks
+                      faces between frames, so every stream needs its own
+            motion_gate: MotionGate to use instead of self.motion_gate (also per stream)
+        
+        Frames the motion gate considers unchanged are not detected or
+        recognized; they return no students.
+        """
+        if self.faces_data is None or len(self.faces_data) == 0:
             return frame, []
         
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        with self.perf_stats.measure('grayscale'):
+            gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        
+        gate = motion_gate or self.motion_gate
+        if gate is not None and not gate.should_process(gray):
+            if annotate:
+                self._draw_annotations(frame, self._last_annotations)
+                if self.show_perf_overlay:
+                    self.perf_stats.draw_overlay(frame)
+            return frame, []
         
         # Detect faces
-        faces = self.face_cascade.detectMultiScale(
-            gray,
-            scaleFactor=1.2,
-            minNeighbors=5,
-            minSize=(50, 50)
-        )
+        with self.perf_stats.measure('detect'):
+            faces = (detector or self.detector).detect(gray)
         
         recognized_students = []
+        annotations = []
         
         for (x, y, w, h) in faces:
-            # Draw rectangle around face
-            cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-            
             # Extract face for recognition
             face_img = gray[y:y+h, x:x+w]
             
             # Recognize face
-            student_id, confidence = self.enhanced_face_recognition(face_img)
+            with self.perf_stats.measure('match'):
+                student_id, confidence = self.enhanced_face_recognition(face_img)
             
             # Determine name and status
             if confidence > self.confidence_threshold and student_id in self.student_names:
@@ -185,7 +217,7 @@ class AttendanceFaceRecognizer:
                 
                 # Add to recognized list
                 recognized_students.append({
-                    'student_id': student_id,
+                    'student_id': int(student_id),
                     'name': name,
                     'confidence': confidence,
                     'position': (x, y, w, h)
@@ -195,13 +227,23 @@ class AttendanceFaceRecognizer:
                 name = "Unknown"
                 status_color = (0, 0, 255)  # Red
             
-            # Display name and confidence
-            label = f"{name} ({confidence:.1f}%)"
-            cv2.putText(frame, label, (x+5, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, status_color, 2)
-            cv2.putText(frame, f"ID: {student_id}", (x+5, y+h+20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, status_color, 1)
+            annotations.append(((x, y, w, h), f"{name} ({confidence:.1f}%)", student_id, status_color))
+        
+        if annotate:
+            self._last_annotations = annotations
+            self._draw_annotations(frame, annotations)
+            if self.show_perf_overlay:
+                self.perf_stats.draw_overlay(frame)
         
         return frame, recognized_students
     
+    def _draw_annotations(self, frame, annotations):
+        """Draw rectangle, name and confidence of each face"""
+        for (x, y, w, h), label, student_id, status_color in annotations:
+            cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
+            cv2.putText(frame, label, (x+5, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, status_color, 2)
+            cv2.putText(frame, f"ID: {student_id}", (x+5, y+h+20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, status_color, 1)
+    
     def record_attendance_for_student(self, student_id, confidence):
         """Record attendance for a recognized student"""
         if not self.current_session_id:
@@ -209,28 +251,36 @@ class AttendanceFaceRecognizer:
         
         current_time = time.time()
         
-        # Check cooldown period
-        if student_id in self.last_recognition_time:
-            if current_time - self.last_recognition_time[student_id] < self.recognition_cooldown:
+        # Check cooldown period and reserve the slot, so two cameras seeing the
+        # same student at once record it only once
+        with self._attendance_lock:
+            previous_time = self.last_recognition_time.get(student_id)
+            if previous_time is not None and current_time - previous_time < self.recognition_cooldown:
                 return False  # Still in cooldown
+            self.last_recognition_time[student_id] = current_time
         
         try:
             # Record attendance
-            self.db.record_attendance(
-                self.current_session_id,
-                student_id,
-                confidence,
-                'present'
-            )
-            
-            # Update last recognition time
-            self.last_recognition_time[student_id] = current_time
+            with self.perf_stats.measure('db_write'):
+                self.db.record_attendance(
+                    self.current_session_id,
+                    student_id,
+                    confidence,
+                    'present'
+                )
             
             print(f"[INFO] Recorded attendance for {self.student_names.get(student_id, f'ID:{student_id}')} (confidence: {confidence:.1f}%)")
             return True
             
         except Exception as e:
             print(f"[ERROR] Failed to record attendance: {e}")
+            with self._attendance_lock:
+                # Release the reservation so the next sighting retries
+                if self.last_recognition_time.get(student_id) == current_time:
+                    if previous_time is None:
+                        del self.last_recognition_time[student_id]
+                    else:
+                        self.last_recognition_time[student_id] = previous_time
             return False
     
     def start_attendance_recognition(self, session_id, callback=None):
@@ -244,7 +294,9 @@ class AttendanceFaceRecognizer:
         def recognition_loop():
             while self.is_running and self.camera is not None:
                 try:
-                    ret, frame = self.camera.read()
+                    frame_start = time.perf_counter()
+                    with self.perf_stats.measure('capture'):
+                        ret, frame = self.camera.read()
                     if not ret:
                         continue
                     
@@ -263,7 +315,12 @@ class AttendanceFaceRecognizer:
                     
                     # Display frame (if GUI is integrated)
                     if callback:
-                        callback({'frame': processed_frame, 'students': recognized_students})
+                        with self.perf_stats.measure('render'):
+                            callback({'frame': processed_frame, 'students': recognized_students})
+                    
+                    self.perf_stats.record('frame', time.perf_counter() - frame_start)
+                    if self.perf_stats.maybe_log() and self.motion_gate is not None:
+                        print(f"[INFO] Motion gate skipped {self.motion_gate.skip_rate:.0%} of frames")
                     
                     # Small delay to prevent excessive CPU usage
                     time.sleep(0.1)
@@ -325,6 +382,7 @@ def test_recognition():
     
     db = DatabaseManager()
     recognizer = AttendanceFaceRecognizer(db)
+    recognizer.show_perf_overlay = True
     
     if recognizer.start_camera():
         print("Press 'q' to quit")
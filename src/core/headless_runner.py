@@ -0,0 +1,179 @@
+"""
+Headless Attendance Runner
+Chạy điểm danh tự động không cần giao diện (Tkinter) cho máy không có màn hình
+"""
+
+import logging
+import threading
+import time
+
+from utils.config import PERFORMANCE_PROFILES, DEFAULT_PERFORMANCE_PROFILE, STATS_LOG_INTERVAL
+
+
+class HeadlessAttendanceRunner:
+    def __init__(self, recognizer, session_id, camera_source=0,
+                 profile=DEFAULT_PERFORMANCE_PROFILE, stats_interval=STATS_LOG_INTERVAL):
+        """
+        Run the recognition loop of an AttendanceFaceRecognizer without a GUI
+
+        Args:
+            recognizer: AttendanceFaceRecognizer with training data loaded
+            session_id: Attendance session to record into
+            camera_source: Camera index, device path or stream URL,
+                           or a list of them to feed one session from several cameras
+            profile: Key of PERFORMANCE_PROFILES
+            stats_interval: Seconds between stats log lines
+        """
+        if profile not in PERFORMANCE_PROFILES:
+            raise ValueError(f"Unknown performance profile '{profile}'. "
+                             f"Choose from: {', '.join(PERFORMANCE_PROFILES)}")
+
+        self.recognizer = recognizer
+        self.session_id = session_id
+        if isinstance(camera_source, (list, tuple)) and len(camera_source) == 1:
+            camera_source = camera_source[0]
+        self.camera_source = camera_source
+        self.profile_name = profile
+        self.profile = PERFORMANCE_PROFILES[profile]
+        self.stats_interval = stats_interval
+        self.logger = logging.getLogger(__name__)
+
+        self._stop_event = threading.Event()
+        self.stats = {
+            'frames_captured': 0,
+            'frames_processed': 0,
+            'faces_recognized': 0,
+            'attendance_recorded': 0,
+            'read_failures': 0,
+        }
+
+        # Latency percentiles are logged together with the runner stats
+        self.recognizer.perf_stats.log_interval = stats_interval
+
+    def stop(self):
+        """Request a graceful stop (safe to call from a signal handler)"""
+        self._stop_event.set()
+
+    @property
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def run(self):
+        """Blocking recognition loop; returns when stop() is called or the source ends"""
+        if isinstance(self.camera_source, (list, tuple)):
+            return self.run_multi_camera()
+
+        recognizer = self.recognizer
+        if not recognizer.start_camera(self.camera_source,
+                                       width=self.profile['frame_width'],
+                                       height=self.profile['frame_height']):
+            self.logger.error(f"Cannot open camera source {self.camera_source!r}")
+            return False
+
+        recognizer.current_session_id = self.session_id
+        recognizer.last_recognition_time = {}
+        recognizer.is_running = True
+
+        frame_interval = 1.0 / self.profile['max_fps'] if self.profile['max_fps'] else 0.0
+        every_n = max(1, self.profile['process_every_n_frames'])
+        started = time.time()
+        last_stats = started
+
+        self.logger.info(f"Headless attendance started: session={self.session_id}, "
+                         f"source={self.camera_source!r}, profile={self.profile_name}")
+        try:
+            while not self._stop_event.is_set():
+                loop_start = time.perf_counter()
+
+                with recognizer.perf_stats.measure('capture'):
+                    ret, frame = recognizer.camera.read()
+                if not ret:
+                    self.stats['read_failures'] += 1
+                    if self.stats['read_failures'] >= 50:
+                        self.logger.error("Camera stopped delivering frames, exiting")
+                        break
+                    self._stop_event.wait(0.1)
+                    continue
+                self.stats['read_failures'] = 0
+                self.stats['frames_captured'] += 1
+
+                if self.stats['frames_captured'] % every_n == 0:
+                    try:
+                        self.process_frame(frame)
+                    except Exception as e:
+                        self.logger.exception(f"Recognition error: {e}")
+                    recognizer.perf_stats.record('frame', time.perf_counter() - loop_start)
+
+                now = time.time()
+                if now - last_stats >= self.stats_interval:
+                    self.log_stats(now - started)
+                    last_stats = now
+                recognizer.perf_stats.maybe_log()
+
+                # Frame rate cap; wait() returns early on stop()
+                remaining = frame_interval - (time.perf_counter() - loop_start)
+                if remaining > 0:
+                    self._stop_event.wait(remaining)
+        finally:
+            recognizer.stop_attendance_recognition()
+            recognizer.stop_camera()
+            self.log_stats(time.time() - started)
+            self.logger.info("Headless attendance stopped")
+        return True
+
+    def run_multi_camera(self):
+        """Recognition over several cameras with a shared worker pool (see CameraManager)"""
+        from core.camera_manager import CameraManager
+
+        recognizer = self.recognizer
+        recognizer.current_session_id = self.session_id
+        recognizer.last_recognition_time = {}
+        recognizer.is_running = True
+
+        manager = CameraManager(recognizer, self.camera_source,
+                                width=self.profile['frame_width'], height=self.profile['frame_height'],
+                                max_fps=self.profile['max_fps'],
+                                process_every_n_frames=self.profile['process_every_n_frames'])
+        if not manager.start():
+            manager.stop()
+            self.logger.error("None of the camera sources could be opened")
+            return False
+
+        self.logger.info(f"Headless attendance started: session={self.session_id}, "
+                         f"{len(self.camera_source)} cameras, {manager.workers} recognition workers, "
+                         f"profile={self.profile_name}")
+        try:
+            while not self._stop_event.wait(self.stats_interval):
+                manager.log_stats()
+                recognizer.perf_stats.maybe_log()
+                if not manager.active:
+                    self.logger.error("All cameras stopped delivering frames, exiting")
+                    break
+        finally:
+            manager.stop()
+            recognizer.stop_attendance_recognition()
+            manager.log_stats()
+            self.logger.info("Headless attendance stopped")
+        return True
+
+    def process_frame(self, frame):
+        """Recognize faces in one frame and record attendance for matches"""
+        _, recognized = self.recognizer.recognize_faces_in_frame(frame, annotate=False)
+        self.stats['frames_processed'] += 1
+        self.stats['faces_recognized'] += len(recognized)
+
+        for student in recognized:
+            if self.recognizer.record_attendance_for_student(student['student_id'], student['confidence']):
+                self.stats['attendance_recorded'] += 1
+
+    def log_stats(self, elapsed):
+        """Log throughput counters since start"""
+        elapsed = max(elapsed, 1e-6)
+        self.logger.info(
+            f"[stats] {elapsed:.0f}s | captured {self.stats['frames_captured']} "
+            f"({self.stats['frames_captured'] / elapsed:.1f} fps) | processed {self.stats['frames_processed']} "
+            f"({self.stats['frames_processed'] / elapsed:.1f} fps) | recognized {self.stats['faces_recognized']} "
+            f"| attendance recorded {self.stats['attendance_recorded']}"
+            + (f" | motion skip {self.recognizer.motion_gate.skip_rate:.0%}"
+               if self.recognizer.motion_gate is not None else "")
+        )
@@ -0,0 +1,1008 @@
+"""
+Face Matching Engines
+Các thuật toán so khớp khuôn mặt có thể thay thế (mặc định: so sánh điểm ảnh MAD)
+
+An engine is fitted once on the training gallery (faces_data.npy /
+ids_data.npy), saved next to it in data/trainer/ and answers match(face)
+with (student_id, confidence) on the same 0-100 scale as the original
+pixel MAD matcher, so CONFIDENCE_THRESHOLD keeps its meaning.
+"""
+
+import math
+import os
+
+import cv2
+import numpy as np
+
+from core.ann_index import IVFIndex, PrototypeIndex
+from utils.config import (RECOGNITION_ENGINE, MATCH_FACE_SIZE, PCA_COMPONENTS, PCA_FIT_SAMPLES, LBP_GRID,
+                          IVF_MIN_GALLERY, IVF_PROBES, MAD_PREFILTER_SIZE, MAD_PREFILTER_TOP_K, MAD_HASH_TOP_K,
+                          PROTOTYPE_TOP_STUDENTS, COMPACT_GALLERY_BITS, PCA_STORAGE_DTYPE, MOSAIC_FACE_SIZE,
+                          MOSAIC_METHOD, CONFIDENCE_THRESHOLD, CALIBRATION_PERCENTILE, CALIBRATION_MARGIN,
+                          CALIBRATION_SAMPLES, MATCHER_HASH_TOP_K)
+
+# Neighbours of the 3x3 LBP operator, clockwise from the top-left pixel
+LBP_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1))
+
+
+def _uniform_lbp_table():
+    """Map the 256 LBP codes to 59 bins: one per uniform pattern (<= 2 bit transitions), one for the rest"""
+    table = np.full(256, 58, dtype=np.uint8)
+    next_bin = 0
+    for code in range(256):
+        rotated = ((code << 1) | (code >> 7)) & 0xFF
+        if bin(code ^ rotated).count('1') <= 2:
+            table[code] = next_bin
+            next_bin += 1
+    return table
+
+
+LBP_UNIFORM_TABLE = _uniform_lbp_table()
+LBP_BINS = 59
+
+# Set bits of every byte value, for NumPy versions without np.bitwise_count (< 2.0)
+POPCOUNT_TABLE = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+# Thumbnails differenced per int16 block in ThumbnailPrefilter (bounds that scratch to 512 KB at 16x16)
+PREFILTER_BLOCK_ROWS = 1024
+
+
+def resize_face(face_img, size=MATCH_FACE_SIZE, dst=None):
+    """Grayscale or BGR crop -> uint8 grayscale face of a fixed size (written into `dst` when given)"""
+    if face_img.ndim == 3:
+        face_img = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
+    interpolation = cv2.INTER_AREA if face_img.shape[0] > size[1] else cv2.INTER_LINEAR
+    return cv2.resize(face_img, size, dst=dst, interpolation=interpolation)
+
+
+def normalize_face(face_img, size=MATCH_FACE_SIZE):
+    """Grayscale crop -> float32 vector of a fixed-size face"""
+    return resize_face(face_img, size).astype(np.float32).ravel()
+
+
+def normalize_faces(faces, size=MATCH_FACE_SIZE):
+    """Stack a gallery of variable-size crops into an (N, size[0] * size[1]) float32 matrix"""
+    matrix = np.empty((len(faces), size[0] * size[1]), dtype=np.float32)
+    for i, face in enumerate(faces):
+        matrix[i] = normalize_face(face, size)
+    return matrix
+
+
+def rms_confidence(squared_distance, n_pixels):
+    """Squared pixel-space distance -> 0-100 confidence (100 - RMS difference in % of 255)"""
+    rms = np.sqrt(np.maximum(squared_distance, 0.0) / n_pixels)
+    return np.maximum(0.0, 100.0 - rms / 255.0 * 100.0)
+
+
+def lbp_codes(faces):
+    """
+    Uniform LBP bin of every pixel of a stack of equally sized faces
+
+    Args:
+        faces: uint8 array (N, H, W)
+
+    Returns:
+        uint8 array (N, H, W) of bins 0-58 (borders replicate the edge pixels)
+    """
+    padded = np.pad(faces, ((0, 0), (1, 1), (1, 1)), mode='edge')
+    h, w = faces.shape[1:]
+    codes = np.zeros(faces.shape, dtype=np.uint8)
+    for bit, (dy, dx) in enumerate(LBP_OFFSETS):
+        neighbour = padded[:, 1 + dy:1 + dy + h, 1 + dx:1 + dx + w]
+        codes |= (neighbour >= faces).view(np.uint8) << bit
+    return LBP_UNIFORM_TABLE[codes]
+
+
+def lbp_histograms(faces, grid=LBP_GRID):
+    """
+    Concatenated per-cell histograms of uniform LBP bins
+
+    Args:
+        faces: uint8 array (N, H, W) with H, W divisible by the grid
+        grid: (columns, rows) of cells
+
+    Returns:
+        uint8 array (N, rows * columns * LBP_BINS) of bin counts per cell
+    """
+    n, h, w = faces.shape
+    cols, rows = grid
+    codes = lbp_codes(faces)
+    # Flat histogram index of each pixel: face, cell, bin
+    cell_rows = (np.arange(h) * rows // h)[:, None]
+    cell_cols = (np.arange(w) * cols // w)[None, :]
+    cell_index = (cell_rows * cols + cell_cols).astype(np.int64) * LBP_BINS
+    face_offset = (np.arange(n, dtype=np.int64) * rows * cols * LBP_BINS)[:, None, None]
+    flat = (face_offset + cell_index + codes).ravel()
+    counts = np.bincount(flat, minlength=n * rows * cols * LBP_BINS)
+    # A cell has at most (h / rows) * (w / cols) pixels; 8x8 cells fit in uint8
+    return counts.reshape(n, -1).astype(np.uint8 if (h // rows) * (w // cols) < 256 else np.uint16)
+
+
+def dhash(faces):
+    """
+    64-bit difference hash of each face: the sign of horizontal gradients on a 9x8 thumbnail
+
+    Returns:
+        uint64 array (N,), one packed hash per face
+    """
+    hashes = np.empty(len(faces), dtype=np.uint64)
+    for start in range(0, len(faces), 4096):
+        small = np.stack([resize_face(face, (9, 8)) for face in faces[start:start + 4096]])
+        bits = (small[:, :, 1:] > small[:, :, :-1]).reshape(len(small), 64)
+        hashes[start:start + len(small)] = np.packbits(bits, axis=1).view('>u8').ravel()
+    return hashes
+
+
+def hamming_distances(hashes, probe_hash, out=None, xor=None):
+    """
+    Differing bits between each packed uint64 hash and one probe hash (XOR + popcount)
+
+    `out` ((N,) uint8) and `xor` ((N,) uint64) are optional scratch arrays
+    that the result and the XOR are written into.
+    """
+    xor = np.bitwise_xor(hashes, np.uint64(probe_hash), out=xor)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(xor, out=out)
+    return POPCOUNT_TABLE[xor.view(np.uint8)].reshape(len(xor), 8).sum(axis=1, dtype=np.uint8, out=out)
+
+
+class BaseMatcher:
+    """
+    Common interface of matching engines
+
+    Subclasses implement fit(), match() and the arrays saved by save().
+    Matchers are read-only after fit(), so one instance can serve several
+    recognition threads.
+
+    With an IVFIndex attached (build_index), match() only computes exact
+    distances for the gallery rows in the probe's closest index lists.
+    Otherwise, with per-student prototypes (build_prototypes, saved in the
+    model file), only the samples of the students with the closest
+    prototypes are compared. features() provides the vectors both cluster;
+    the final distance and confidence are always the engine's exact ones.
+    Without either, a gallery larger than hash_top_k is pruned to the rows
+    with the nearest dHash (build_hashes, saved in the model file).
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.ids = np.array([], dtype=np.int64)
+        self.index = None  # Optional IVFIndex over features() vectors
+        self.prototypes = None  # Optional PrototypeIndex over features() vectors
+        self.source_stamp = None  # gallery_stamp() of the faces_data.npy the saved model was fitted on
+        self.hashes = None  # Optional dhash() of the gallery faces
+        self.hash_top_k = MATCHER_HASH_TOP_K
+
+    def __len__(self):
+        return len(self.ids)
+
+    def fit(self, faces, ids):
+        """Build the engine's gallery from face crops and their student IDs"""
+        raise NotImplementedError
+
+    def match(self, face_img):
+        """Return (student_id, confidence 0-100) of the closest gallery face"""
+        raise NotImplementedError
+
+    def features(self, rows):
+        """float32 feature vectors of gallery rows (index array or slice) used by the ANN indexes"""
+        raise NotImplementedError
+
+    def feature_block(self, start, stop):
+        """float32 feature vectors of gallery rows [start, stop)"""
+        return self.features(slice(start, stop))
+
+    def build_index(self, **kwargs):
+        """Cluster the gallery into an IVFIndex (kwargs: n_lists, n_probe, train_samples)"""
+        self.index = IVFIndex(**kwargs).build(self.feature_block, len(self))
+        return self.index
+
+    def build_prototypes(self, **kwargs):
+        """Summarize every student by prototypes (kwargs: n_centres, top_students)"""
+        self.prototypes = PrototypeIndex(**kwargs).build(self.features, self.ids)
+        return self.prototypes
+
+    def build_hashes(self, faces):
+        """64-bit dHash of every gallery face (the crops the matcher was fitted on)"""
+        self.hashes = dhash(faces)
+        return self.hashes
+
+    def _same_student_rows(self, samples, seed=0):
+        """(row, other rows of the same student) for up to `samples` random gallery rows"""
+        n = len(self.ids)
+        rows = np.arange(n)
+        if n > samples:
+            rows = np.random.default_rng(seed).choice(n, samples, replace=False)
+        order = np.argsort(self.ids, kind='stable')
+        sorted_ids = self.ids[order]
+        for row in rows:
+            start = np.searchsorted(sorted_ids, self.ids[row], side='left')
+            stop = np.searchsorted(sorted_ids, self.ids[row], side='right')
+            same = order[start:stop]
+            same = same[same != row]
+            if len(same):
+                yield row, same
+
+    def _candidate_rows(self, query_feature, face_img=None):
+        """Gallery rows to compare exactly (None = all of them)"""
+        if self.index is not None:
+            return self.index.candidates(query_feature)
+        if self.prototypes is not None:
+            rows = self.prototypes.candidates(query_feature)
+            if rows is not None:
+                return rows
+        if (self.hashes is not None and face_img is not None and self.hash_top_k
+                and len(self.hashes) > self.hash_top_k):
+            distances = hamming_distances(self.hashes, dhash([face_img])[0])
+            return np.sort(np.argpartition(distances, self.hash_top_k - 1)[:self.hash_top_k])
+        return None
+
+    @property
+    def nbytes(self):
+        """Memory held by the gallery representation"""
+        arrays = dict(self._arrays())
+        if self.prototypes is not None:
+            arrays.update(self.prototypes.arrays())
+        if self.hashes is not None:
+            arrays['hashes'] = self.hashes
+        return sum(array.nbytes for array in arrays.values())
+
+    def _arrays(self):
+        """Arrays that make up the fitted model (saved/loaded as-is)"""
+        raise NotImplementedError
+
+    def _set_arrays(self, arrays):
+        raise NotImplementedError
+
+    def save(self, path, source_stamp=None):
+        """Write the fitted model to an .npz file (source_stamp: see gallery_stamp())"""
+        arrays = dict(self._arrays())
+        if self.prototypes is not None:
+            arrays.update(self.prototypes.arrays())
+        if self.hashes is not None:
+            arrays['hashes'] = self.hashes
+        if source_stamp is not None:
+            arrays['source_stamp'] = np.array(source_stamp, dtype=np.int64)
+        np.savez(path, engine=np.array(self.name), **arrays)
+        self.source_stamp = source_stamp
+
+    @classmethod
+    def load(cls, path):
+        """Read a model written by save()"""
+        with np.load(path, allow_pickle=False) as data:
+            if str(data['engine']) != cls.name:
+                raise ValueError(f"{path} holds a '{data['engine']}' model, not '{cls.name}'")
+            matcher = cls()
+            arrays = {key: data[key] for key in data.files if key not in ('engine', 'source_stamp', 'hashes')}
+            matcher._set_arrays(arrays)
+            if 'hashes' in data.files:
+                matcher.hashes = data['hashes']
+            if 'source_stamp' in data.files:
+                matcher.source_stamp = tuple(int(v) for v in data['source_stamp'])
+            if 'prototype_vectors' in arrays:
+                matcher.prototypes = PrototypeIndex.from_arrays(arrays, matcher.ids)
+        return matcher
+
+
+class PCAMatcher(BaseMatcher):
+    """
+    Eigenface matcher: compare faces in a low-dimensional PCA subspace
+
+    Gallery faces are resized to MATCH_FACE_SIZE and projected on the top
+    `n_components` principal axes (NumPy SVD, fitted on at most
+    PCA_FIT_SAMPLES faces). A probe is projected once and compared with all
+    gallery coefficients in one matrix product. Because the axes are
+    orthonormal, distances approximate pixel distances and are reported as
+    an RMS pixel difference on the MAD confidence scale.
+
+    With storage_dtype "float16" the gallery coefficients take half the
+    memory; they are converted to float32 one batch at a time when matching.
+    """
+
+    name = "pca"
+    batch_size = 4096  # Gallery rows converted to float32 at a time when stored as float16
+
+    def __init__(self, n_components=PCA_COMPONENTS, face_size=MATCH_FACE_SIZE, fit_samples=PCA_FIT_SAMPLES,
+                 storage_dtype=PCA_STORAGE_DTYPE):
+        super().__init__()
+        self.n_components = n_components
+        self.face_size = tuple(face_size)
+        self.fit_samples = fit_samples
+        self.storage_dtype = np.dtype(storage_dtype)
+        self.mean = None
+        self.components = None   # (k, D) principal axes
+        self.projections = None  # (N, k) gallery coefficients
+        self._norms = None       # squared norms of the projections
+
+    def fit(self, faces, ids, seed=0):
+        X = normalize_faces(faces, self.face_size)
+        sample = X
+        if self.fit_samples and len(X) > self.fit_samples:
+            rng = np.random.default_rng(seed)
+            sample = X[rng.choice(len(X), self.fit_samples, replace=False)]
+
+        self.mean = sample.mean(axis=0)
+        # Rows of vt are the principal axes, sorted by explained variance
+        _, _, vt = np.linalg.svd(sample - self.mean, full_matrices=False)
+        self.components = np.ascontiguousarray(vt[:min(self.n_components, len(vt))], dtype=np.float32)
+        self.projections = self.project_matrix(X).astype(self.storage_dtype, copy=False)
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self._norms = self._squared_norms(self.projections)
+        return self
+
+    def _squared_norms(self, projections):
+        norms = np.empty(len(projections), dtype=np.float32)
+        for start in range(0, len(projections), self.batch_size):
+            block = projections[start:start + self.batch_size].astype(np.float32, copy=False)
+            norms[start:start + len(block)] = np.einsum('ij,ij->i', block, block)
+        return norms
+
+    def _dot(self, probe, rows=None):
+        """Gallery coefficients (all, or `rows`) times the probe, in float32"""
+        projections = self.projections if rows is None else self.projections[rows]
+        if projections.dtype == np.float32:
+            return projections @ probe
+        return np.concatenate([projections[start:start + self.batch_size].astype(np.float32) @ probe
+                               for start in range(0, len(projections), self.batch_size)])
+
+    def project_matrix(self, X):
+        return (X - self.mean) @ self.components.T
+
+    def project(self, face_img):
+        return self.components @ (normalize_face(face_img, self.face_size) - self.mean)
+
+    def features(self, rows):
+        return self.projections[rows].astype(np.float32, copy=False)
+
+    def match(self, face_img):
+        if self.projections is None or not len(self.projections):
+            return 0, 0.0
+        probe = self.project(face_img)
+        rows = self._candidate_rows(probe, face_img)
+        norms = self._norms if rows is None else self._norms[rows]
+        distances = norms - 2.0 * self._dot(probe, rows) + probe @ probe
+        best = int(np.argmin(distances))
+        confidence = float(rms_confidence(distances[best], self.face_size[0] * self.face_size[1]))
+        return int(self.ids[best if rows is None else rows[best]]), confidence
+
+    def _arrays(self):
+        return {'mean': self.mean, 'components': self.components, 'projections': self.projections,
+                'ids': self.ids, 'face_size': np.array(self.face_size)}
+
+    def _set_arrays(self, arrays):
+        self.mean = arrays['mean']
+        self.components = arrays['components']
+        self.projections = arrays['projections']
+        self.ids = arrays['ids']
+        self.face_size = tuple(int(v) for v in arrays['face_size'])
+        self.n_components = len(self.components)
+        self.storage_dtype = self.projections.dtype
+        self._norms = self._squared_norms(self.projections)
+
+
+class LBPMatcher(BaseMatcher):
+    """
+    LBP histogram matcher with chi-square distance (NumPy LBPH)
+
+    Each face is resized to MATCH_FACE_SIZE, every pixel is coded by
+    comparing it with its 8 neighbours (vectorized over the whole gallery),
+    and uniform-pattern histograms of an LBP_GRID of cells are concatenated.
+    LBP codes only depend on the order of neighbouring intensities, so
+    brightness and contrast changes barely move them.
+
+    Gallery histograms are computed at training time and stored bin-major
+    (one row per bin, one column per sample). A probe only has a few
+    non-empty bins; chi-square terms where the probe bin is empty reduce to
+    the gallery count, so only the probe's non-empty rows are read.
+    """
+
+    name = "lbp"
+    # Chi-square distance, as a fraction of its maximum, that maps to confidence 0.
+    # Set by calibrate() from the gallery; this default is only kept when no
+    # student has two samples to measure.
+    chi_square_scale = 0.8
+    batch_size = 4096  # Gallery samples per block (bounds temporary memory)
+
+    def __init__(self, face_size=MATCH_FACE_SIZE, grid=LBP_GRID):
+        super().__init__()
+        self.face_size = tuple(face_size)
+        self.grid = tuple(grid)
+        self.bin_counts = None  # (cells * LBP_BINS, N) histogram counts, bin-major
+
+    @property
+    def n_pixels(self):
+        return self.face_size[0] * self.face_size[1]
+
+    def histograms(self, faces):
+        """LBP histograms (N, cells * LBP_BINS) of a list of face crops"""
+        stack = np.empty((len(faces), self.face_size[1], self.face_size[0]), dtype=np.uint8)
+        for i, face in enumerate(faces):
+            stack[i] = resize_face(face, self.face_size)
+        return lbp_histograms(stack, self.grid)
+
+    def fit(self, faces, ids):
+        blocks = [self.histograms(faces[start:start + self.batch_size])
+                  for start in range(0, len(faces), self.batch_size)]
+        self.bin_counts = np.ascontiguousarray(np.concatenate(blocks).T) if blocks else None
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.calibrate()
+        return self
+
+    def calibrate(self, percentile=CALIBRATION_PERCENTILE, margin=CALIBRATION_MARGIN,
+                  samples=CALIBRATION_SAMPLES, seed=0):
+        """
+        Fit chi_square_scale to the gallery's own distance distribution
+
+        Each sampled gallery histogram is compared with the other samples of
+        its student. The given percentile of those nearest distances, times
+        margin, is the distance that maps to CONFIDENCE_THRESHOLD.
+        """
+        nearest = [self.distances(self.bin_counts[:, row], same).min()
+                   for row, same in self._same_student_rows(samples, seed)]
+        if not nearest:
+            return self.chi_square_scale
+        threshold = margin * np.percentile(nearest, percentile) / (2.0 * self.n_pixels)
+        self.chi_square_scale = float(threshold / (1.0 - CONFIDENCE_THRESHOLD / 100.0))
+        return self.chi_square_scale
+
+    def features(self, rows):
+        # Square-rooted counts: L2 between them (Hellinger) ranks like chi-square
+        return np.sqrt(self.bin_counts[:, rows].T.astype(np.float32))
+
+    def distances(self, probe_histogram, rows=None):
+        """Chi-square distance of one probe histogram to every gallery histogram (or to `rows`)"""
+        nonzero = np.flatnonzero(probe_histogram)
+        probe = probe_histogram[nonzero].astype(np.float32)[:, None]
+        n = self.bin_counts.shape[1] if rows is None else len(rows)
+        distances = np.empty(n, dtype=np.float32)
+        for start in range(0, n, self.batch_size):
+            if rows is None:
+                block = self.bin_counts[nonzero, start:start + self.batch_size].astype(np.float32)
+            else:
+                block = self.bin_counts[np.ix_(nonzero, rows[start:start + self.batch_size])].astype(np.float32)
+            # Bins empty in the probe contribute their gallery count: every histogram
+            # sums to n_pixels, so that part is n_pixels minus the counts read here
+            outside = self.n_pixels - block.sum(axis=0)
+            total = block + probe
+            block -= probe
+            np.square(block, out=block)
+            block /= total
+            distances[start:start + block.shape[1]] = outside + block.sum(axis=0)
+        return distances
+
+    def match(self, face_img):
+        if self.bin_counts is None or not self.bin_counts.shape[1]:
+            return 0, 0.0
+        probe = self.histograms([face_img])[0]
+        rows = self._candidate_rows(np.sqrt(probe.astype(np.float32)), face_img)
+        distances = self.distances(probe, rows)
+        best = int(np.argmin(distances))
+        # Largest possible distance: two histograms without common bins (2 x pixel count)
+        relative = distances[best] / (2.0 * self.n_pixels)
+        confidence = max(0.0, 100.0 * (1.0 - relative / self.chi_square_scale))
+        return int(self.ids[best if rows is None else rows[best]]), float(confidence)
+
+    def _arrays(self):
+        return {'bin_counts': self.bin_counts, 'ids': self.ids,
+                'face_size': np.array(self.face_size), 'grid': np.array(self.grid),
+                'chi_square_scale': np.array(self.chi_square_scale)}
+
+    def _set_arrays(self, arrays):
+        self.bin_counts = arrays['bin_counts']
+        self.ids = arrays['ids']
+        self.face_size = tuple(int(v) for v in arrays['face_size'])
+        self.grid = tuple(int(v) for v in arrays['grid'])
+        if 'chi_square_scale' in arrays:
+            self.chi_square_scale = float(arrays['chi_square_scale'])
+
+
+class MosaicMatcher(BaseMatcher):
+    """
+    Template matcher over a gallery mosaic: one cv2.matchTemplate call per face
+
+    At fit time every gallery face is resized to MOSAIC_FACE_SIZE and the
+    tiles are stacked into one single-column uint8 mosaic. A probe of the
+    same size is slid down the mosaic in a single C++ call and the scores
+    are read at the tile origins (every tile-height rows), then mapped back
+    to the gallery IDs.
+
+    method "sqdiff" (TM_SQDIFF) reports the RMS pixel difference on the MAD
+    confidence scale; "ccoeff_normed" (TM_CCOEFF_NORMED, insensitive to
+    brightness and contrast) maps the correlation to 0-100 with a scale
+    calibrated on the gallery, like the "lbp" engine.
+
+    matchTemplate also scores the offsets between tile origins, so the call
+    does tile-height times more work than needed. The prototype or IVF
+    index limits the mosaic to the candidate rows.
+    """
+
+    name = "mosaic"
+    METHODS = {'sqdiff': cv2.TM_SQDIFF, 'ccoeff_normed': cv2.TM_CCOEFF_NORMED}
+    # ccoeff_normed: 1 - correlation that maps to confidence 0. Set by
+    # calibrate(); the default reports the correlation itself as a percentage.
+    correlation_scale = 1.0
+
+    def __init__(self, face_size=MOSAIC_FACE_SIZE, method=MOSAIC_METHOD):
+        super().__init__()
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown mosaic method '{method}'. Choose from: {', '.join(self.METHODS)}")
+        self.face_size = tuple(face_size)
+        self.method = method
+        self.tiles = None  # (N, h, w) uint8; the mosaic is tiles.reshape(N * h, w)
+
+    def fit(self, faces, ids):
+        w, h = self.face_size
+        self.tiles = np.empty((len(faces), h, w), dtype=np.uint8)
+        for i, face in enumerate(faces):
+            self.tiles[i] = resize_face(face, self.face_size)
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.calibrate()
+        return self
+
+    def calibrate(self, percentile=CALIBRATION_PERCENTILE, margin=CALIBRATION_MARGIN,
+                  samples=CALIBRATION_SAMPLES, seed=0):
+        """
+        Fit correlation_scale to the gallery's own correlations (ccoeff_normed only)
+
+        Each sampled tile is correlated with the other tiles of its student.
+        The given percentile of 1 - the best of those correlations, times
+        margin, is the gap that maps to CONFIDENCE_THRESHOLD. sqdiff keeps
+        the MAD confidence scale that CONFIDENCE_THRESHOLD was chosen for.
+        """
+        if self.method != 'ccoeff_normed':
+            return self.correlation_scale
+        gaps = [1.0 - self._scores(self.tiles[row], same).max()
+                for row, same in self._same_student_rows(samples, seed)]
+        if not gaps:
+            return self.correlation_scale
+        # Identical enrollment shots give a zero gap; keep the scale positive
+        threshold = max(margin * float(np.percentile(gaps, percentile)), 1e-3)
+        self.correlation_scale = threshold / (1.0 - CONFIDENCE_THRESHOLD / 100.0)
+        return self.correlation_scale
+
+    def features(self, rows):
+        return self.tiles[rows].reshape(-1, self.face_size[0] * self.face_size[1]).astype(np.float32)
+
+    def scores(self, face_img, rows=None):
+        """matchTemplate score of the probe at every tile origin (all tiles, or `rows`)"""
+        return self._scores(resize_face(face_img, self.face_size), rows)
+
+    def _scores(self, probe, rows):
+        tiles = self.tiles if rows is None else self.tiles[rows]
+        mosaic = tiles.reshape(-1, self.face_size[0])
+        return cv2.matchTemplate(mosaic, probe, self.METHODS[self.method])[::self.face_size[1], 0]
+
+    def match(self, face_img):
+        if self.tiles is None or not len(self.tiles):
+            return 0, 0.0
+        probe_feature = normalize_face(face_img, self.face_size)
+        rows = self._candidate_rows(probe_feature, face_img)
+        scores = self.scores(face_img, rows)
+        if self.method == 'sqdiff':
+            best = int(np.argmin(scores))
+            confidence = float(rms_confidence(scores[best], self.face_size[0] * self.face_size[1]))
+        else:
+            best = int(np.argmax(scores))
+            confidence = max(0.0, 100.0 * (1.0 - (1.0 - float(scores[best])) / self.correlation_scale))
+        return int(self.ids[best if rows is None else rows[best]]), confidence
+
+    def _arrays(self):
+        return {'tiles': self.tiles, 'ids': self.ids, 'method': np.array(self.method),
+                'correlation_scale': np.array(self.correlation_scale)}
+
+    def _set_arrays(self, arrays):
+        self.tiles = arrays['tiles']
+        self.ids = arrays['ids']
+        self.method = str(arrays['method'])
+        self.face_size = (self.tiles.shape[2], self.tiles.shape[1])
+        if 'correlation_scale' in arrays:
+            self.correlation_scale = float(arrays['correlation_scale'])
+
+
+def _l1_uint8(rows, probe, out, block):
+    """
+    Sum of absolute differences of uint8 rows to an int16 probe (int16/int32 math, no float)
+
+    Rows are differenced through `block` ((B, D) int16 scratch) B at a time
+    and the sums are written into `out` ((N,) int32).
+    """
+    for start in range(0, len(rows), len(block)):
+        chunk = rows[start:start + len(block)]
+        diff = block[:len(chunk)]
+        np.subtract(chunk, probe, out=diff, dtype=np.int16)
+        np.abs(diff, out=diff)
+        diff.sum(axis=1, dtype=np.int32, out=out[start:start + len(chunk)])
+    return out
+
+
+def _smallest_rows(values, k, scratch, mask):
+    """
+    Indices of the k smallest values in ascending order; ties at the k-th
+    value go to the lowest indices. A copy of `values` is partitioned in
+    `scratch` and compared into `mask` (bool), both of the same length, so
+    only the O(k) index arrays are allocated.
+    """
+    np.copyto(scratch, values)
+    scratch.partition(k - 1)
+    kth = scratch[k - 1]
+    below = np.flatnonzero(np.less(values, kth, out=mask))
+    ties = np.flatnonzero(np.equal(values, kth, out=mask))[:k - len(below)]
+    rows = np.concatenate((below, ties))
+    rows.sort()
+    return rows
+
+
+def mad_distance(face_a, face_b):
+    """Mean absolute pixel difference of two equally sized uint8 faces (same value as the float64 formula)"""
+    return cv2.norm(face_a, face_b, cv2.NORM_L1) / face_a.size
+
+
+class MADKernel:
+    """
+    Pixel MAD of one probe against many gallery faces without per-comparison allocations
+
+    set_probe() rescales the probe once per query (the original loops did it
+    for every gallery face). distance() resizes into scratch buffers with
+    cv2.resize(dst=...) and compares with mad_distance (a scalar cv2.norm), so
+    the loop over gallery faces allocates no array data. Buffers grow to the
+    largest face seen and are then reused for every size, and best() writes
+    distances into an output buffer kept at the largest candidate count seen.
+    4-bit CompactGallery rows are unpacked into a scratch buffer as well.
+
+    Buffers are per instance: give each recognition thread its own kernel.
+    """
+
+    def __init__(self, scales=(0.8, 1.0, 1.2)):
+        self.scales = scales
+        self._buffers = {}
+        self._scaled = []     # (scale index, probe at that scale) for every usable scale
+        self._resized = {}    # scale index -> probe resized to the current target size
+        self._distances = np.empty(0, dtype=np.float64)
+
+    def _buffer(self, key, shape, dtype=np.uint8):
+        """Scratch view of `shape` for `key`; the storage only grows, it is never reallocated smaller"""
+        size = math.prod(shape)
+        storage = self._buffers.get(key)
+        if storage is None or storage.size < size or storage.dtype != dtype:
+            storage = self._buffers[key] = np.empty(size, dtype=dtype)
+        return storage[:size].reshape(shape)
+
+    def set_probe(self, face_img):
+        """Prepare the scaled copies of a probe face (grayscale uint8)"""
+        h, w = face_img.shape
+        self._scaled = []
+        self._resized.clear()
+        for i, scale in enumerate(self.scales):
+            new_h, new_w = int(h * scale), int(w * scale)
+            if new_h > 20 and new_w > 20:
+                if (new_h, new_w) == (h, w):
+                    self._scaled.append((i, face_img))
+                else:
+                    dst = self._buffer(('scaled', i), (new_h, new_w))
+                    self._scaled.append((i, cv2.resize(face_img, (new_w, new_h), dst=dst)))
+
+    def distance(self, stored_face):
+        """Mean over scales of the MAD between the probe and a stored face (inf when no scale fits)"""
+        total, count = 0.0, 0
+        for i, scaled in self._scaled:
+            target = min(scaled.shape[0], scaled.shape[1], stored_face.shape[0], stored_face.shape[1])
+            if target <= 20:
+                continue
+            # The resized probe only depends on the scale and target size: reuse it across gallery faces
+            probe = self._resized.get(i)
+            if probe is None or probe.shape[0] != target:
+                probe = self._resized[i] = cv2.resize(scaled, (target, target),
+                                                      dst=self._buffer(('probe', i), (target, target)))
+            if stored_face.shape == (target, target):
+                stored = stored_face
+            else:
+                stored = cv2.resize(stored_face, (target, target), dst=self._buffer('stored', (target, target)))
+            total += mad_distance(probe, stored)
+            count += 1
+        return total / count if count else float('inf')
+
+    def best(self, faces, rows):
+        """(row, distance) of the closest gallery face among `rows` (first one on ties)"""
+        if len(self._distances) < len(rows):
+            self._distances = np.empty(len(rows), dtype=np.float64)
+        distances = self._distances[:len(rows)]
+        unpacked = self._buffer('unpacked', faces.shape) if isinstance(faces, CompactGallery) else None
+        for j, row in enumerate(rows):
+            try:
+                face = faces[row] if unpacked is None else faces.face(row, unpacked)
+                distances[j] = self.distance(face)
+            except (cv2.error, ValueError, AttributeError):
+                distances[j] = float('inf')  # Unreadable gallery entry: skipped, as before
+        if not len(rows):
+            return None, float('inf')
+        j = int(np.argmin(distances))
+        return rows[j], float(distances[j])
+
+
+class CompactGallery:
+    """
+    Gallery crops normalized to one small size for the built-in MAD engine
+
+    faces_data.npy keeps full-resolution crops (often 150-300 px). Here every
+    face is resized to `size` and stored as uint8 (bits=8) or as 16 grey
+    levels packed two pixels per byte (bits=4), i.e. 4 KB or 2 KB per 64x64
+    face. Indexing returns a uint8 face, so the matching code is unchanged;
+    face(i, out) unpacks 4-bit rows into a caller's buffer instead of a new array.
+    The dHash of every original crop is kept alongside for ThumbnailPrefilter.
+    """
+
+    def __init__(self, pixels, size, bits, hashes=None):
+        self.pixels = pixels  # (N, bytes per face) uint8
+        self.size = tuple(size)
+        self.bits = bits
+        self.hashes = hashes  # (N,) uint64 dhash() of the full-resolution crops
+
+    @classmethod
+    def from_faces(cls, faces, size=MATCH_FACE_SIZE, bits=COMPACT_GALLERY_BITS):
+        if bits not in (4, 8):
+            raise ValueError(f"Compact gallery bits must be 4 or 8, not {bits}")
+        pixels = np.empty((len(faces), size[0] * size[1] * bits // 8), dtype=np.uint8)
+        for i, face in enumerate(faces):
+            face = resize_face(face, size).ravel()
+            if bits == 4:
+                # Nearest of the levels 0, 17, ..., 255; two levels per byte
+                levels = ((face.astype(np.uint16) + 8) // 17).astype(np.uint8)
+                face = (levels[0::2] << 4) | levels[1::2]
+            pixels[i] = face
+        return cls(pixels, size, bits, dhash(faces))
+
+    def __len__(self):
+        return len(self.pixels)
+
+    @property
+    def shape(self):
+        """Shape (h, w) of an unpacked face"""
+        return self.size[1], self.size[0]
+
+    def _unpack(self, row, out=None):
+        if self.bits == 8:
+            return row.reshape(self.shape)
+        if out is None:
+            out = np.empty(self.shape, dtype=np.uint8)
+        flat = out.reshape(-1)
+        np.right_shift(row, 4, out=flat[0::2])
+        np.bitwise_and(row, 0x0F, out=flat[1::2])
+        flat *= 17
+        return out
+
+    def face(self, index, out=None):
+        """uint8 face of one row; 4-bit rows are unpacked into `out` ((h, w) uint8) when given"""
+        return self._unpack(self.pixels[index], out)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self._unpack(row) for row in self.pixels[item]]
+        return self._unpack(self.pixels[item])
+
+    @property
+    def nbytes(self):
+        return self.pixels.nbytes
+
+    def save(self, path, ids, source_stamp):
+        np.savez(path, pixels=self.pixels, size=np.array(self.size), bits=np.array(self.bits),
+                 hashes=self.hashes, ids=np.asarray(ids, dtype=np.int64),
+                 source_stamp=np.array(source_stamp, dtype=np.int64))
+
+    @classmethod
+    def load(cls, path):
+        """Returns (gallery, ids, source_stamp)"""
+        with np.load(path, allow_pickle=False) as data:
+            hashes = data['hashes'] if 'hashes' in data.files else None
+            gallery = cls(data['pixels'], tuple(int(v) for v in data['size']), int(data['bits']), hashes)
+            return gallery, data['ids'], tuple(int(v) for v in data['source_stamp'])
+
+
+class ThumbnailPrefilter:
+    """
+    Coarse stages of the built-in pixel MAD. Large galleries are first pruned
+    to the hash_top_k rows whose dHash is nearest to the probe's (XOR +
+    popcount over 8 bytes per face); the probe's thumbnail is then compared
+    with the remaining thumbnails in one vectorized pass, and only the top_k
+    closest rows are handed to the full-resolution comparison.
+
+    Hashes are read from the gallery when it stores them (CompactGallery,
+    cached in mad_gallery.npz) and computed otherwise; uint8 thumbnails are
+    computed once per gallery. `faces` keeps the gallery they were built
+    from so callers can tell when it has been replaced.
+    """
+
+    def __init__(self, faces, size=MAD_PREFILTER_SIZE, top_k=MAD_PREFILTER_TOP_K, hash_top_k=MAD_HASH_TOP_K,
+                 hashes=None):
+        self.faces = faces
+        self.size = size
+        self.top_k = top_k
+        # The hash stage must leave at least top_k rows for the thumbnail stage
+        self.hash_top_k = max(hash_top_k, top_k) if hash_top_k else 0
+        self.thumbnails = None
+        if top_k and len(faces) > top_k:
+            self.thumbnails = np.stack([resize_face(face, size).ravel() for face in faces])
+        use_hashes = self.thumbnails is not None and self.hash_top_k and len(faces) > self.hash_top_k
+        self.hashes = None
+        if use_hashes:
+            if hashes is None:
+                hashes = getattr(faces, 'hashes', None)
+            self.hashes = hashes if hashes is not None and len(hashes) == len(faces) else dhash(faces)
+
+    def candidates(self, face_img, kernel=None):
+        """
+        Gallery row indices worth the full comparison, in gallery order
+
+        Gallery-sized intermediates (probe thumbnail, Hamming and L1
+        distances, gathered thumbnails, selection scratch) live in the
+        buffers of `kernel` (a MADKernel, one per thread); without one they
+        are allocated for this call. Per query only the probe's dHash and
+        the O(hash_top_k) index arrays are still allocated.
+        """
+        if self.thumbnails is None:
+            return range(len(self.faces))
+        buffer = (kernel if kernel is not None else MADKernel(scales=()))._buffer
+        n, dims = self.thumbnails.shape
+        thumbnail = resize_face(face_img, self.size, dst=buffer('prefilter_probe', (self.size[1], self.size[0])))
+        probe = buffer('prefilter_probe16', (dims,), np.int16)
+        np.copyto(probe, thumbnail.reshape(-1))
+        block = buffer('prefilter_block', (min(n, PREFILTER_BLOCK_ROWS), dims), np.int16)
+        if self.hashes is not None:
+            distances = hamming_distances(self.hashes, dhash([face_img])[0],
+                                          out=buffer('prefilter_hamming', (n,)),
+                                          xor=buffer('prefilter_xor', (n,), np.uint64))
+            rows = _smallest_rows(distances, self.hash_top_k, buffer('prefilter_select', (n,)),
+                                  buffer('prefilter_mask', (n,), np.bool_))
+            thumbnails = np.take(self.thumbnails, rows, axis=0, out=buffer('prefilter_rows', (len(rows), dims)),
+                                 mode='clip')  # mode='raise' would buffer `out`
+        else:
+            rows, thumbnails = None, self.thumbnails
+        m = len(thumbnails)
+        l1 = _l1_uint8(thumbnails, probe, buffer('prefilter_l1', (m,), np.int32), block)
+        best = _smallest_rows(l1, self.top_k, buffer('prefilter_l1_select', (m,), np.int32),
+                              buffer('prefilter_mask', (m,), np.bool_))
+        # Gallery order (rows and best are both ascending) keeps the first-best
+        # tie-breaking of the exhaustive loop
+        return best if rows is None else rows[best]
+
+
+# name -> matcher class; "mad" is the original pixel matcher built into AttendanceFaceRecognizer
+MATCHERS = {
+    'pca': PCAMatcher,
+    'lbp': LBPMatcher,
+    'mosaic': MosaicMatcher,
+}
+RECOGNITION_ENGINES = ('mad',) + tuple(MATCHERS)
+
+
+def create_matcher(engine=None, **kwargs):
+    """Unfitted matcher by name (default: RECOGNITION_ENGINE from config)"""
+    engine = engine or RECOGNITION_ENGINE
+    if engine not in MATCHERS:
+        raise ValueError(f"Unknown recognition engine '{engine}'. Choose from: {', '.join(RECOGNITION_ENGINES)}")
+    return MATCHERS[engine](**kwargs)
+
+
+def model_path(trainer_dir, engine):
+    """Where the fitted model of an engine lives (next to faces_data.npy)"""
+    return os.path.join(trainer_dir, f'{engine}_model.npz')
+
+
+def index_path(trainer_dir, engine):
+    """Where the IVF index of an engine's model lives"""
+    return os.path.join(trainer_dir, f'{engine}_ivf.npz')
+
+
+def compact_gallery_path(trainer_dir):
+    """Where the compact MAD gallery built from faces_data.npy is cached"""
+    return os.path.join(trainer_dir, 'mad_gallery.npz')
+
+
+def gallery_stamp(trainer_dir):
+    """(size, mtime) of data/trainer/faces_data.npy, identifying the gallery a cache was built from"""
+    try:
+        stat = os.stat(os.path.join(trainer_dir, 'faces_data.npy'))
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def load_compact_gallery(trainer_dir, ids, size=MATCH_FACE_SIZE, bits=COMPACT_GALLERY_BITS):
+    """
+    Compact gallery of data/trainer/faces_data.npy, read from its cache when
+    that still matches the file (size, mtime, IDs and settings); otherwise the
+    full-resolution crops are loaded once, converted and the cache rewritten
+
+    Returns:
+        CompactGallery
+    """
+    faces_path = os.path.join(trainer_dir, 'faces_data.npy')
+    stamp = gallery_stamp(trainer_dir)
+    if stamp is None:
+        raise FileNotFoundError(f"No faces_data.npy in {trainer_dir}")
+    path = compact_gallery_path(trainer_dir)
+    if os.path.exists(path):
+        try:
+            gallery, cached_ids, cached_stamp = CompactGallery.load(path)
+            if (cached_stamp == stamp and gallery.size == tuple(size) and gallery.bits == bits
+                    and gallery.hashes is not None
+                    and np.array_equal(cached_ids, np.asarray(ids, dtype=np.int64))):
+                return gallery
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[WARNING] Cannot read {path}: {e}; rebuilding")
+    gallery = CompactGallery.from_faces(np.load(faces_path, allow_pickle=True), size, bits)
+    try:
+        gallery.save(path, ids, stamp)
+    except OSError as e:
+        print(f"[WARNING] Cannot save the compact gallery to {trainer_dir}: {e}")
+    return gallery
+
+
+def _save_index(matcher, trainer_dir, engine):
+    """Build and save the IVF index for large galleries; drop a stale one otherwise"""
+    path = index_path(trainer_dir, engine)
+    if len(matcher) >= IVF_MIN_GALLERY:
+        matcher.build_index().save(path)
+        print(f"[INFO] Built IVF index: {len(matcher.index.centroids)} lists over {len(matcher)} samples")
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def train_matcher(engine, faces, ids, trainer_dir):
+    """Fit an engine, its prototypes and hashes on a gallery and save them (and the IVF index) to trainer_dir"""
+    matcher = create_matcher(engine).fit(faces, ids)
+    if PROTOTYPE_TOP_STUDENTS:
+        matcher.build_prototypes()
+    matcher.build_hashes(faces)
+    matcher.save(model_path(trainer_dir, engine), gallery_stamp(trainer_dir))
+    _save_index(matcher, trainer_dir, engine)
+    return matcher
+
+
+def load_matcher(engine, trainer_dir, faces, ids, n_probe=IVF_PROBES):
+    """
+    Load the saved model of an engine, refitting it when it is missing or was
+    trained on a different gallery (e.g. faces_data.npy rewritten by scripts/:
+    the model records the size and mtime of the file it was fitted on)
+
+    Args:
+        n_probe: IVF lists searched per face when the gallery has an index
+
+    Returns:
+        Fitted matcher, or None for the built-in "mad" engine
+    """
+    engine = engine or RECOGNITION_ENGINE
+    if engine == 'mad':
+        return None
+    path = model_path(trainer_dir, engine)
+    matcher = None
+    if os.path.exists(path):
+        try:
+            matcher = MATCHERS[engine].load(path)
+            if (matcher.source_stamp != gallery_stamp(trainer_dir)
+                    or not np.array_equal(matcher.ids, np.asarray(ids, dtype=np.int64))):
+                print(f"[INFO] {os.path.basename(path)} is out of date, refitting")
+                matcher = None
+            elif os.path.exists(index_path(trainer_dir, engine)):
+                matcher.index = IVFIndex.load(index_path(trainer_dir, engine))
+                if len(matcher.index) != len(matcher):
+                    print("[INFO] IVF index is out of date, rebuilding")
+                    _save_index(matcher, trainer_dir, engine)
+            elif len(matcher) >= IVF_MIN_GALLERY:
+                _save_index(matcher, trainer_dir, engine)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[WARNING] Cannot read {path}: {e}; refitting")
+            matcher = None
+    if matcher is None:
+        try:
+            matcher = train_matcher(engine, faces, ids, trainer_dir)
+        except OSError as e:
+            print(f"[WARNING] Cannot save the '{engine}' model to {trainer_dir}: {e}")
+            matcher = create_matcher(engine).fit(faces, ids)
+            matcher.build_hashes(faces)
+    if matcher.prototypes is None and PROTOTYPE_TOP_STUDENTS:
+        # Model saved before prototypes existed, or fitted without being saved
+        matcher.build_prototypes()
+    if matcher.index is not None:
+        matcher.index.n_probe = n_probe
+    return matcher
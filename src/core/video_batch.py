@@ -0,0 +1,218 @@
+"""
+Offline Video Attendance
+Điểm danh từ video bài giảng đã ghi, nhanh hơn thời gian thực
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import cv2
+
+DEFAULT_STRIDE = 15          # Process every 15th frame (2 frames/s for 30 fps recordings)
+DEFAULT_MAX_WIDTH = 960      # Downscale larger frames before detection
+SEGMENTS_PER_WORKER = 4      # More segments than workers keeps the pool busy until the end
+
+logger = logging.getLogger(__name__)
+
+# Per-process recognizer, built once by _init_worker
+_worker_recognizer = None
+_worker_max_width = None
+
+
+def probe_video(video_path):
+    """
+    Read frame count, fps and duration of a video file
+
+    Returns:
+        dict with frame_count, fps, duration (seconds)
+    """
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise IOError(f"Cannot open video file: {video_path}")
+    try:
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    finally:
+        capture.release()
+    return {'frame_count': frame_count, 'fps': fps, 'duration': frame_count / fps}
+
+
+def split_segments(frame_count, stride, n_segments):
+    """Split [0, frame_count) into stride-aligned (start, end) ranges"""
+    samples = (frame_count + stride - 1) // stride
+    n_segments = max(1, min(n_segments, samples))
+    per_segment = (samples + n_segments - 1) // n_segments
+    segments = []
+    for first_sample in range(0, samples, per_segment):
+        start = first_sample * stride
+        end = min(frame_count, (first_sample + per_segment) * stride)
+        segments.append((start, end))
+    return segments
+
+
+def _init_worker(trainer_dir, confidence_threshold, detector_backend, engine, student_names, max_width):
+    """Process pool initializer: load the gallery once per worker"""
+    global _worker_recognizer, _worker_max_width
+    from core.face_recognizer import AttendanceFaceRecognizer
+
+    # The pool already uses every core; keep OpenCV from spawning its own threads
+    cv2.setNumThreads(1)
+    _worker_recognizer = AttendanceFaceRecognizer(None, confidence_threshold, trainer_dir=trainer_dir,
+                                                  detector_backend=detector_backend, engine=engine)
+    _worker_recognizer.student_names = student_names
+    _worker_max_width = max_width
+
+
+def _process_segment(video_path, start, end, stride, fps):
+    """
+    Recognize faces in every stride-th frame of [start, end)
+
+    Returns:
+        (frames sampled, frames skipped by the motion gate,
+         [(seconds into video, student_id, confidence), ...])
+    """
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise IOError(f"Cannot open video file: {video_path}")
+
+    detections = []
+    processed = 0
+    # Segments of different parts of the video run back to back in this worker
+    _worker_recognizer.detector.reset()
+    _worker_recognizer.motion_gate.reset()
+    skipped_before = _worker_recognizer.motion_gate.stats['skipped']
+    try:
+        if start > 0:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+        for index in range(start, end):
+            # grab() advances without the BGR conversion; only sampled frames are retrieved
+            if not capture.grab():
+                break
+            if (index - start) % stride:
+                continue
+            ret, frame = capture.retrieve()
+            if not ret:
+                continue
+
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            if _worker_max_width and gray.shape[1] > _worker_max_width:
+                scale = _worker_max_width / gray.shape[1]
+                gray = cv2.resize(gray, (_worker_max_width, int(gray.shape[0] * scale)),
+                                  interpolation=cv2.INTER_AREA)
+
+            _, recognized = _worker_recognizer.recognize_faces_in_frame(gray, annotate=False)
+            processed += 1
+            for student in recognized:
+                detections.append((index / fps, student['student_id'], student['confidence']))
+    finally:
+        capture.release()
+    return processed, _worker_recognizer.motion_gate.stats['skipped'] - skipped_before, detections
+
+
+def aggregate_recognitions(detections, cooldown, recorded_at):
+    """
+    Turn raw per-frame recognitions into attendance events
+
+    Applies the same cooldown as AttendanceFaceRecognizer.record_attendance_for_student,
+    but on video time: a student is recorded again only after `cooldown` seconds
+    of the recording have passed since their last recorded event.
+
+    Returns:
+        Time-ordered list of (student_id, timestamp, confidence)
+    """
+    last_recorded = {}
+    events = []
+    for seconds, student_id, confidence in sorted(detections):
+        previous = last_recorded.get(student_id)
+        if previous is not None and seconds - previous < cooldown:
+            continue
+        last_recorded[student_id] = seconds
+        events.append((student_id, recorded_at + timedelta(seconds=seconds), confidence))
+    return events
+
+
+class VideoBatchProcessor:
+    def __init__(self, recognizer, stride=DEFAULT_STRIDE, workers=None, max_width=DEFAULT_MAX_WIDTH):
+        """
+        Take attendance from a recorded video with a pool of worker processes
+
+        Args:
+            recognizer: AttendanceFaceRecognizer (provides gallery location, threshold,
+                        student names and cooldown)
+            stride: Process every stride-th frame
+            workers: Worker processes (default: CPU count)
+            max_width: Frames wider than this are downscaled before detection (None = never)
+        """
+        self.recognizer = recognizer
+        self.stride = max(1, int(stride))
+        self.workers = workers or os.cpu_count() or 1
+        self.max_width = max_width
+
+    def process(self, video_path, session_id, recorded_at=None, progress_callback=None):
+        """
+        Recognize all students in a video and write their attendance in one transaction
+
+        Args:
+            video_path: Recorded lecture
+            session_id: Attendance session to record into
+            recorded_at: datetime of the first frame (default: file mtime minus duration)
+            progress_callback: Optional callable(percent, message)
+
+        Returns:
+            dict with processing statistics
+        """
+        info = probe_video(video_path)
+        if info['frame_count'] <= 0:
+            raise ValueError(f"Video has no frames: {video_path}")
+        if recorded_at is None:
+            recorded_at = (datetime.fromtimestamp(os.path.getmtime(video_path))
+                           - timedelta(seconds=info['duration']))
+
+        segments = split_segments(info['frame_count'], self.stride, self.workers * SEGMENTS_PER_WORKER)
+        logger.info(f"Processing {video_path}: {info['frame_count']} frames @ {info['fps']:.1f} fps "
+                    f"({info['duration'] / 60:.1f} min), stride {self.stride}, "
+                    f"{len(segments)} segments on {self.workers} workers")
+
+        started = time.perf_counter()
+        detections = []
+        frames_processed = 0
+        frames_skipped = 0
+        init_args = (self.recognizer.trainer_dir, self.recognizer.confidence_threshold,
+                     self.recognizer.detector_backend, self.recognizer.engine,
+                     dict(self.recognizer.student_names), self.max_width)
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=init_args) as pool:
+            futures = [pool.submit(_process_segment, video_path, start, end, self.stride, info['fps'])
+                       for start, end in segments]
+            for done, future in enumerate(as_completed(futures), 1):
+                processed, skipped, segment_detections = future.result()
+                frames_processed += processed
+                frames_skipped += skipped
+                detections.extend(segment_detections)
+                if progress_callback:
+                    progress_callback(done * 100 // len(futures),
+                                      f"{done}/{len(futures)} segments, {frames_processed} frames")
+
+        events = aggregate_recognitions(detections, self.recognizer.recognition_cooldown, recorded_at)
+        written = self.recognizer.db.record_attendance_batch(session_id, events)
+        elapsed = time.perf_counter() - started
+
+        stats = {
+            'frames_total': info['frame_count'],
+            'frames_processed': frames_processed,
+            'frames_skipped': frames_skipped,
+            'recognitions': len(detections),
+            'attendance_events': written,
+            'students': len({event[0] for event in events}),
+            'video_seconds': info['duration'],
+            'seconds': elapsed,
+            'speedup': info['duration'] / elapsed if elapsed > 0 else 0.0,
+        }
+        logger.info(f"Done in {elapsed:.1f}s ({stats['speedup']:.1f}x real time): "
+                    f"{frames_processed} frames ({frames_skipped} static, skipped), "
+                    f"{len(detections)} recognitions, "
+                    f"{stats['students']} students, {written} attendance events")
+        return stats
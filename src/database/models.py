@@ -8,7 +8,7 @@ from datetime import datetime
 import os
 
 class DatabaseManager:
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, seed_sample_data=True):
         if db_path is None:
             # Get project root directory
             current_file = os.path.abspath(__file__)
@@ -19,7 +19,8 @@ class DatabaseManager:
             self.db_path = db_path
         self.ensure_directory()
         self.init_tables()
-        self.init_sample_data()
+        if seed_sample_data:
+            self.init_sample_data()
     
     def ensure_directory(self):
         """Tạo thư mục data nếu chưa có"""
@@ -288,15 +289,15 @@ class DatabaseManager:
         conn.close()
         return sessions
         
-    def end_attendance_session(self, session_id):
-        """Kết thúc phiên điểm danh"""
+    def end_attendance_session(self, session_id, end_time=None):
+        """Kết thúc phiên điểm danh (end_time: datetime, mặc định là hiện tại)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('''
             UPDATE attendance_sessions 
             SET end_time = ?, is_active = 0 
             WHERE id = ?
-        ''', (datetime.now().strftime('%H:%M:%S'), session_id))
+        ''', ((end_time or datetime.now()).strftime('%H:%M:%S'), session_id))
         conn.commit()
         conn.close()
     
@@ -332,7 +333,52 @@ class DatabaseManager:
         
         conn.commit()
         conn.close()
-    
+
+    def record_attendance_batch(self, session_id, events, status='present'):
+        """
+        Ghi nhận nhiều lượt điểm danh trong một transaction (dùng cho xử lý video offline)
+
+        Args:
+            session_id: Attendance session ID
+            events: Iterable of (student_id, timestamp, confidence_score) in time order;
+                    the first event of a student is the check-in, later ones update check-out
+                    exactly like repeated calls to record_attendance()
+
+        Returns:
+            Number of events written
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        written = 0
+        try:
+            for student_id, timestamp, confidence_score in events:
+                cursor.execute('''
+                    SELECT id FROM attendance_records
+                    WHERE session_id = ? AND student_id = ?
+                ''', (session_id, student_id))
+                existing_record = cursor.fetchone()
+
+                if existing_record:
+                    cursor.execute('''
+                        UPDATE attendance_records
+                        SET check_out_time = ?, confidence_score = ?
+                        WHERE id = ?
+                    ''', (timestamp, confidence_score, existing_record[0]))
+                else:
+                    cursor.execute('''
+                        INSERT INTO attendance_records
+                        (session_id, student_id, check_in_time, confidence_score, status)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', (session_id, student_id, timestamp, confidence_score, status))
+                written += 1
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return written
+
     def get_attendance_by_session(self, session_id):
         """Lấy danh sách điểm danh theo phiên"""
         conn = self.get_connection()
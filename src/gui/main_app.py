@@ -13,11 +13,17 @@ import numpy as np
 import threading
 import time
 from datetime import datetime, date, timedelta
-import pandas as pd
 
 # Add parent directory to path to import database module
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database.models import DatabaseManager
+from core.detection import DetectionScheduler, MotionGate
+from core.detectors import create_face_detector
+from core.coreset import evaluate_selection, format_report, select_gallery
+from core.matchers import MADKernel, ThumbnailPrefilter, load_compact_gallery, load_matcher, train_matcher
+from reports.report_worker import ReportJobExecutor
+from utils.perf_stats import LatencyStats
+from utils.config import RECOGNITION_ENGINE, GALLERY_SAMPLES_PER_STUDENT, COMPACT_GALLERY
 
 class AttendanceSystemGUI:
     def __init__(self, root):
@@ -37,10 +43,27 @@ class AttendanceSystemGUI:
         
         # Face recognition variables
         self.face_cascade = None
+        self.face_detector = None  # DetectionScheduler for the live camera view
+        self.motion_gate = MotionGate()  # Skips detection while the picture is static
+        self.face_annotations = []  # Boxes/labels of the last processed frame
         self.face_recognizer = None
         self.face_names = {}  # Dictionary to map IDs to names
         self.last_recognition_time = {}  # To prevent duplicate recognitions
         
+        # Per-stage latency instrumentation (optional overlay in camera view)
+        self.perf_stats = LatencyStats(name="gui")
+        self.show_perf_overlay = None  # tk.BooleanVar, created with the attendance tab
+        
+        # Background report jobs (keeps SQL/pandas/openpyxl/matplotlib off the Tk thread)
+        self.report_executor = ReportJobExecutor(self.root)
+        self.report_jobs = {}  # job kind -> current job ID
+        
+        # Report generator is created on first use: it pulls in pandas,
+        # matplotlib and openpyxl, which dominate cold start
+        self.report_generator = None
+        self._report_generator_lock = threading.Lock()
+        self._report_prefetch_started = False
+        
         # Initialize face recognition
         self.init_face_recognition()
         
@@ -50,19 +73,18 @@ class AttendanceSystemGUI:
     def init_face_recognition(self):
         """Initialize face recognition components"""
         try:
-            # Load Haar cascade from assets folder
-            # Current file: src/gui/main_app.py -> go up 3 levels to project root
-            current_file = os.path.abspath(__file__)
-            project_root = os.path.dirname(os.path.dirname(os.path.dirname(current_file)))
-            cascade_path = os.path.join(project_root, 'assets', 'haarcascade_frontalface_default.xml')
-            
-            print(f"🔍 Looking for cascade at: {cascade_path}")
-            print(f"   Exists: {os.path.exists(cascade_path)}")
-            self.face_cascade = cv2.CascadeClassifier(cascade_path)
+            # Face detector backend (FACE_DETECTOR in utils/config.py, models in assets/)
+            self.face_cascade = create_face_detector()
+            print(f"🔍 Face detector: {self.face_cascade.describe()}")
+            # Detection parameters: DETECTION_* in utils/config.py (tuned by benchmarks/tune_detection.py)
+            self.face_detector = DetectionScheduler(self.face_cascade)
             
             # Initialize numpy-based face recognition
             self.trained_faces = None
             self.trained_ids = None
+            self.face_matcher = None  # Engine from core/matchers.py (RECOGNITION_ENGINE), None = pixel MAD
+            self.mad_prefilter = None  # Thumbnail prefilter over trained_faces for pixel MAD (built on first use)
+            self.mad_kernel = None  # Scratch buffers of the pixel MAD loop (built on first use)
             
             # Load training data if available
             if self.load_training_data():
@@ -115,6 +137,9 @@ class AttendanceSystemGUI:
         self.create_reports_tab()
         self.create_settings_tab()
         
+        # Start loading the reporting libraries as soon as the Reports tab is opened
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+        
     def create_student_management_tab(self):
         """Tạo tab quản lý học sinh"""
         student_frame = ttk.Frame(self.notebook)
@@ -327,6 +352,14 @@ class AttendanceSystemGUI:
             padx=20
         ).pack(side='left', padx=(0, 10))
         
+        self.show_perf_overlay = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            camera_controls,
+            text="⏱️ Hiện thời gian xử lý",
+            variable=self.show_perf_overlay,
+            font=('Arial', 10)
+        ).pack(side='left', padx=(0, 10))
+        
         # Camera display
         self.camera_label = tk.Label(camera_panel, text="📷 Camera chưa bật\n\nClick 'Bật Camera' để bắt đầu", bg='black', fg='white', width=80, height=20, font=('Arial', 12))
         self.camera_label.pack(side='left', fill='both', expand=True)
@@ -364,6 +397,7 @@ class AttendanceSystemGUI:
         """Tạo tab báo cáo"""
         reports_frame = ttk.Frame(self.notebook)
         self.notebook.add(reports_frame, text="📊 Báo cáo")
+        self.reports_tab = reports_frame
         
         # Main container
         main_container = tk.Frame(reports_frame)
@@ -489,8 +523,28 @@ class AttendanceSystemGUI:
             fg='white',
             font=('Arial', 12, 'bold'),
             pady=8
+        ).pack(fill='x', pady=(0, 5))
+        
+        tk.Button(
+            button_frame,
+            text="⛔ Hủy tác vụ",
+            command=self.cancel_report_jobs,
+            bg='#95a5a6',
+            fg='white',
+            font=('Arial', 10, 'bold')
         ).pack(fill='x')
         
+        # Background job status
+        self.report_status_label = tk.Label(
+            left_panel,
+            text="",
+            font=('Arial', 9),
+            fg='#7f8c8d',
+            wraplength=300,
+            justify='left'
+        )
+        self.report_status_label.pack(fill='x')
+        
         # Right panel - Report display
         right_panel = ttk.LabelFrame(main_container, text="Kết quả Báo cáo", padding=10)
         right_panel.pack(side='right', fill='both', expand=True)
@@ -1053,9 +1107,16 @@ class AttendanceSystemGUI:
             print(f"🔍 Loading training data from: {trainer_dir}")
             
             if os.path.exists(faces_path) and os.path.exists(ids_path):
-                self.trained_faces = np.load(faces_path, allow_pickle=True)
                 self.trained_ids = np.load(ids_path, allow_pickle=True)
+                if RECOGNITION_ENGINE == 'mad' and COMPACT_GALLERY:
+                    # Small uint8 faces (data/trainer/mad_gallery.npz) instead of the full-resolution crops
+                    self.trained_faces = load_compact_gallery(trainer_dir, self.trained_ids)
+                else:
+                    self.trained_faces = np.load(faces_path, allow_pickle=True)
                 print(f"✅ Training data loaded: {len(self.trained_faces)} faces, {len(np.unique(self.trained_ids))} students")
+                self.face_matcher = load_matcher(RECOGNITION_ENGINE, trainer_dir, self.trained_faces, self.trained_ids)
+                if self.face_matcher is not None:
+                    print(f"✅ Recognition engine: {RECOGNITION_ENGINE} ({self.face_matcher.nbytes / 1024:.0f} KB)")
                 return True
             else:
                 print("❌ Training data not found")
@@ -1083,30 +1144,25 @@ class AttendanceSystemGUI:
             if len(face_roi.shape) == 3:
                 face_roi = cv2.cvtColor(face_roi, cv2.COLOR_BGR2GRAY)
             
-            # Use the same algorithm as 03_face_recognition_fixed.py
-            best_match_id = 0
-            best_confidence = float('inf')
+            if getattr(self, 'face_matcher', None) is not None:
+                best_match_id, confidence = self.face_matcher.match(face_roi)
+                if confidence > 50:
+                    return self.face_names.get(best_match_id, f"Student_{best_match_id}"), 100 - confidence
+                return "Unknown", 100 - confidence
             
-            for i, stored_face in enumerate(self.trained_faces):
-                try:
-                    # Resize both images to same size for comparison
-                    target_size = min(face_roi.shape[0], face_roi.shape[1], 
-                                    stored_face.shape[0], stored_face.shape[1])
-                    
-                    if target_size > 20:  # Minimum size check from original
-                        face_resized = cv2.resize(face_roi, (target_size, target_size))
-                        stored_resized = cv2.resize(stored_face, (target_size, target_size))
-                        
-                        # Calculate mean absolute difference (lower is better)
-                        diff = np.mean(np.abs(face_resized.astype(float) - stored_resized.astype(float)))
-                        
-                        if diff < best_confidence:
-                            best_confidence = diff
-                            best_match_id = self.trained_ids[i]
-                            
-                except Exception as e:
-                    print(f"Error comparing face {i}: {e}")
-                    continue
+            # Coarse pass: only the gallery faces with the closest thumbnails are compared in full
+            prefilter = getattr(self, 'mad_prefilter', None)
+            if prefilter is None or prefilter.faces is not self.trained_faces:
+                prefilter = self.mad_prefilter = ThumbnailPrefilter(self.trained_faces)
+            
+            # Use the same algorithm as 03_face_recognition_fixed.py (single scale); the kernel
+            # reuses its resize buffers, so the loop over gallery faces allocates nothing
+            kernel = getattr(self, 'mad_kernel', None)
+            if kernel is None:
+                kernel = self.mad_kernel = MADKernel(scales=(1.0,))
+            kernel.set_probe(face_roi)
+            best_row, best_confidence = kernel.best(self.trained_faces, prefilter.candidates(face_roi, kernel))
+            best_match_id = self.trained_ids[best_row] if best_confidence != float('inf') else 0
             
             # Convert to percentage confidence using original formula
             confidence = max(0, 100 - (best_confidence / 255 * 100))
@@ -1142,6 +1198,9 @@ class AttendanceSystemGUI:
                 self.camera_thread.start()
                 
                 print("✅ Camera started successfully")
+                
+                # Camera is up: warm the reporting libraries in the background
+                self.prefetch_report_modules()
             else:
                 messagebox.showinfo("Thông báo", "Camera đã được bật")
                 
@@ -1194,7 +1253,10 @@ class AttendanceSystemGUI:
         """Cập nhật hình ảnh camera liên tục"""
         while self.camera is not None:
             try:
-                ret, frame = self.camera.read()
+                frame_start = time.perf_counter()
+                
+                with self.perf_stats.measure('capture'):
+                    ret, frame = self.camera.read()
                 if not ret:
                     break
                 
@@ -1205,15 +1267,24 @@ class AttendanceSystemGUI:
                 if self.is_recognizing and self.current_session_id:
                     frame = self.process_face_recognition(frame)
                 
+                # Latency overlay (shows stats of previous frames)
+                if self.show_perf_overlay is not None and self.show_perf_overlay.get():
+                    self.perf_stats.draw_overlay(frame)
+                
                 # Convert frame to display format
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                frame_pil = Image.fromarray(frame_rgb)
-                frame_pil = frame_pil.resize((640, 480), Image.Resampling.LANCZOS)
-                frame_tk = ImageTk.PhotoImage(frame_pil)
+                with self.perf_stats.measure('render'):
+                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                    frame_pil = Image.fromarray(frame_rgb)
+                    frame_pil = frame_pil.resize((640, 480), Image.Resampling.LANCZOS)
+                    frame_tk = ImageTk.PhotoImage(frame_pil)
+                    
+                    # Update camera display
+                    self.camera_label.config(image=frame_tk, text='')
+                    self.camera_label.image = frame_tk
                 
-                # Update camera display
-                self.camera_label.config(image=frame_tk, text='')
-                self.camera_label.image = frame_tk
+                self.perf_stats.record('frame', time.perf_counter() - frame_start)
+                if self.perf_stats.maybe_log() and self.is_recognizing:
+                    print(f"⏱️ Motion gate skipped {self.motion_gate.skip_rate:.0%} of frames")
                 
                 time.sleep(0.03)  # ~30 FPS
                 
@@ -1224,16 +1295,27 @@ class AttendanceSystemGUI:
     def process_face_recognition(self, frame):
         """Xử lý nhận diện khuôn mặt"""
         try:
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = self.face_cascade.detectMultiScale(gray, 1.2, 5)
+            with self.perf_stats.measure('grayscale'):
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            
+            # Nothing moved: keep the previous boxes/labels, skip detection and matching
+            if not self.motion_gate.should_process(gray):
+                self.draw_face_annotations(frame, self.face_annotations)
+                self.draw_recognition_status(frame)
+                return frame
             
+            with self.perf_stats.measure('detect'):
+                faces = self.face_detector.detect(gray)
+            
+            annotations = []
             for (x, y, w, h) in faces:
                 # Draw rectangle around face
-                cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 0), 2)
+                annotations.append(((x, y, w, h), None, None, None))
                 
                 # Perform face recognition using numpy-based matching
                 roi_gray = gray[y:y+h, x:x+w]
-                name, confidence = self.recognize_face(roi_gray)
+                with self.perf_stats.measure('match'):
+                    name, confidence = self.recognize_face(roi_gray)
                 
 
                 
@@ -1262,33 +1344,49 @@ class AttendanceSystemGUI:
                         if (id_ not in self.last_recognition_time or 
                             current_time - self.last_recognition_time[id_] > 5):  # 5 second cooldown
                             
-                            self.record_student_attendance(id_, display_confidence, name)
+                            with self.perf_stats.measure('db_write'):
+                                self.record_student_attendance(id_, display_confidence, name)
                             self.last_recognition_time[id_] = current_time
                         
                         # Convert Vietnamese name to ASCII for display
                         display_name = self.convert_to_ascii(name)
                         
                         # Display name and confidence
-                        cv2.putText(frame, f"{display_name}", (x+5, y-5), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
-                        cv2.putText(frame, confidence_text, (x+5, y+h-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+                        annotations[-1] = ((x, y, w, h), display_name, (255, 255, 255), confidence_text)
                         
                     except Exception as e:
                         print(f"Error processing recognition result: {e}")
-                        cv2.putText(frame, "Unknown", (x+5, y-5), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+                        annotations[-1] = ((x, y, w, h), "Unknown", (0, 0, 255), None)
                 else:
                     # Display the error message from recognition
                     display_text = "No Model" if name == "No Training Data" else "Unknown"
-                    cv2.putText(frame, display_text, (x+5, y-5), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255) if name == "No Training Data" else (0, 0, 255), 2)
+                    annotations[-1] = ((x, y, w, h), display_text,
+                                       (0, 255, 255) if name == "No Training Data" else (0, 0, 255), None)
             
-            # Add status text
-            status_text = "Recognition: ON" if self.is_recognizing else "Recognition: OFF"
-            cv2.putText(frame, status_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0) if self.is_recognizing else (0, 0, 255), 2)
+            self.face_annotations = annotations
+            self.draw_face_annotations(frame, annotations)
+            self.draw_recognition_status(frame)
             
         except Exception as e:
             print(f"Face recognition error: {e}")
         
         return frame
     
+    def draw_face_annotations(self, frame, annotations):
+        """Vẽ khung, tên và độ tin cậy của từng khuôn mặt"""
+        for (x, y, w, h), label, label_color, confidence_text in annotations:
+            cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 0), 2)
+            if label:
+                cv2.putText(frame, label, (x+5, y-5), cv2.FONT_HERSHEY_SIMPLEX, 0.8, label_color, 2)
+            if confidence_text:
+                cv2.putText(frame, confidence_text, (x+5, y+h-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+    
+    def draw_recognition_status(self, frame):
+        """Trạng thái nhận diện và tỉ lệ khung hình bỏ qua (không có chuyển động)"""
+        status_text = "Recognition: ON" if self.is_recognizing else "Recognition: OFF"
+        status_text += f" | skip {self.motion_gate.skip_rate:.0%}"
+        cv2.putText(frame, status_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0) if self.is_recognizing else (0, 0, 255), 2)
+    
     def record_student_attendance(self, student_id, confidence, student_name):
         """Ghi nhận điểm danh cho học sinh"""
         try:
@@ -1432,10 +1530,26 @@ class AttendanceSystemGUI:
             faces_array = np.array(faces, dtype=object)  # Use object dtype for variable-sized arrays
             ids_array = np.array(ids)
             
+            # Keep GALLERY_SAMPLES_PER_STUDENT representative crops per student (core/coreset.py)
+            coreset_line = ""
+            if GALLERY_SAMPLES_PER_STUDENT:
+                progress_label.config(text="Đang chọn ảnh đại diện cho mỗi học sinh...")
+                report = evaluate_selection(faces_array, ids_array, engine=RECOGNITION_ENGINE)
+                print(f"📉 {format_report(report)}")
+                keep = select_gallery(faces_array, ids_array)
+                faces_array, ids_array = faces_array[keep], ids_array[keep]
+                coreset_line = (f"• Ảnh giữ lại: {len(faces_array)} "
+                                f"(độ chính xác {report['accuracy_delta'] * 100:+.1f} điểm)\n")
+            
             # Save the training data as numpy files
             np.save(os.path.join(trainer_dir, 'faces_data.npy'), faces_array)
             np.save(os.path.join(trainer_dir, 'ids_data.npy'), ids_array)
             
+            # Fit the configured matching engine (e.g. PCA basis) on the new gallery
+            if RECOGNITION_ENGINE != 'mad':
+                progress_label.config(text=f"Đang huấn luyện bộ so khớp '{RECOGNITION_ENGINE}'...")
+                train_matcher(RECOGNITION_ENGINE, faces_array, ids_array, trainer_dir)
+            
             progress_label.config(text="Training hoàn thành!")
             
             # Get unique IDs
@@ -1447,6 +1561,7 @@ class AttendanceSystemGUI:
                 f"✅ Training hoàn thành!\n\n"
                 f"📊 Thống kê:\n"
                 f"• Tổng số ảnh: {len(faces)}\n"
+                f"{coreset_line}"
                 f"• Số học sinh: {len(unique_ids)}\n"
                 f"• ID học sinh: {list(unique_ids)}\n\n"
                 f"📁 Files đã tạo:\n"
@@ -1649,6 +1764,9 @@ class AttendanceSystemGUI:
         project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
         dataset_dir = os.path.join(project_root, 'data', 'dataset')
         
+        # Separate cascade: the live camera view may be detecting at the same time
+        detector = DetectionScheduler(create_face_detector())
+        
         while count < max_samples and camera.isOpened():
             try:
                 ret, frame = camera.read()
@@ -1660,7 +1778,7 @@ class AttendanceSystemGUI:
                 gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
                 
                 # Detect faces
-                faces = self.face_cascade.detectMultiScale(gray, 1.3, 5)
+                faces = detector.detect(gray)
                 
                 for (x, y, w, h) in faces:
                     # Draw rectangle around face
@@ -1781,17 +1899,41 @@ class AttendanceSystemGUI:
     # REPORTS FUNCTIONALITY
     # =============================================================================
     
+    def _get_report_generator(self):
+        """Create the report generator on first use (imports pandas/matplotlib/openpyxl)"""
+        with self._report_generator_lock:
+            if self.report_generator is None:
+                start = time.perf_counter()
+                from reports.report_generator import AttendanceReportGenerator
+                
+                project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+                db_path = os.path.join(project_root, 'data', 'attendance.db')
+                self.report_generator = AttendanceReportGenerator(db_path)
+                print(f"📊 Report module loaded in {time.perf_counter() - start:.2f}s")
+        return self.report_generator
+    
+    def prefetch_report_modules(self):
+        """Load the reporting libraries on a background thread"""
+        if self._report_prefetch_started:
+            return
+        self._report_prefetch_started = True
+        
+        def prefetch():
+            try:
+                self._get_report_generator()
+            except Exception as e:
+                print(f"⚠️ Report module prefetch failed: {e}")
+        
+        threading.Thread(target=prefetch, name='report-prefetch', daemon=True).start()
+    
+    def on_tab_changed(self, event=None):
+        """Prefetch reporting libraries when the Reports tab is first opened"""
+        if self.notebook.select() == str(self.reports_tab):
+            self.prefetch_report_modules()
+    
     def init_report_data(self):
         """Initialize report data and options"""
         try:
-            # Import report generator
-            from reports.report_generator import AttendanceReportGenerator
-            
-            # Initialize report generator
-            project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-            db_path = os.path.join(project_root, 'data', 'attendance.db')
-            self.report_generator = AttendanceReportGenerator(db_path)
-            
             # Load classes for filter
             classes = self.db.get_all_classes()
             class_names = ["Tất cả lớp"] + [f"{cls[1]} - {cls[2]}" for cls in classes]
@@ -1839,9 +1981,6 @@ class AttendanceSystemGUI:
     def generate_report_preview(self):
         """Generate and display report preview"""
         try:
-            if not hasattr(self, 'report_generator'):
-                self.init_report_data()
-            
             report_type = self.report_type_var.get()
             start_date = self.from_date_var.get()
             end_date = self.to_date_var.get()
@@ -1854,40 +1993,135 @@ class AttendanceSystemGUI:
                 messagebox.showerror("Lỗi", "Định dạng ngày không hợp lệ! Sử dụng YYYY-MM-DD")
                 return
             
-            # Clear existing report
-            for item in self.report_tree.get_children():
-                self.report_tree.delete(item)
-            
-            # Generate report based on type
-            if report_type == "daily":
-                data = self.report_generator.get_attendance_by_date_range(start_date, end_date)
-                self._display_daily_report(data)
-                
-            elif report_type == "class":
-                class_id = self._get_selected_class_id()
-                data = self.report_generator.get_attendance_by_date_range(start_date, end_date, class_id)
-                self._display_class_report(data)
-                
-            elif report_type == "student":
-                student_id = self._get_selected_student_id()
-                data = self.report_generator.get_student_attendance_summary(start_date, end_date, student_id)
-                self._display_student_report(data)
-                
-            elif report_type == "summary":
-                data = self.report_generator.get_daily_attendance_summary(start_date, end_date)
-                self._display_summary_report(data)
-                
-            elif report_type == "trends":
-                data = self.report_generator.get_attendance_trends(30)
-                self._display_trends_report(data)
-            
-            # Update summary
-            self._update_report_summary(start_date, end_date)
+            # Resolve filters on the Tk thread, then query in the background
+            class_id = self._get_selected_class_id() if report_type == "class" else None
+            student_id = self._get_selected_student_id() if report_type == "student" else None
+            
+            # A newer preview supersedes any preview still running
+            self.report_executor.cancel_all('preview')
+            self.report_jobs['preview'] = self.report_executor.submit(
+                'preview',
+                self._build_report_preview,
+                report_type, start_date, end_date, class_id, student_id,
+                on_progress=self._on_report_progress,
+                on_done=self._on_report_preview_done,
+                on_error=lambda job_id, e: self._on_report_error(job_id, "Không thể tạo báo cáo", e),
+                on_cancel=self._on_report_cancelled
+            )
+            self._set_report_status("⏳ Đang tạo báo cáo...")
             
         except Exception as e:
             messagebox.showerror("Lỗi", f"Không thể tạo báo cáo: {e}")
             print(f"Report error: {e}")
     
+    def _build_report_preview(self, job, report_type, start_date, end_date, class_id, student_id):
+        """Query report data (runs on a report worker thread)"""
+        job.report_progress(5, "Đang tải module báo cáo...")
+        report_generator = self._get_report_generator()
+        
+        job.report_progress(10, "Đang truy vấn dữ liệu...")
+        
+        if report_type == "daily":
+            data = report_generator.get_attendance_by_date_range(start_date, end_date)
+        elif report_type == "class":
+            data = report_generator.get_attendance_by_date_range(start_date, end_date, class_id)
+        elif report_type == "student":
+            data = report_generator.get_student_attendance_summary(start_date, end_date, student_id)
+        elif report_type == "summary":
+            data = report_generator.get_daily_attendance_summary(start_date, end_date)
+        elif report_type == "trends":
+            data = report_generator.get_attendance_trends(30)
+        else:
+            data = None
+        
+        job.report_progress(70, "Đang tính tóm tắt...")
+        try:
+            summary = report_generator.get_report_summary(start_date, end_date)
+        except Exception as e:
+            print(f"Error updating summary: {e}")
+            summary = None
+        
+        return report_type, data, summary
+    
+    def _on_report_preview_done(self, job_id, result):
+        """Deliver preview results to the Treeview (Tk thread)"""
+        if self.report_jobs.get('preview') != job_id:
+            return  # Superseded by a newer preview
+        
+        report_type, data, summary = result
+        
+        # Clear existing report
+        for item in self.report_tree.get_children():
+            self.report_tree.delete(item)
+        
+        if report_type == "daily":
+            self._display_daily_report(data)
+        elif report_type == "class":
+            self._display_class_report(data)
+        elif report_type == "student":
+            self._display_student_report(data)
+        elif report_type == "summary":
+            self._display_summary_report(data)
+        elif report_type == "trends":
+            self._display_trends_report(data)
+        
+        # Update summary
+        if summary is not None:
+            self._update_report_summary(summary)
+        
+        self._set_report_status("✅ Đã tạo báo cáo")
+    
+    def _set_report_status(self, text):
+        """Show background report job status"""
+        if hasattr(self, 'report_status_label'):
+            self.report_status_label.config(text=text)
+    
+    def _on_report_progress(self, job_id, percent, message):
+        """Progress callback for report jobs (Tk thread)"""
+        self._set_report_status(f"⏳ {message} ({percent}%)")
+    
+    def _on_report_error(self, job_id, title, error):
+        """Error callback for report jobs (Tk thread)"""
+        self._set_report_status("❌ Tác vụ báo cáo thất bại")
+        messagebox.showerror("Lỗi", f"{title}: {error}")
+    
+    def _on_report_cancelled(self, job_id):
+        """Cancellation callback for report jobs (Tk thread)"""
+        if job_id in self.report_jobs.values():
+            self._set_report_status("⛔ Đã hủy tác vụ báo cáo")
+    
+    def export_chart_images(self):
+        """Save high-resolution chart PNGs (only exports render at 300 DPI)"""
+        try:
+            start_date = self.from_date_var.get()
+            end_date = self.to_date_var.get()
+            
+            output_dir = filedialog.askdirectory(title="Chọn thư mục lưu biểu đồ")
+            if not output_dir:
+                return
+            
+            self.report_jobs['chart_export'] = self.report_executor.submit(
+                'chart_export',
+                lambda job: self._get_report_generator().export_chart_images(
+                    start_date, end_date, output_dir, progress_callback=job.report_progress
+                ),
+                on_progress=self._on_report_progress,
+                on_done=lambda job_id, paths: (
+                    self._set_report_status("✅ Đã lưu ảnh biểu đồ"),
+                    messagebox.showinfo("Thành công", "Đã lưu biểu đồ:\n\n" + "\n".join(paths))
+                ),
+                on_error=lambda job_id, e: self._on_report_error(job_id, "Không thể lưu biểu đồ", e),
+                on_cancel=self._on_report_cancelled
+            )
+            self._set_report_status("⏳ Đang lưu ảnh biểu đồ...")
+            
+        except Exception as e:
+            messagebox.showerror("Lỗi", f"Không thể lưu biểu đồ: {e}")
+    
+    def cancel_report_jobs(self):
+        """Cancel all running report jobs"""
+        self.report_executor.cancel_all()
+    
     def _get_selected_class_id(self):
         """Get selected class ID from combo"""
         class_text = self.report_class_var.get()
@@ -1914,6 +2148,8 @@ class AttendanceSystemGUI:
     
     def _display_daily_report(self, data):
         """Display daily attendance report"""
+        import pandas as pd  # Already loaded by the report worker
+        
         if data.empty:
             self._show_no_data_message()
             return
@@ -1946,6 +2182,8 @@ class AttendanceSystemGUI:
     
     def _display_student_report(self, data):
         """Display student attendance summary"""
+        import pandas as pd  # Already loaded by the report worker
+        
         if data.empty:
             self._show_no_data_message()
             return
@@ -1993,6 +2231,8 @@ class AttendanceSystemGUI:
     
     def _display_trends_report(self, data):
         """Display trends report"""
+        import pandas as pd  # Already loaded by the report worker
+        
         if data.empty:
             self._show_no_data_message()
             return
@@ -2021,11 +2261,9 @@ class AttendanceSystemGUI:
         self.report_tree.column('Thông báo', width=400, anchor='center')
         self.report_tree.insert('', 'end', values=['Không có dữ liệu trong khoảng thời gian đã chọn'])
     
-    def _update_report_summary(self, start_date, end_date):
+    def _update_report_summary(self, summary):
         """Update report summary display"""
         try:
-            summary = self.report_generator.get_report_summary(start_date, end_date)
-            
             # Clear existing summary
             for widget in self.report_summary_frame.winfo_children():
                 widget.destroy()
@@ -2058,10 +2296,6 @@ class AttendanceSystemGUI:
     def export_excel_report(self):
         """Export current report to Excel"""
         try:
-            if not hasattr(self, 'report_generator'):
-                messagebox.showerror("Lỗi", "Vui lòng tạo báo cáo trước khi xuất!")
-                return
-            
             start_date = self.from_date_var.get()
             end_date = self.to_date_var.get()
             
@@ -2070,39 +2304,72 @@ class AttendanceSystemGUI:
                 title="Lưu báo cáo Excel",
                 defaultextension=".xlsx",
                 filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")],
-                initialname=f"attendance_report_{start_date}_{end_date}.xlsx"
+                initialfile=f"attendance_report_{start_date}_{end_date}.xlsx"
             )
             
             if not filename:
                 return
             
-            # Export report
-            output_path = self.report_generator.export_comprehensive_report(
-                start_date, end_date, filename
-            )
-            
-            messagebox.showinfo(
-                "Thành công", 
-                f"Báo cáo đã được xuất thành công!\n\nFile: {output_path}"
+            # Export report in the background
+            self.report_jobs['export'] = self.report_executor.submit(
+                'export',
+                lambda job: self._get_report_generator().export_comprehensive_report(
+                    start_date, end_date, filename, progress_callback=job.report_progress
+                ),
+                on_progress=self._on_report_progress,
+                on_done=self._on_excel_export_done,
+                on_error=lambda job_id, e: self._on_report_error(job_id, "Không thể xuất báo cáo", e),
+                on_cancel=self._on_report_cancelled
             )
-            
-            # Ask to open file
-            if messagebox.askyesno("Mở file", "Bạn có muốn mở file Excel vừa tạo không?"):
-                os.startfile(output_path)
+            self._set_report_status("⏳ Đang xuất báo cáo Excel...")
                 
         except Exception as e:
             messagebox.showerror("Lỗi", f"Không thể xuất báo cáo: {e}")
     
+    def _on_excel_export_done(self, job_id, output_path):
+        """Excel export finished (Tk thread)"""
+        self._set_report_status("✅ Đã xuất báo cáo Excel")
+        messagebox.showinfo(
+            "Thành công", 
+            f"Báo cáo đã được xuất thành công!\n\nFile: {output_path}"
+        )
+        
+        # Ask to open file
+        if messagebox.askyesno("Mở file", "Bạn có muốn mở file Excel vừa tạo không?"):
+            os.startfile(output_path)
+    
     def show_report_charts(self):
         """Show report charts in new window"""
         try:
-            if not hasattr(self, 'report_generator'):
-                messagebox.showerror("Lỗi", "Vui lòng tạo báo cáo trước khi xem biểu đồ!")
-                return
-            
             start_date = self.from_date_var.get()
             end_date = self.to_date_var.get()
             
+            # Generate charts in the background
+            self.report_executor.cancel_all('charts')
+            self.report_jobs['charts'] = self.report_executor.submit(
+                'charts',
+                lambda job: self._get_report_generator().create_attendance_visualization(
+                    start_date, end_date, progress_callback=job.report_progress
+                ),
+                on_progress=self._on_report_progress,
+                on_done=self._on_report_charts_done,
+                on_error=lambda job_id, e: self._on_report_error(job_id, "Không thể hiển thị biểu đồ", e),
+                on_cancel=self._on_report_cancelled
+            )
+            self._set_report_status("⏳ Đang tạo biểu đồ...")
+            
+        except Exception as e:
+            messagebox.showerror("Lỗi", f"Không thể hiển thị biểu đồ: {e}")
+            print(f"Charts error: {e}")
+    
+    def _on_report_charts_done(self, job_id, charts):
+        """Display generated charts in a new window (Tk thread)"""
+        try:
+            if self.report_jobs.get('charts') != job_id:
+                return  # Superseded by a newer request
+            
+            self._set_report_status("✅ Đã tạo biểu đồ")
+            
             # Create charts window
             charts_window = tk.Toplevel(self.root)
             charts_window.title("📈 Biểu đồ Báo cáo Điểm danh")
@@ -2113,34 +2380,31 @@ class AttendanceSystemGUI:
             charts_notebook = ttk.Notebook(charts_window)
             charts_notebook.pack(fill='both', expand=True, padx=10, pady=10)
             
-            # Generate charts
-            charts = self.report_generator.create_attendance_visualization(start_date, end_date)
-            
             if charts:
+                from reports.report_generator import CHART_TITLES
+                
                 for chart_name, chart_data in charts.items():
                     # Create frame for this chart
                     chart_frame = ttk.Frame(charts_notebook)
                     
-                    # Decode and display chart
-                    import base64
-                    from io import BytesIO
-                    
-                    image_data = base64.b64decode(chart_data)
-                    image = Image.open(BytesIO(image_data))
-                    photo = ImageTk.PhotoImage(image)
+                    # Screen-resolution PNG (base64) goes straight into Tk, no PIL decode
+                    photo = tk.PhotoImage(data=chart_data)
                     
                     label = tk.Label(chart_frame, image=photo)
                     label.image = photo  # Keep a reference
                     label.pack(padx=10, pady=10)
                     
                     # Add to notebook
-                    chart_titles = {
-                        'daily_trend': 'Xu hướng hàng ngày',
-                        'hourly_pattern': 'Phân bố theo giờ',
-                        'class_comparison': 'So sánh lớp học'
-                    }
-                    
-                    charts_notebook.add(chart_frame, text=chart_titles.get(chart_name, chart_name))
+                    charts_notebook.add(chart_frame, text=CHART_TITLES.get(chart_name, chart_name))
+                
+                tk.Button(
+                    charts_window,
+                    text="💾 Lưu ảnh biểu đồ (300 DPI)",
+                    command=self.export_chart_images,
+                    bg='#9b59b6',
+                    fg='white',
+                    font=('Arial', 10, 'bold')
+                ).pack(pady=(0, 10))
             else:
                 tk.Label(
                     charts_window,
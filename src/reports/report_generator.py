@@ -6,18 +6,101 @@ Module tạo báo cáo điểm danh toàn diện
 import sqlite3
 import pandas as pd
 from datetime import datetime, timedelta
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Callable
 import os
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
-from openpyxl.chart import BarChart, LineChart, PieChart, Reference
-from openpyxl.utils.dataframe import dataframe_to_rows
-import matplotlib.pyplot as plt
-import seaborn as sns
 from io import BytesIO
 import base64
+import logging
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# openpyxl and matplotlib are imported on first use: preview reports only need
+# pandas, and these imports dominate cold start on low-end machines.
+
+# =============================================================================
+# CHART RENDERING (module level so it can run in worker processes)
+# =============================================================================
+
+SCREEN_CHART_DPI = 80    # On-screen preview (1000x700 chart window)
+EXPORT_CHART_DPI = 300   # Saved PNG files only
+
+CHART_TITLES = {
+    'daily_trend': 'Xu hướng hàng ngày',
+    'hourly_pattern': 'Phân bố theo giờ',
+    'class_comparison': 'So sánh lớp học'
+}
+
+
+def render_chart_png(chart_name: str, chart_data: Dict, dpi: int = SCREEN_CHART_DPI) -> bytes:
+    """
+    Render one attendance chart to PNG bytes
+    
+    Uses a standalone Figure/FigureCanvasAgg instead of pyplot so it is safe to
+    call from worker threads and processes.
+    
+    Args:
+        chart_name: One of CHART_TITLES keys
+        chart_data: Plain lists prepared by AttendanceReportGenerator.get_chart_data
+        dpi: Output resolution (screen preview vs. export)
+    """
+    import matplotlib
+    matplotlib.use('Agg')  # Charts are rendered on report worker threads, never on the Tk thread
+    from matplotlib import style
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    
+    with style.context('seaborn-v0_8'):
+        if chart_name == 'daily_trend':
+            fig = Figure(figsize=(12, 6))
+            ax = fig.add_subplot(111)
+            ax.plot(pd.to_datetime(chart_data['x']), chart_data['y'],
+                    marker='o', linewidth=2, markersize=6)
+            ax.set_title('Xu hướng số lượng học sinh điểm danh', fontsize=16, fontweight='bold')
+            ax.set_xlabel('Ngày', fontsize=12)
+            ax.set_ylabel('Số học sinh', fontsize=12)
+            ax.grid(True, alpha=0.3)
+            ax.tick_params(axis='x', labelrotation=45)
+        
+        elif chart_name in ('hourly_pattern', 'class_comparison'):
+            fig = Figure(figsize=(10, 6))
+            ax = fig.add_subplot(111)
+            if chart_name == 'hourly_pattern':
+                bars = ax.bar(chart_data['x'], chart_data['y'],
+                              color='skyblue', alpha=0.8, edgecolor='navy')
+                ax.set_title('Phân bố điểm danh theo giờ', fontsize=16, fontweight='bold')
+                ax.set_xlabel('Giờ trong ngày', fontsize=12)
+                ax.set_ylabel('Số lần điểm danh', fontsize=12)
+            else:
+                bars = ax.bar(chart_data['x'], chart_data['y'],
+                              color='lightcoral', alpha=0.8, edgecolor='darkred')
+                ax.set_title('So sánh số lượng học sinh theo lớp', fontsize=16, fontweight='bold')
+                ax.set_xlabel('Lớp học', fontsize=12)
+                ax.set_ylabel('Số học sinh', fontsize=12)
+                ax.tick_params(axis='x', labelrotation=45)
+            ax.grid(True, alpha=0.3, axis='y')
+            
+            # Add value labels on bars
+            for bar in bars:
+                height = bar.get_height()
+                ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
+                        f'{int(height)}', ha='center', va='bottom')
+        else:
+            raise ValueError(f"Unknown chart: {chart_name}")
+        
+        fig.tight_layout()
+        FigureCanvasAgg(fig)
+        buffer = BytesIO()
+        fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+    return buffer.getvalue()
+
 
 class AttendanceReportGenerator:
+    CHART_CACHE_SIZE = 16
+    
     def __init__(self, db_path: str):
         """
         Initialize report generator
@@ -27,10 +110,26 @@ class AttendanceReportGenerator:
         """
         self.db_path = db_path
         
+        # Rendered chart cache: (start, end, dpi, data version) -> {name: png}
+        self._chart_cache = OrderedDict()
+        self._chart_cache_lock = threading.Lock()
+        self._chart_pool = None
+        self._chart_pool_failed = False
+        
     def get_connection(self):
         """Get database connection"""
         return sqlite3.connect(self.db_path)
     
+    def close(self):
+        """Release the chart rendering process pool (renders in flight fall back to serial)"""
+        self._shutdown_chart_pool()
+    
+    def _shutdown_chart_pool(self):
+        """Stop the chart worker processes and drop the pool"""
+        pool, self._chart_pool = self._chart_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+    
     # =============================================================================
     # DATA RETRIEVAL METHODS
     # =============================================================================
@@ -189,6 +288,8 @@ class AttendanceReportGenerator:
     
     def create_styled_worksheet(self, workbook, sheet_name: str, data: pd.DataFrame, title: str):
         """Create a styled worksheet with data"""
+        from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
+        
         ws = workbook.create_sheet(title=sheet_name)
         
         # Add title
@@ -241,7 +342,8 @@ class AttendanceReportGenerator:
         
         return ws
     
-    def export_comprehensive_report(self, start_date: str, end_date: str, output_path: str) -> str:
+    def export_comprehensive_report(self, start_date: str, end_date: str, output_path: str,
+                                    progress_callback: Optional[Callable[[int, str], None]] = None) -> str:
         """
         Export comprehensive attendance report to Excel
         
@@ -249,23 +351,33 @@ class AttendanceReportGenerator:
             start_date: Start date (YYYY-MM-DD)
             end_date: End date (YYYY-MM-DD) 
             output_path: Output file path
+            progress_callback: Optional callback (percent, message) called between stages
             
         Returns:
             Path to created file
         """
+        import openpyxl
+        
+        progress = progress_callback or (lambda percent, message: None)
+        
         # Create workbook
         wb = openpyxl.Workbook()
         wb.remove(wb.active)  # Remove default sheet
         
         # Get data
+        progress(5, "Đang truy vấn dữ liệu điểm danh...")
         attendance_data = self.get_attendance_by_date_range(start_date, end_date)
+        progress(20, "Đang tổng hợp theo ngày...")
         daily_summary = self.get_daily_attendance_summary(start_date, end_date)
+        progress(30, "Đang tổng hợp theo học sinh...")
         student_summary = self.get_student_attendance_summary(start_date, end_date)
+        progress(40, "Đang thống kê lớp học...")
         class_stats = self.get_class_statistics()
         trends = self.get_attendance_trends()
         hourly_pattern = self.get_hourly_attendance_pattern()
         
         # Create sheets
+        progress(50, "Đang tạo các sheet Excel...")
         if not attendance_data.empty:
             self.create_styled_worksheet(
                 wb, 
@@ -315,14 +427,19 @@ class AttendanceReportGenerator:
             )
         
         # Add charts
+        progress(80, "Đang thêm biểu đồ...")
         self._add_charts_to_workbook(wb, daily_summary, trends, hourly_pattern)
         
         # Save file
+        progress(90, "Đang lưu file...")
         wb.save(output_path)
+        progress(100, "Hoàn thành")
         return output_path
     
     def _add_charts_to_workbook(self, workbook, daily_summary: pd.DataFrame, trends: pd.DataFrame, hourly_pattern: pd.DataFrame):
         """Add charts to workbook"""
+        from openpyxl.chart import LineChart, Reference
+        
         try:
             # Create charts sheet
             charts_ws = workbook.create_sheet(title="Biểu đồ")
@@ -359,90 +476,146 @@ class AttendanceReportGenerator:
     # VISUALIZATION METHODS
     # =============================================================================
     
-    def create_attendance_visualization(self, start_date: str, end_date: str) -> Dict[str, str]:
+    def get_data_version(self) -> Tuple:
         """
-        Create visualization charts and return as base64 encoded images
+        Cheap fingerprint of the data the charts depend on
         
-        Returns:
-            Dictionary with chart names and base64 encoded image data
+        Changes whenever attendance records, students or classes are added,
+        updated or removed, so it can be used as a cache key.
         """
-        charts = {}
-        
-        # Set style
-        plt.style.use('seaborn-v0_8')
+        query = """
+        SELECT 
+            (SELECT COUNT(*) FROM attendance_records),
+            (SELECT MAX(id) FROM attendance_records),
+            (SELECT MAX(COALESCE(check_out_time, check_in_time)) FROM attendance_records),
+            (SELECT COUNT(*) FROM students WHERE is_active = 1),
+            (SELECT COUNT(*) FROM classes)
+        """
+        with self.get_connection() as conn:
+            return tuple(conn.execute(query).fetchone())
+    
+    def get_chart_data(self, start_date: str, end_date: str) -> Dict[str, Dict]:
+        """Query chart data as plain (picklable) lists"""
+        chart_data = {}
         
         # Daily attendance trend
         trends = self.get_attendance_trends(30)
         if not trends.empty:
-            fig, ax = plt.subplots(figsize=(12, 6))
-            ax.plot(pd.to_datetime(trends['date']), trends['unique_students'], 
-                   marker='o', linewidth=2, markersize=6)
-            ax.set_title('Xu hướng số lượng học sinh điểm danh', fontsize=16, fontweight='bold')
-            ax.set_xlabel('Ngày', fontsize=12)
-            ax.set_ylabel('Số học sinh', fontsize=12)
-            ax.grid(True, alpha=0.3)
-            plt.xticks(rotation=45)
-            plt.tight_layout()
-            
-            # Convert to base64
-            buffer = BytesIO()
-            plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-            buffer.seek(0)
-            charts['daily_trend'] = base64.b64encode(buffer.getvalue()).decode()
-            plt.close()
+            chart_data['daily_trend'] = {'x': trends['date'].tolist(), 'y': trends['unique_students'].tolist()}
         
         # Hourly pattern
         hourly = self.get_hourly_attendance_pattern()
         if not hourly.empty:
-            fig, ax = plt.subplots(figsize=(10, 6))
-            bars = ax.bar(hourly['hour'], hourly['attendance_count'], 
-                         color='skyblue', alpha=0.8, edgecolor='navy')
-            ax.set_title('Phân bố điểm danh theo giờ', fontsize=16, fontweight='bold')
-            ax.set_xlabel('Giờ trong ngày', fontsize=12)
-            ax.set_ylabel('Số lần điểm danh', fontsize=12)
-            ax.grid(True, alpha=0.3, axis='y')
-            
-            # Add value labels on bars
-            for bar in bars:
-                height = bar.get_height()
-                ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
-                       f'{int(height)}', ha='center', va='bottom')
-            
-            plt.tight_layout()
-            
-            buffer = BytesIO()
-            plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-            buffer.seek(0)
-            charts['hourly_pattern'] = base64.b64encode(buffer.getvalue()).decode()
-            plt.close()
+            chart_data['hourly_pattern'] = {'x': hourly['hour'].tolist(), 'y': hourly['attendance_count'].tolist()}
         
         # Class attendance comparison
         class_stats = self.get_class_statistics()
         if not class_stats.empty and len(class_stats) > 1:
-            fig, ax = plt.subplots(figsize=(10, 6))
-            bars = ax.bar(class_stats['class_name'], class_stats['total_students'], 
-                         color='lightcoral', alpha=0.8, edgecolor='darkred')
-            ax.set_title('So sánh số lượng học sinh theo lớp', fontsize=16, fontweight='bold')
-            ax.set_xlabel('Lớp học', fontsize=12)
-            ax.set_ylabel('Số học sinh', fontsize=12)
-            ax.grid(True, alpha=0.3, axis='y')
-            
-            # Add value labels
-            for bar in bars:
-                height = bar.get_height()
-                ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
-                       f'{int(height)}', ha='center', va='bottom')
-            
-            plt.xticks(rotation=45)
-            plt.tight_layout()
-            
-            buffer = BytesIO()
-            plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-            buffer.seek(0)
-            charts['class_comparison'] = base64.b64encode(buffer.getvalue()).decode()
-            plt.close()
+            chart_data['class_comparison'] = {'x': class_stats['class_name'].tolist(),
+                                              'y': class_stats['total_students'].tolist()}
+        
+        return chart_data
+    
+    def _get_chart_pool(self):
+        """Lazily create the process pool used to render charts in parallel"""
+        if self._chart_pool is None and not self._chart_pool_failed:
+            try:
+                # spawn, not fork: the GUI process has Tk and worker threads whose held locks a fork would copy
+                self._chart_pool = ProcessPoolExecutor(max_workers=min(len(CHART_TITLES), os.cpu_count() or 1),
+                                                       mp_context=multiprocessing.get_context('spawn'))
+            except Exception as e:
+                logger.warning("Chart process pool unavailable, rendering serially: %s", e)
+                self._chart_pool_failed = True
+        return self._chart_pool
+    
+    def render_charts(self, start_date: str, end_date: str, dpi: int = SCREEN_CHART_DPI,
+                      progress_callback: Optional[Callable[[int, str], None]] = None) -> Dict[str, bytes]:
+        """
+        Render all charts to PNG bytes, in parallel and cached per (range, data version, dpi)
         
-        return charts
+        Returns:
+            Dictionary with chart names and PNG bytes
+        """
+        progress = progress_callback or (lambda percent, message: None)
+        
+        progress(5, "Đang kiểm tra dữ liệu...")
+        cache_key = (start_date, end_date, dpi, self.get_data_version())
+        with self._chart_cache_lock:
+            if cache_key in self._chart_cache:
+                self._chart_cache.move_to_end(cache_key)
+                progress(100, "Hoàn thành (cache)")
+                return dict(self._chart_cache[cache_key])
+        
+        progress(15, "Đang truy vấn dữ liệu biểu đồ...")
+        chart_data = self.get_chart_data(start_date, end_date)
+        
+        progress(30, "Đang vẽ biểu đồ...")
+        charts = {}
+        pool = self._get_chart_pool() if len(chart_data) > 1 else None
+        if pool is not None:
+            try:
+                futures = {name: pool.submit(render_chart_png, name, data, dpi)
+                           for name, data in chart_data.items()}
+                for done, (name, future) in enumerate(futures.items(), 1):
+                    charts[name] = future.result()
+                    progress(30 + 70 * done // len(futures), f"Đã vẽ {CHART_TITLES.get(name, name)}")
+            except Exception as e:
+                logger.warning("Parallel chart rendering failed, rendering serially: %s", e)
+                self._shutdown_chart_pool()
+                self._chart_pool_failed = True
+                charts = {}
+        
+        for done, (name, data) in enumerate(chart_data.items(), 1):
+            if name not in charts:
+                charts[name] = render_chart_png(name, data, dpi)
+                progress(30 + 70 * done // len(chart_data), f"Đã vẽ {CHART_TITLES.get(name, name)}")
+        
+        with self._chart_cache_lock:
+            self._chart_cache[cache_key] = charts
+            while len(self._chart_cache) > self.CHART_CACHE_SIZE:
+                self._chart_cache.popitem(last=False)
+        
+        progress(100, "Hoàn thành")
+        return dict(charts)
+    
+    def create_attendance_visualization(self, start_date: str, end_date: str,
+                                        progress_callback: Optional[Callable[[int, str], None]] = None,
+                                        dpi: int = SCREEN_CHART_DPI) -> Dict[str, str]:
+        """
+        Create visualization charts and return as base64 encoded images
+        
+        Charts are rendered at screen resolution by default; pass
+        dpi=EXPORT_CHART_DPI (or use export_chart_images) for print quality.
+        
+        Args:
+            progress_callback: Optional callback (percent, message) called between charts
+            dpi: Output resolution
+        
+        Returns:
+            Dictionary with chart names and base64 encoded image data
+        """
+        charts = self.render_charts(start_date, end_date, dpi, progress_callback)
+        return {name: base64.b64encode(png).decode() for name, png in charts.items()}
+    
+    def export_chart_images(self, start_date: str, end_date: str, output_dir: str,
+                            dpi: int = EXPORT_CHART_DPI,
+                            progress_callback: Optional[Callable[[int, str], None]] = None) -> List[str]:
+        """
+        Save high-resolution chart PNGs for printing/sharing
+        
+        Returns:
+            List of created file paths
+        """
+        charts = self.render_charts(start_date, end_date, dpi, progress_callback)
+        os.makedirs(output_dir, exist_ok=True)
+        
+        paths = []
+        for name, png in charts.items():
+            path = os.path.join(output_dir, f"{name}_{start_date}_{end_date}.png")
+            with open(path, 'wb') as f:
+                f.write(png)
+            paths.append(path)
+        return paths
     
     # =============================================================================
     # UTILITY METHODS
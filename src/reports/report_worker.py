@@ -0,0 +1,160 @@
+"""
+Background Report Worker
+Chạy các tác vụ báo cáo nền để giao diện Tkinter không bị treo
+"""
+
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+
+class ReportJobCancelled(Exception):
+    """Raised inside a report job when it has been cancelled"""
+
+
+class ReportJob:
+    def __init__(self, job_id: int, name: str, executor: 'ReportJobExecutor'):
+        """
+        Handle for a single report job
+
+        Args:
+            job_id: Unique job identifier
+            name: Job kind (e.g. 'preview', 'export', 'charts')
+            executor: Owning executor used to marshal callbacks
+        """
+        self.job_id = job_id
+        self.name = name
+        self.future = None
+        self._executor = executor
+        self._cancel_event = threading.Event()
+        self._on_progress = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """Request cancellation; the job stops at its next progress checkpoint"""
+        self._cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def check_cancelled(self):
+        """Raise ReportJobCancelled if cancellation was requested"""
+        if self._cancel_event.is_set():
+            raise ReportJobCancelled(f"Job {self.job_id} ({self.name}) cancelled")
+
+    def report_progress(self, percent: int, message: str = ""):
+        """
+        Report progress from the worker thread
+
+        Doubles as a cancellation checkpoint so long-running report code only
+        has to call this between stages.
+        """
+        self.check_cancelled()
+        if self._on_progress is not None:
+            self._executor.call_in_ui(self._on_progress, self.job_id, percent, message)
+
+
+class ReportJobExecutor:
+    def __init__(self, root, max_workers: int = 2):
+        """
+        Run report jobs (SQL, pandas, openpyxl, matplotlib) off the Tk main thread
+
+        Args:
+            root: Tk root used to marshal callbacks back via root.after
+            max_workers: Number of worker threads
+        """
+        self.root = root
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report-worker')
+        self._jobs: Dict[int, ReportJob] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def call_in_ui(self, callback: Callable, *args):
+        """Schedule callback(*args) on the Tk main thread"""
+        if self._closed:
+            return
+        try:
+            self.root.after(0, lambda: callback(*args))
+        except RuntimeError:
+            # Tk main loop is gone (application closing)
+            pass
+
+    def submit(self, name: str, func: Callable, *args,
+               on_progress: Optional[Callable[[int, int, str], None]] = None,
+               on_done: Optional[Callable[[int, object], None]] = None,
+               on_error: Optional[Callable[[int, Exception], None]] = None,
+               on_cancel: Optional[Callable[[int], None]] = None,
+               **kwargs) -> int:
+        """
+        Submit a report job
+
+        Args:
+            name: Job kind, used by cancel_all(name)
+            func: Called as func(job, *args, **kwargs) on a worker thread
+            on_progress: UI callback (job_id, percent, message)
+            on_done: UI callback (job_id, result)
+            on_error: UI callback (job_id, exception)
+            on_cancel: UI callback (job_id)
+
+        Returns:
+            Job ID
+        """
+        job = ReportJob(next(self._ids), name, self)
+        job._on_progress = on_progress
+
+        def run():
+            try:
+                job.check_cancelled()
+                result = func(job, *args, **kwargs)
+                job.check_cancelled()
+            except ReportJobCancelled:
+                if on_cancel is not None:
+                    self.call_in_ui(on_cancel, job.job_id)
+            except Exception as e:
+                print(f"❌ Report job {job.job_id} ({name}) failed: {e}")
+                if on_error is not None:
+                    self.call_in_ui(on_error, job.job_id, e)
+            else:
+                if on_done is not None:
+                    self.call_in_ui(on_done, job.job_id, result)
+
+        def forget(_future):
+            # Also runs for futures cancelled before they started
+            with self._lock:
+                self._jobs.pop(job.job_id, None)
+
+        with self._lock:
+            self._jobs[job.job_id] = job
+        job.future = self._pool.submit(run)
+        job.future.add_done_callback(forget)
+        return job.job_id
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a job by ID"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        job.cancel()
+        return True
+
+    def cancel_all(self, name: Optional[str] = None):
+        """Cancel all running jobs, or only those of the given kind"""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if name is None or job.name == name]
+        for job in jobs:
+            job.cancel()
+
+    def is_running(self, job_id: int) -> bool:
+        with self._lock:
+            return job_id in self._jobs
+
+    def shutdown(self):
+        """Cancel pending work and stop accepting callbacks"""
+        self.cancel_all()
+        self._closed = True
+        self._pool.shutdown(wait=False)
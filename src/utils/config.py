@@ -3,13 +3,114 @@ Configuration file for Attendance System
 File cấu hình cho hệ thống điểm danh
 """
 
+import json
+import os
+
+# Project root (src/utils/config.py -> project root) and bundled assets
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ASSETS_DIR = os.path.join(PROJECT_ROOT, "assets")
+
 # Database configuration
 DATABASE_PATH = "attendance_system/data/attendance.db"
 
 # Face recognition settings
 CONFIDENCE_THRESHOLD = 60  # Minimum confidence score for face recognition
 RECOGNITION_COOLDOWN = 30  # Seconds between recognitions for same student
-CASCADE_PATH = "haarcascade_frontalface_default.xml"
+
+# Matching engine: "mad" (original pixel comparison), "pca" (eigenfaces), "lbp" (LBP histograms)
+# or "mosaic" (cv2.matchTemplate over the whole gallery), see core/matchers.py
+# Fitted models are saved next to faces_data.npy as data/trainer/<engine>_model.npz
+RECOGNITION_ENGINE = "mad"
+MATCH_FACE_SIZE = (64, 64)  # Faces are resized to this before feature extraction
+PCA_COMPONENTS = 96  # Eigenfaces kept per face (64-128 keeps accuracy at a fraction of the cost)
+PCA_FIT_SAMPLES = 5000  # Faces used to fit the PCA basis (all faces are still projected)
+LBP_GRID = (8, 8)  # Cells (columns, rows) with one LBP histogram each for the "lbp" engine
+# "lbp" and "mosaic" ccoeff_normed confidence is calibrated at fit time: this percentile of the distances
+# between each sample and the closest other sample of the same student maps to CONFIDENCE_THRESHOLD, times
+# a margin because live faces differ more from the gallery than enrollment shots differ from each other
+CALIBRATION_PERCENTILE = 95
+CALIBRATION_MARGIN = 1.25
+CALIBRATION_SAMPLES = 1000  # Gallery samples measured (bounds fit time on large galleries)
+MOSAIC_FACE_SIZE = (32, 32)  # Tile size of the "mosaic" engine (matchTemplate work grows with its cube)
+MOSAIC_METHOD = "sqdiff"  # "sqdiff" (RMS pixel difference) or "ccoeff_normed" (brightness-invariant correlation)
+PCA_STORAGE_DTYPE = "float32"  # "float16" halves the memory of the pca gallery coefficients
+# The "mad" engine matches a compact copy of faces_data.npy: faces resized to MATCH_FACE_SIZE,
+# cached as data/trainer/mad_gallery.npz (about 4 KB per face instead of the full-resolution crop)
+COMPACT_GALLERY = True
+COMPACT_GALLERY_BITS = 8  # 8 = uint8 pixels, 4 = 16 grey levels packed two pixels per byte (half the memory)
+# Coarse-to-fine prefilter of the "mad" engine: thumbnails of the whole gallery are compared first
+# and only the MAD_PREFILTER_TOP_K closest samples get the full-resolution comparison (0 = off)
+MAD_PREFILTER_SIZE = (16, 16)
+MAD_PREFILTER_TOP_K = 32
+MAD_HASH_TOP_K = 4096  # Larger galleries are first pruned to this many rows by 64-bit dHash distance (0 = off)
+# pca/lbp/mosaic: galleries larger than this are pruned by the dHash saved in the model file before exact
+# distances, when no IVF index or prototypes select candidates (0 = off, exact search)
+MATCHER_HASH_TOP_K = 0
+
+# Training can keep only this many representative crops per student (k-medoids, see core/coreset.py).
+# Off by default: it drops training samples, and for "mad" its accuracy check is a 32x32 thumbnail proxy
+GALLERY_SAMPLES_PER_STUDENT = 0  # 0 = keep every collected crop; e.g. 20 for 200-shot enrollments
+
+# Per-student prototypes stored in the pca/lbp/mosaic model files (core/ann_index.py): a face is first
+# compared with every student's mean and k-means centres, then exactly with the samples of the closest
+# students. Off by default: the answer can differ from the exhaustive search; e.g. 10 for large schools
+PROTOTYPE_CENTRES = 3  # Centres per student besides the mean (0 = mean only)
+PROTOTYPE_TOP_STUDENTS = 0  # Students compared sample by sample (0 = compare every sample)
+
+# Approximate nearest-neighbour (IVF) index for large galleries, see core/ann_index.py
+# Built at training time for galleries of at least IVF_MIN_GALLERY samples (data/trainer/<engine>_ivf.npz)
+IVF_MIN_GALLERY = 20000  # Smaller galleries are searched exhaustively (already fast enough)
+IVF_LISTS = 0  # k-means clusters (0 = about 4 * sqrt(gallery size))
+IVF_PROBES = 8  # Clusters searched per face: more = higher recall, slower
+IVF_TRAIN_SAMPLES = 20000  # Samples used to train k-means
+IVF_KMEANS_ITERATIONS = 10
+
+# Face detector backend: "haar" (default), "lbp" (faster, e.g. on ARM) or "dnn" (more robust in dim rooms)
+# LBP and DNN model files are not bundled; place them in assets/ or point these paths elsewhere
+FACE_DETECTOR = "haar"
+CASCADE_PATH = os.path.join(ASSETS_DIR, "haarcascade_frontalface_default.xml")
+LBP_CASCADE_PATH = os.path.join(ASSETS_DIR, "lbpcascade_frontalface_improved.xml")
+DNN_MODEL_PATH = os.path.join(ASSETS_DIR, "res10_300x300_ssd_iter_140000.caffemodel")  # .caffemodel or .onnx
+DNN_CONFIG_PATH = os.path.join(ASSETS_DIR, "deploy.prototxt")  # Caffe only; ignored for ONNX
+DNN_CONFIDENCE = 0.5  # Minimum detection score of the DNN detector
+DNN_INPUT_SIZE = 300  # Network input (square), pixels
+
+# Face detection parameters used everywhere (recognizer, GUI, face collection, scripts/)
+# benchmarks/tune_detection.py writes tuned values to DETECTION_PARAMS_PATH, which overrides these
+DETECTION_PARAMS_PATH = os.path.join(PROJECT_ROOT, "config", "detection_params.json")
+DETECTION_SCALE_FACTOR = 1.2  # Image pyramid step: larger is faster, may miss faces between scales
+DETECTION_MIN_NEIGHBORS = 5  # Overlapping hits required per face: larger means fewer false positives
+DETECTION_MIN_SIZE = (50, 50)  # Smallest face searched, pixels
+
+if os.path.exists(DETECTION_PARAMS_PATH):
+    try:
+        with open(DETECTION_PARAMS_PATH, encoding="utf-8") as _params_file:
+            _tuned = json.load(_params_file)
+        DETECTION_SCALE_FACTOR = float(_tuned.get("scale_factor", DETECTION_SCALE_FACTOR))
+        DETECTION_MIN_NEIGHBORS = int(_tuned.get("min_neighbors", DETECTION_MIN_NEIGHBORS))
+        DETECTION_MIN_SIZE = tuple(int(v) for v in _tuned.get("min_size", DETECTION_MIN_SIZE))
+    except (OSError, ValueError, TypeError) as _error:
+        print(f"[WARNING] Ignoring {DETECTION_PARAMS_PATH}: {_error}")
+
+# Face detection scheduling (full-frame scan vs. search around previous faces)
+DETECTION_FULL_SCAN_INTERVAL = 10  # Frames between full-frame scans
+DETECTION_ROI_MARGIN = 0.5  # Search window around a known face, as a fraction of its size
+DETECTION_SCENE_CHANGE_THRESHOLD = 30.0  # Mean thumbnail difference (0-255) forcing a full scan
+DETECTION_DOWNSCALE = True  # Full scans run on a copy shrunk so the smallest face is ~DETECTION_MIN_FACE_PIXELS
+DETECTION_MIN_FACE_PIXELS = 36  # Haar window is 24 px; 1.5x headroom keeps recall unchanged
+DETECTION_MIN_SCAN_HEIGHT = 240  # Frames are never shrunk below this height (small frames lose recall)
+DETECTION_TILING = True  # Split large frames into overlapping tiles detected in parallel
+DETECTION_TILE_MIN_WIDTH = 1600  # Only frames (as scanned) wider than this are tiled
+DETECTION_TILE_SIZE = 640  # Tile side, pixels
+DETECTION_TILE_OVERLAP = 160  # Largest face searched inside tiles; bigger faces come from a downscaled pass
+DETECTION_TILE_WORKERS = 0  # Detection threads (0 = CPU count; a single thread disables tiling)
+
+# Motion gate: skip detection/recognition while the picture is static
+MOTION_PIXEL_THRESHOLD = 15  # Gray-level change that counts a (downsampled) pixel as moving
+MOTION_START_RATIO = 0.01  # Moving-pixel fraction that wakes the gate up
+MOTION_STOP_RATIO = 0.003  # ... and below which it goes idle again (hysteresis)
+MOTION_HOLD_FRAMES = 5  # Quiet frames required before going idle
+MOTION_MAX_SKIP_FRAMES = 30  # Process at least every N-th frame even when static
 
 # Camera settings
 CAMERA_ID = 0
@@ -17,6 +118,17 @@ CAMERA_WIDTH = 640
 CAMERA_HEIGHT = 480
 CAMERA_FPS = 30
 
+# Headless runner performance profiles
+# frame size requested from the camera, frame rate cap of the processing loop,
+# and how many captured frames are skipped between recognitions
+PERFORMANCE_PROFILES = {
+    "low": {"frame_width": 320, "frame_height": 240, "max_fps": 5, "process_every_n_frames": 3},
+    "balanced": {"frame_width": 640, "frame_height": 480, "max_fps": 10, "process_every_n_frames": 2},
+    "high": {"frame_width": 640, "frame_height": 480, "max_fps": 30, "process_every_n_frames": 1},
+}
+DEFAULT_PERFORMANCE_PROFILE = "balanced"
+STATS_LOG_INTERVAL = 60  # Seconds between periodic stats in the headless runner
+
 # GUI settings
 WINDOW_WIDTH = 1200
 WINDOW_HEIGHT = 800
@@ -0,0 +1,282 @@
+"""
+Synthetic large-scale data for load testing
+Tạo dữ liệu lớn (database + gallery khuôn mặt) để kiểm thử hiệu năng
+
+Builds realistic attendance databases (classes, students, terms, daily
+timetable, check-in distributions) with executemany inside a single
+transaction, and matching face galleries by augmenting the crops in
+data/dataset.
+"""
+
+import os
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+
+import cv2
+import numpy as np
+
+from database.models import DatabaseManager
+
+# Preset sizes. 'district' is the 5k-identity, ~10M-record scaling fixture.
+PRESETS = {
+    'small': dict(classes=5, students_per_class=30, terms=1, weeks_per_term=4,
+                  sessions_per_day=2, identities=150, samples_per_identity=10),
+    'school': dict(classes=40, students_per_class=40, terms=2, weeks_per_term=18,
+                   sessions_per_day=4, identities=1600, samples_per_identity=20),
+    'district': dict(classes=125, students_per_class=40, terms=3, weeks_per_term=18,
+                     sessions_per_day=8, identities=5000, samples_per_identity=20),
+}
+
+# Lesson start times (HH, MM); sessions_per_day takes the first N
+TIMETABLE = [(7, 0), (7, 50), (8, 45), (9, 40), (10, 35), (13, 0), (13, 50), (14, 45), (15, 40), (16, 35)]
+SESSION_MINUTES = 45
+
+FAMILY_NAMES = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Vũ', 'Võ', 'Đặng', 'Bùi', 'Đỗ', 'Hồ', 'Ngô']
+MIDDLE_NAMES = ['Văn', 'Thị', 'Hoàng', 'Minh', 'Ngọc', 'Thanh', 'Quốc', 'Thu', 'Đức', 'Gia']
+GIVEN_NAMES = ['An', 'Bình', 'Cường', 'Dung', 'Đệ', 'Giang', 'Hà', 'Hải', 'Hạnh', 'Hùng', 'Khánh', 'Lan',
+               'Linh', 'Long', 'Mai', 'Nam', 'Nga', 'Phúc', 'Quân', 'Sơn', 'Tâm', 'Thảo', 'Trang', 'Tuấn', 'Vy']
+
+
+def estimate_records(classes, students_per_class, terms, weeks_per_term, sessions_per_day,
+                     days_per_week=5, attendance_rate=0.93, **_):
+    """Expected number of attendance records for a configuration"""
+    sessions = classes * terms * weeks_per_term * days_per_week * sessions_per_day
+    return int(sessions * students_per_class * attendance_rate)
+
+
+def school_days(start, terms, weeks_per_term, days_per_week=5, break_weeks=2):
+    """School days for consecutive terms separated by breaks"""
+    days = []
+    term_start = start - timedelta(days=start.weekday())  # Monday
+    for _ in range(terms):
+        for week in range(weeks_per_term):
+            monday = term_start + timedelta(weeks=week)
+            days.extend(monday + timedelta(days=d) for d in range(days_per_week))
+        term_start += timedelta(weeks=weeks_per_term + break_weeks)
+    return days
+
+
+def generate_attendance_database(db_path, classes=5, students_per_class=30, terms=1, weeks_per_term=4,
+                                 days_per_week=5, sessions_per_day=2, attendance_rate=0.93,
+                                 late_rate=0.08, arrival_mean_min=-3.0, arrival_std_min=4.0,
+                                 late_mean_min=9.0, checkout_rate=0.6, start_date=None,
+                                 seed=0, overwrite=False, progress=print, **_):
+    """
+    Build an attendance database of configurable size
+
+    Check-in times are drawn per (session, student): punctual students arrive
+    around the lesson start (normal, arrival_mean_min ± arrival_std_min), a
+    late_rate fraction arrive 5 + Exp(late_mean_min) minutes late and are
+    marked 'late'. Each student has an individual attendance propensity
+    (Beta distributed around attendance_rate).
+
+    Returns:
+        Dictionary with row counts and elapsed time
+    """
+    if sessions_per_day > len(TIMETABLE):
+        raise ValueError(f"sessions_per_day must be <= {len(TIMETABLE)}")
+    if os.path.exists(db_path):
+        if not overwrite:
+            raise FileExistsError(f"{db_path} already exists (pass --overwrite, or overwrite=True)")
+        os.remove(db_path)
+
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    n_students = classes * students_per_class
+    if start_date is None:
+        # Finish the generated calendar around today so "last 30 days" reports have data
+        total_weeks = terms * weeks_per_term + (terms - 1) * 2
+        start_date = date.today() - timedelta(weeks=total_weeks)
+
+    # Schema only, no demo rows
+    DatabaseManager(db_path, seed_sample_data=False)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-200000')
+    cursor = conn.cursor()
+    cursor.execute('BEGIN')
+
+    # Classes
+    cursor.executemany(
+        'INSERT INTO classes (class_name, class_code, description) VALUES (?, ?, ?)',
+        [(f"Lớp LT{c:04d}", f"LT{c:04d}", "Lớp kiểm thử tải") for c in range(1, classes + 1)]
+    )
+    class_ids = [row[0] for row in cursor.execute('SELECT id FROM classes ORDER BY id')]
+
+    # Students: contiguous IDs per class, so class k owns rows [k*spc, (k+1)*spc)
+    families = rng.integers(len(FAMILY_NAMES), size=n_students)
+    middles = rng.integers(len(MIDDLE_NAMES), size=n_students)
+    givens = rng.integers(len(GIVEN_NAMES), size=n_students)
+    cursor.executemany(
+        'INSERT INTO students (student_id, full_name, class_id, email, phone) VALUES (?, ?, ?, ?, ?)',
+        ((f"LT{i + 1:06d}",
+          f"{FAMILY_NAMES[families[i]]} {MIDDLE_NAMES[middles[i]]} {GIVEN_NAMES[givens[i]]}",
+          class_ids[i // students_per_class],
+          f"lt{i + 1:06d}@school.edu.vn",
+          f"09{i + 1:08d}") for i in range(n_students))
+    )
+    student_ids = np.array([row[0] for row in cursor.execute('SELECT id FROM students ORDER BY id')])
+    progress(f"👥 {len(class_ids)} classes, {n_students} students")
+
+    # Per-student attendance propensity around attendance_rate
+    concentration = 20.0
+    propensity = rng.beta(attendance_rate * concentration, (1 - attendance_rate) * concentration, size=n_students)
+
+    days = school_days(start_date, terms, weeks_per_term, days_per_week)
+    periods = TIMETABLE[:sessions_per_day]
+    period_offsets = np.array([h * 3600 + m * 60 for h, m in periods], dtype=np.int64)
+
+    # Sessions: one per (day, class, period), inserted in that order
+    cursor.executemany(
+        'INSERT INTO attendance_sessions (session_name, class_id, session_date, start_time, end_time, description, is_active) '
+        'VALUES (?, ?, ?, ?, ?, ?, 0)',
+        ((f"Tiết {p + 1} - {day.strftime('%d/%m/%Y')}", class_id, day.isoformat(),
+          f"{h:02d}:{m:02d}:00",
+          (datetime(2000, 1, 1, h, m) + timedelta(minutes=SESSION_MINUTES)).strftime('%H:%M:%S'),
+          "Dữ liệu kiểm thử tải")
+         for day in days for class_id in class_ids for p, (h, m) in enumerate(periods))
+    )
+    first_session_id = cursor.execute('SELECT MIN(id) FROM attendance_sessions').fetchone()[0]
+    n_sessions = len(days) * len(class_ids) * len(periods)
+    progress(f"⏰ {n_sessions} sessions over {len(days)} school days")
+
+    # Attendance records, generated one school day at a time with NumPy
+    per_day = len(class_ids) * len(periods)
+    class_index = np.repeat(np.arange(len(class_ids)), len(periods) * students_per_class)
+    period_index = np.tile(np.repeat(np.arange(len(periods)), students_per_class), len(class_ids))
+    student_index = (class_index * students_per_class
+                     + np.tile(np.arange(students_per_class), len(class_ids) * len(periods)))
+    session_offset = class_index * len(periods) + period_index
+
+    def day_records(day_number, day):
+        present = rng.random(student_index.size) < propensity[student_index]
+        idx = student_index[present]
+        n = idx.size
+
+        late = rng.random(n) < late_rate
+        offset_min = np.where(late,
+                              5.0 + rng.exponential(late_mean_min, n),
+                              rng.normal(arrival_mean_min, arrival_std_min, n))
+        starts = period_offsets[period_index[present]]
+        midnight = np.datetime64(day.isoformat(), 's')
+        check_in = midnight + (starts + (offset_min * 60).astype(np.int64)).astype('timedelta64[s]')
+        check_out = midnight + (starts + SESSION_MINUTES * 60
+                                + rng.integers(-120, 300, n)).astype('timedelta64[s]')
+
+        check_in_str = np.char.replace(np.datetime_as_string(check_in), 'T', ' ')
+        check_out_str = np.char.replace(np.datetime_as_string(check_out), 'T', ' ')
+        has_checkout = rng.random(n) < checkout_rate
+        confidence = np.round(np.clip(rng.normal(82.0, 6.0, n), 50.0, 99.0), 1)
+        session_ids = first_session_id + day_number * per_day + session_offset[present]
+
+        return zip(session_ids.tolist(), student_ids[idx].tolist(), check_in_str.tolist(),
+                   [c if ok else None for c, ok in zip(check_out_str.tolist(), has_checkout.tolist())],
+                   np.where(late, 'late', 'present').tolist(), confidence.tolist())
+
+    n_records = 0
+    for day_number, day in enumerate(days):
+        rows = list(day_records(day_number, day))
+        cursor.executemany(
+            'INSERT INTO attendance_records (session_id, student_id, check_in_time, check_out_time, status, confidence_score) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            rows
+        )
+        n_records += len(rows)
+        if (day_number + 1) % 20 == 0 or day_number + 1 == len(days):
+            progress(f"📝 {day_number + 1}/{len(days)} days, {n_records:,} records")
+
+    conn.commit()
+    conn.execute('PRAGMA journal_mode=DELETE')
+    conn.close()
+
+    return {
+        'classes': len(class_ids),
+        'students': n_students,
+        'sessions': n_sessions,
+        'records': n_records,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def load_source_faces(dataset_dir):
+    """Grayscale crops from a dataset folder (User.ID.count.jpg)"""
+    faces = []
+    for filename in sorted(os.listdir(dataset_dir)):
+        if filename.endswith('.jpg'):
+            img = cv2.imread(os.path.join(dataset_dir, filename), cv2.IMREAD_GRAYSCALE)
+            if img is not None:
+                faces.append(img)
+    if not faces:
+        raise RuntimeError(f"No face crops found in {dataset_dir}")
+    return faces
+
+
+def _random_affine(rng, size, max_angle, max_scale, max_shift, max_shear=0.0):
+    angle = rng.uniform(-max_angle, max_angle)
+    scale = 1.0 + rng.uniform(-max_scale, max_scale)
+    matrix = cv2.getRotationMatrix2D((size / 2, size / 2), angle, scale)
+    matrix[0, 1] += rng.uniform(-max_shear, max_shear)
+    matrix[:, 2] += rng.uniform(-max_shift, max_shift, size=2) * size
+    return matrix
+
+
+def generate_face_gallery(output_dir, student_ids, samples_per_identity=20, face_size=64,
+                          dataset_dir=None, seed=0, progress=print):
+    """
+    Synthesize a face gallery with one identity per student ID
+
+    Each identity is derived from a random source crop with an identity-level
+    warp, tone curve and low-frequency appearance field; each sample then adds
+    pose, illumination and sensor-noise jitter. Saved in the training format
+    (faces_data.npy / ids_data.npy) as a uniform uint8 array.
+
+    Returns:
+        (faces_path, ids_path)
+    """
+    if dataset_dir is None:
+        project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        dataset_dir = os.path.join(project_root, 'data', 'dataset')
+
+    rng = np.random.default_rng(seed)
+    sources = [cv2.resize(face, (face_size, face_size), interpolation=cv2.INTER_AREA)
+               for face in load_source_faces(dataset_dir)]
+
+    n_identities = len(student_ids)
+    faces = np.empty((n_identities * samples_per_identity, face_size, face_size), dtype=np.uint8)
+    ids = np.repeat(np.asarray(student_ids, dtype=np.int64), samples_per_identity)
+    lut_x = np.arange(256, dtype=np.float32) / 255.0
+
+    for n in range(n_identities):
+        # Identity-level appearance
+        base = sources[rng.integers(len(sources))]
+        base = cv2.warpAffine(base, _random_affine(rng, face_size, 10, 0.1, 0.05, 0.15),
+                              (face_size, face_size), borderMode=cv2.BORDER_REFLECT)
+        if rng.random() < 0.5:
+            base = cv2.flip(base, 1)
+        gamma = rng.uniform(0.7, 1.4)
+        base = cv2.LUT(base, np.clip(lut_x ** gamma * 255, 0, 255).astype(np.uint8))
+        field = cv2.resize(rng.normal(0, 18, (4, 4)).astype(np.float32), (face_size, face_size),
+                           interpolation=cv2.INTER_CUBIC)
+        base = np.clip(base.astype(np.float32) + field, 0, 255).astype(np.uint8)
+
+        # Per-sample jitter
+        for k in range(samples_per_identity):
+            sample = cv2.warpAffine(base, _random_affine(rng, face_size, 6, 0.05, 0.04),
+                                    (face_size, face_size), borderMode=cv2.BORDER_REFLECT)
+            gain = rng.uniform(0.8, 1.2)
+            noise = rng.normal(rng.uniform(-15, 15), 3.0, sample.shape)
+            faces[n * samples_per_identity + k] = np.clip(sample * gain + noise, 0, 255).astype(np.uint8)
+
+        if (n + 1) % 500 == 0 or n + 1 == n_identities:
+            progress(f"🧑 {n + 1}/{n_identities} identities")
+
+    os.makedirs(output_dir, exist_ok=True)
+    faces_path = os.path.join(output_dir, 'faces_data.npy')
+    ids_path = os.path.join(output_dir, 'ids_data.npy')
+    np.save(faces_path, faces)
+    np.save(ids_path, ids)
+    return faces_path, ids_path
@@ -0,0 +1,110 @@
+"""
+Per-stage latency instrumentation for the recognition pipeline
+Đo thời gian xử lý từng bước (camera, phát hiện, nhận diện, ghi DB, hiển thị)
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Pipeline stages in display order
+PIPELINE_STAGES = ('capture', 'grayscale', 'detect', 'match', 'db_write', 'render', 'frame')
+
+
+class LatencyStats:
+    def __init__(self, name="recognition", window=300, log_interval=60.0):
+        """
+        Rolling latency statistics per pipeline stage
+
+        Args:
+            name: Label used in log output
+            window: Number of most recent samples kept per stage
+            log_interval: Seconds between periodic log dumps (0 disables)
+        """
+        self.name = name
+        self.window = window
+        self.log_interval = log_interval
+        self.logger = logging.getLogger(__name__)
+
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._last_log_time = time.time()
+
+    def record(self, stage, seconds):
+        """Record one duration (seconds) for a stage"""
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    @contextmanager
+    def measure(self, stage):
+        """Context manager timing the enclosed block as one sample of `stage`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+    def percentiles(self, stage):
+        """Return p50/p95/p99 (milliseconds) and sample count for a stage"""
+        with self._lock:
+            samples = sorted(self._samples.get(stage, ()))
+        if not samples:
+            return None
+
+        def pick(q):
+            return samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+
+        return {'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99), 'count': len(samples)}
+
+    def summary(self):
+        """Percentiles for every recorded stage, in pipeline order"""
+        with self._lock:
+            stages = list(self._samples)
+        ordered = [s for s in PIPELINE_STAGES if s in stages] + [s for s in stages if s not in PIPELINE_STAGES]
+        result = {}
+        for stage in ordered:
+            stats = self.percentiles(stage)
+            if stats:
+                result[stage] = stats
+        return result
+
+    def format_lines(self):
+        """One human-readable line per stage"""
+        return [
+            f"{stage:<9} p50 {p['p50']:6.1f}  p95 {p['p95']:6.1f}  p99 {p['p99']:6.1f} ms"
+            for stage, p in self.summary().items()
+        ]
+
+    def draw_overlay(self, frame, origin=(10, 60)):
+        """Draw the latency table onto a BGR frame (in place)"""
+        import cv2
+
+        x, y = origin
+        for i, line in enumerate(self.format_lines()):
+            pos = (x, y + i * 18)
+            cv2.putText(frame, line, pos, cv2.FONT_HERSHEY_PLAIN, 1.0, (0, 0, 0), 3)
+            cv2.putText(frame, line, pos, cv2.FONT_HERSHEY_PLAIN, 1.0, (0, 255, 255), 1)
+        return frame
+
+    def maybe_log(self):
+        """Dump the latency table to the log every `log_interval` seconds"""
+        if not self.log_interval:
+            return False
+        now = time.time()
+        if now - self._last_log_time < self.log_interval:
+            return False
+        self._last_log_time = now
+
+        lines = self.format_lines()
+        if lines:
+            self.logger.info("[%s] latency (rolling %d-frame window):\n  %s", self.name, self.window, "\n  ".join(lines))
+        return True